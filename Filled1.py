@@ -1,10 +1,13 @@
+import os
 import re
-import json
 import wave
 import fitz
 import numpy as np
 import soundfile as sf
-from vosk import Model, KaldiRecognizer
+from asr_backends import load_backend
+from case_index import index_case
+from case_store import save_case
+from template_layout import open_form, save_form, fill_blanks
 
 # =========================
 # PATH CONFIG
@@ -15,8 +18,6 @@ VOSK_MODEL = r"C:\Users\HP\Downloads\ProjectSound\vosk-model-en-us-0.22"
 PDF_IN = "Breast_gross_form_onepage.pdf"
 PDF_OUT = "Breast_gross_form_onepag_filled_1.pdf"
 
-CM = 28.35  # 1 cm in PDF point
-
 # =========================
 # AUDIO PREP
 # =========================
@@ -30,20 +31,22 @@ def prepare_audio(inp, out="temp.wav"):
 # =========================
 # TRANSCRIBE
 # =========================
-def transcribe(audio):
+def transcribe(audio, results=None):
+    # results: ถ้าส่ง list เข้ามา จะได้ผลลัพธ์ดิบ (มีเวลารายคำ) ไว้ผูกฟิลด์กับช่วงเสียงใน case_index
     wf = wave.open(audio, "rb")
-    rec = KaldiRecognizer(Model(VOSK_MODEL), wf.getframerate())
-    rec.SetWords(True)
+    rec = load_backend(VOSK_MODEL).recognizer(wf.getframerate(), audio_id=audio)
 
     res = []
     while True:
         d = wf.readframes(4000)
         if len(d) == 0:
             break
-        if rec.AcceptWaveform(d):
-            res.append(json.loads(rec.Result()))
-    res.append(json.loads(rec.FinalResult()))
+        if rec.accept(d):
+            res.append(rec.result())
+    res.append(rec.final_result())
     wf.close()
+    if results is not None:
+        results.extend(res)
 
     return " ".join(r.get("text", "") for r in res).lower()
 
@@ -71,6 +74,7 @@ def normalize(t):
 # =========================
 def parse_breast(t):
     d = {
+        "surgical_number": None,
         "side": None,
         "procedure": None,
         "specimen": None,
@@ -114,15 +118,19 @@ def parse_breast(t):
         m = re.search(rf"([\d.]+) cm from {k}", t)
         if m: d["margins"][k] = m.group(1)
 
+    # หมายเลข surgical = case id ของดัชนี/ที่เก็บเคส (เหมือน filler_breast)
+    m = re.search(r"(?:surgical|specimen) (?:number|id) (?:is|number) ?(\d+)", t)
+    if m: d["surgical_number"] = m.group(1)
+
     return d
 
 # =========================
 # PDF HELPERS
 # =========================
-def circle_word(page, word):
+def circle_word(form, word):
     if not word:
         return
-    hits = page.search_for(word)
+    page, hits = form.locate(word)
     if not hits:
         return
     r = hits[0]
@@ -132,65 +140,48 @@ def circle_word(page, word):
     s.finish(color=(1,0,0), width=1.2)
     s.commit()
 
-def write_numbers_spaced(page, anchor, dx, numbers, step_cm=1, fontsize=10):
-    hits = page.search_for(anchor)
-    if not hits:
-        return
-
-    r = hits[0]
-    step = step_cm * CM
-    x = r.x1 + dx
+# ช่องจุดไข่ปลาจาก layout ของ template ทุกหน้า (ดู template_layout.py)
+def write_numbers(form, label, numbers):
+    page, rects = form.find_blanks(label)
+    fill_blanks(page, rects, numbers)
 
-    for n in numbers:
-        box = fitz.Rect(x, r.y0-2, x + 40, r.y1+8)
-        page.insert_textbox(box, n, fontsize=fontsize, align=1)
-        x += step
-
-def write_margin(page, label, value):
-    hits = page.search_for(f"cm. from {label} margin")
-    if not hits:
-        return
-    r = hits[0]
-    box = fitz.Rect(r.x0-60, r.y0-2, r.x0-5, r.y1+2)
-    page.insert_textbox(box, value, fontsize=10, align=1)
+def write_margin(form, label, value):
+    target = "cm. from skin" if label == "skin" else f"cm. from {label} margin"
+    page, rects = form.find_blanks(target, where="after")
+    fill_blanks(page, rects, [value])
 
 # =========================
 # MAIN
 # =========================
-LEFT_SHIFT = -CM  # ขยับซ้าย 1 เซน
-
 wav = prepare_audio(AUDIO)
-txt = normalize(transcribe(wav))
+results = []
+txt = normalize(transcribe(wav, results))
 data = parse_breast(txt)
+# case id: หมายเลข surgical ถ้ามี ไม่เช่นนั้นใช้ชื่อไฟล์เสียง (เหมือน case_splitter.segment_case_id)
+case_id = data["surgical_number"] or os.path.splitext(os.path.basename(AUDIO))[0]
+save_case(case_id, data)
+index_case(case_id, txt, data, results, audio_file=AUDIO)
 
-doc = fitz.open(PDF_IN)
-page = doc[0]
+form = open_form(PDF_IN, PDF_OUT)
 
-circle_word(page, data["side"])
-circle_word(page, data["procedure"])
-circle_word(page, data["nipple"])
-circle_word(page, data["quadrant_vert"])
-circle_word(page, data["quadrant_hori"])
+circle_word(form, data["side"])
+circle_word(form, data["procedure"])
+circle_word(form, data["nipple"])
+circle_word(form, data["quadrant_vert"])
+circle_word(form, data["quadrant_hori"])
 
 if data["specimen"]:
-    write_numbers_spaced(page, "Measuring", 40 + LEFT_SHIFT, data["specimen"], step_cm=1)
+    write_numbers(form, "Measuring", data["specimen"])
 
 if data["skin"]:
-    write_numbers_spaced(page, "The skin ellipse", 40 + LEFT_SHIFT, data["skin"], step_cm=1)
+    write_numbers(form, "The skin ellipse", data["skin"])
 
 if data["mass_dim"]:
-    write_numbers_spaced(
-        page,
-        "infiltrative firm yellow white mass",
-        40 + LEFT_SHIFT,
-        data["mass_dim"],
-        step_cm=1
-    )
+    write_numbers(form, "infiltrative firm yellow white mass", data["mass_dim"])
 
 for k, v in data["margins"].items():
-    write_margin(page, k, v)
+    write_margin(form, k, v)
 
-doc.save(PDF_OUT)
-doc.close()
+save_form(form)
 
 print("✅ PDF completed →", PDF_OUT)
@@ -1,15 +1,13 @@
+import os
 import re
-import json
 import wave
 import fitz
 import numpy as np
 import soundfile as sf
-from vosk import Model, KaldiRecognizer
-
-# =========================
-# CONSTANT
-# =========================
-CM = 28.35  # 1 cm in PDF point
+from asr_backends import load_backend
+from case_index import index_case
+from case_store import save_case
+from template_layout import open_form, save_form, tick_box, circle_rect, fill_blanks
 
 # =========================
 # PATH CONFIG
@@ -33,20 +31,22 @@ def prepare_audio(inp, out="temp.wav"):
 # =========================
 # TRANSCRIBE
 # =========================
-def transcribe(audio):
+def transcribe(audio, results=None):
+    # results: ถ้าส่ง list เข้ามา จะได้ผลลัพธ์ดิบ (มีเวลารายคำ) ไว้ผูกฟิลด์กับช่วงเสียงใน case_index
     wf = wave.open(audio, "rb")
-    rec = KaldiRecognizer(Model(VOSK_MODEL), wf.getframerate())
-    rec.SetWords(True)
+    rec = load_backend(VOSK_MODEL).recognizer(wf.getframerate(), audio_id=audio)
 
     res = []
     while True:
         d = wf.readframes(4000)
         if len(d) == 0:
             break
-        if rec.AcceptWaveform(d):
-            res.append(json.loads(rec.Result()))
-    res.append(json.loads(rec.FinalResult()))
+        if rec.accept(d):
+            res.append(rec.result())
+    res.append(rec.final_result())
     wf.close()
+    if results is not None:
+        results.extend(res)
 
     return " ".join(r.get("text", "") for r in res).lower()
 
@@ -69,6 +69,7 @@ def normalize(t):
 # =========================
 def parse_breast(t):
     d = {
+        "surgical_number": None,
         "side": None,
         "procedure": None,
         "nipple": None,
@@ -106,16 +107,20 @@ def parse_breast(t):
     m = re.search(r"mass.*?([\d.]+) by ([\d.]+) by ([\d.]+)", t)
     if m: d["mass_dim"] = m.groups()
 
+    # หมายเลข surgical = case id ของดัชนี/ที่เก็บเคส (เหมือน filler_breast)
+    m = re.search(r"(?:surgical|specimen) (?:number|id) (?:is|number) ?(\d+)", t)
+    if m: d["surgical_number"] = m.group(1)
+
     return d
 
 # =========================
 # PDF HELPERS
 # =========================
-def circle_word(page, word):
+def circle_word(form, word):
     """ใช้กับข้อความธรรมดา"""
     if not word:
         return
-    hits = page.search_for(word)
+    page, hits = form.locate(word)
     if not hits:
         return
     r = hits[0]
@@ -125,98 +130,97 @@ def circle_word(page, word):
     s.finish(color=(1,0,0), width=1.2)
     s.commit()
 
-def tick_checkbox(page, x, y, size=12):
-    """ใช้กับช่องสี่เหลี่ยม ☐"""
-    page.insert_text(
-        fitz.Point(x, y),
-        "/",
-        fontsize=size,
-        fontname="helv"
-    )
-
-def write_numbers_at(page, start_x, y, numbers, step_cm=1, fontsize=10):
-    """วางตัวเลขตรงช่องจุดไข่ปลา"""
-    x = start_x
-    step = step_cm * CM
-    for n in numbers:
-        page.insert_text(
-            fitz.Point(x, y),
-            n,
-            fontsize=fontsize
-        )
-        x += step
-
-# =========================
-# CHECKBOX COORDINATES (ปรับได้)
-# =========================
-CHECKBOX = {
-    "right": (210, 720),
-    "left": (245, 720),
-
-    "modified radical": (180, 700),
-    "simple": (180, 675),
-
-    "nipple_normal": (130, 585),
-    "nipple_inverted": (190, 585),
-
-    "upper": (250, 515),
-    "lower": (290, 515),
-    "inner": (330, 515),
-    "outer": (370, 515),
-
-    "mass": (70, 470),
-}
-
 # =========================
-# NUMBER FIELD POSITIONS
+# LAYOUT (วิเคราะห์จาก template อัตโนมัติทุกหน้า ดู template_layout.py)
 # =========================
-NUMBER_POS = {
-    "specimen": (230, 690),
-    "skin": (250, 655),
-    "mass": (260, 465),
+
+# ช่อง ☐ -> ข้อความกำกับใน template
+CHECKBOX_LABEL = {
+    "modified radical": "modified radical mastectomy",
+    "simple": "simple mastectomy",
+
+    "nipple_normal": "is everted",
+    "nipple_inverted": "shows inverted",
+
+    "mass": "infiltrative firm yellow white mass",
 }
 
+# ตัวเลือกในวงเล็บ -> ข้อความหน้าวงเล็บ
+CHOICE_BEFORE = {
+    "right": "Received in formalin is a",
+    "left": "Received in formalin is a",
+
+    "upper": "in",
+    "lower": "in",
+    "inner": "in",
+    "outer": "in",
+}
+
+# ช่องตัวเลข -> ข้อความหน้าช่องจุดไข่ปลา
+NUMBER_LABEL = {
+    "specimen": "Measuring",
+    "skin": "The skin ellipse",
+    "mass": "infiltrative firm yellow white mass",
+}
+
+def tick(form, key):
+    page, rect = form.find_checkbox(CHECKBOX_LABEL[key])
+    if rect:
+        tick_box(page, rect)
+
+def circle_choice(form, option):
+    page, rect = form.find_choice(option, before=CHOICE_BEFORE[option])
+    if rect:
+        circle_rect(page, rect)
+
+def write_numbers(form, key, numbers):
+    page, rects = form.find_blanks(NUMBER_LABEL[key])
+    fill_blanks(page, rects, numbers)
+
 # =========================
 # MAIN
 # =========================
 wav = prepare_audio(AUDIO)
-txt = normalize(transcribe(wav))
+results = []
+txt = normalize(transcribe(wav, results))
 data = parse_breast(txt)
+# case id: หมายเลข surgical ถ้ามี ไม่เช่นนั้นใช้ชื่อไฟล์เสียง (เหมือน case_splitter.segment_case_id)
+case_id = data["surgical_number"] or os.path.splitext(os.path.basename(AUDIO))[0]
+save_case(case_id, data)
+index_case(case_id, txt, data, results, audio_file=AUDIO)
 
-doc = fitz.open(PDF_IN)
-page = doc[0]
+form = open_form(PDF_IN, PDF_OUT)
 
-# ---- checkbox tick ----
+# ---- checkbox tick / choice ----
 if data["side"]:
-    tick_checkbox(page, *CHECKBOX[data["side"]])
+    circle_choice(form, data["side"])
 
 if data["procedure"]:
-    tick_checkbox(page, *CHECKBOX[data["procedure"]])
+    tick(form, data["procedure"])
 
 if data["nipple"] == "normal":
-    tick_checkbox(page, *CHECKBOX["nipple_normal"])
+    tick(form, "nipple_normal")
 elif data["nipple"] == "inverted":
-    tick_checkbox(page, *CHECKBOX["nipple_inverted"])
+    tick(form, "nipple_inverted")
 
 if data["quadrant_vert"]:
-    tick_checkbox(page, *CHECKBOX[data["quadrant_vert"]])
+    circle_choice(form, data["quadrant_vert"])
 if data["quadrant_hori"]:
-    tick_checkbox(page, *CHECKBOX[data["quadrant_hori"]])
+    circle_choice(form, data["quadrant_hori"])
 
 if data["mass_dim"]:
-    tick_checkbox(page, *CHECKBOX["mass"])
+    tick(form, "mass")
 
-# ---- numbers (absolute position) ----
+# ---- numbers (ช่องจุดไข่ปลาจาก layout) ----
 if data["specimen"]:
-    write_numbers_at(page, *NUMBER_POS["specimen"], data["specimen"], step_cm=1)
+    write_numbers(form, "specimen", data["specimen"])
 
 if data["skin"]:
-    write_numbers_at(page, *NUMBER_POS["skin"], data["skin"], step_cm=1)
+    write_numbers(form, "skin", data["skin"])
 
 if data["mass_dim"]:
-    write_numbers_at(page, *NUMBER_POS["mass"], data["mass_dim"], step_cm=1)
+    write_numbers(form, "mass", data["mass_dim"])
 
-doc.save(PDF_OUT)
-doc.close()
+save_form(form)
 
 print("✅ PDF completed →", PDF_OUT)
@@ -1,8 +1,8 @@
 import re
-import json
 import wave
 import fitz  # PyMuPDF
-from vosk import Model, KaldiRecognizer
+from asr_backends import load_backend
+from audio_gate import check_audio, print_report
 
 # -----------------------------
 # CONFIG
@@ -43,14 +43,16 @@ def words_to_numbers(text):
 # -----------------------------
 print("Transcribing audio with Vosk…")
 
-model = Model(VOSK_MODEL)
-wf = wave.open(AUDIO, "rb")
+# ตรวจไฟล์เสียงก่อนโหลดโมเดล (ต้องเป็น WAV mono PCM 16kHz และไม่เสีย/เงียบ/clip หนัก)
+gate = check_audio(AUDIO, strict_format=True)
+print_report(gate)
+if gate["status"] == "reject":
+    raise ValueError("Audio rejected: " + "; ".join(gate["problems"]))
 
-if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getframerate() != 16000:
-    raise ValueError("Audio must be WAV mono PCM 16kHz")
+model = load_backend(VOSK_MODEL)
+wf = wave.open(AUDIO, "rb")
 
-rec = KaldiRecognizer(model, wf.getframerate())
-rec.SetWords(True)
+rec = model.recognizer(wf.getframerate(), audio_id=AUDIO)
 
 texts = []
 
@@ -58,11 +60,11 @@ while True:
     data = wf.readframes(4000)
     if len(data) == 0:
         break
-    if rec.AcceptWaveform(data):
-        res = json.loads(rec.Result())
+    if rec.accept(data):
+        res = rec.result()
         texts.append(res.get("text", ""))
 
-final_res = json.loads(rec.FinalResult())
+final_res = rec.final_result()
 texts.append(final_res.get("text", ""))
 
 raw_transcript = " ".join(texts).lower()
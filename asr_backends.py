@@ -0,0 +1,200 @@
+import os
+import copy
+import json
+
+# ระดับ log ของ Vosk (0 = ปกติ, -1 = ปิด)
+VOSK_LOG_LEVEL = 0
+
+# =========================================================
+# === 1. Interface ของ ASR backend ===
+# =========================================================
+# ทุก backend คืนผลลัพธ์รูปแบบเดียวกับ Vosk:
+#   {"text": "...", "result": [{"word": ..., "start": s, "end": s, "conf": 0..1}, ...]}
+# เพื่อให้โค้ดส่วนอื่น (parse, tiered, pipeline ฯลฯ) ไม่ต้องรู้ว่าใช้ engine อะไร
+# ถ้าขอ N-best (max_alternatives > 0) จะมี "alternatives" = [{"text", "confidence", "result"}, ...]
+# เพิ่มมาด้วย โดย "text"/"result" ยังเป็นตัวเลือกอันดับ 1 ของ engine (ดู nbest_rescorer.py)
+
+def normalize_alternatives(result):
+    """แปลงผลลัพธ์ N-best ของ Vosk ({"alternatives": [...]}) ให้มี "text"/"result" ของอันดับ 1"""
+    if "alternatives" not in result:
+        return result
+    alts = result["alternatives"]
+    best = alts[0] if alts else {}
+    return {"text": best.get("text", ""), "result": best.get("result", []), "alternatives": alts}
+
+class Recognizer:
+    """
+    ตัวถอดความแบบ streaming หนึ่งตัวต่อหนึ่งไฟล์/สตรีม
+    accept(pcm) คืนค่า True เมื่อมีผลลัพธ์ครบประโยค (อ่านได้จาก result())
+    """
+    def accept(self, pcm_bytes):
+        raise NotImplementedError
+
+    def result(self):
+        raise NotImplementedError
+
+    def final_result(self):
+        raise NotImplementedError
+
+class Backend:
+    """
+    engine ที่โหลดแล้ว (เช่น โมเดล Vosk) ใช้สร้าง Recognizer ได้หลายตัว
+    """
+    name = "base"
+
+    def recognizer(self, sample_rate, audio_id=None, offset_sec=0.0):
+        """
+        audio_id: path ของไฟล์เสียง (ถ้ามี), offset_sec: ตำแหน่งในไฟล์ที่สตรีมเริ่ม
+        """
+        raise NotImplementedError
+
+# =========================================================
+# === 2. Vosk backend ===
+# =========================================================
+
+class VoskRecognizer(Recognizer):
+    def __init__(self, model, sample_rate, max_alternatives=0):
+        from vosk import KaldiRecognizer
+        self._rec = KaldiRecognizer(model, sample_rate)
+        self._rec.SetWords(True)
+        if max_alternatives:
+            self._rec.SetMaxAlternatives(max_alternatives)
+
+    def accept(self, pcm_bytes):
+        return bool(self._rec.AcceptWaveform(pcm_bytes))
+
+    def result(self):
+        return normalize_alternatives(json.loads(self._rec.Result()))
+
+    def final_result(self):
+        return normalize_alternatives(json.loads(self._rec.FinalResult()))
+
+class VoskBackend(Backend):
+    name = "vosk"
+
+    def __init__(self, model_path, max_alternatives=0):
+        from vosk import Model, SetLogLevel
+        SetLogLevel(VOSK_LOG_LEVEL)
+        self.model_path = model_path
+        self.max_alternatives = max_alternatives
+        self.model = Model(model_path)
+
+    def recognizer(self, sample_rate, audio_id=None, offset_sec=0.0):
+        return VoskRecognizer(self.model, sample_rate, self.max_alternatives)
+
+# =========================================================
+# === 3. Replay backend (deterministic, สำหรับทดสอบ) ===
+# =========================================================
+
+class ReplayRecognizer(Recognizer):
+    """
+    เล่นผลลัพธ์ที่บันทึกไว้ซ้ำตามเวลาเสียงที่ป้อนเข้ามา
+    ประโยคจะถูกปล่อยเมื่อเสียงที่รับแล้วเลยเวลาจบของคำสุดท้ายในประโยคนั้น
+    เวลาของคำถูกเลื่อนให้นับจากจุดเริ่มของสตรีม (offset_sec) เหมือน engine จริง
+    """
+    def __init__(self, results, sample_rate, sample_width=2, offset_sec=0.0):
+        self._pending = []
+        for r in results:
+            r = normalize_alternatives(r)
+            words = r.get("result", [])
+            if not r.get("text") or (words and words[0]["start"] < offset_sec):
+                continue
+            r = copy.deepcopy(r)
+            for alt in [r] + r.get("alternatives", []):
+                for w in alt.get("result", []):
+                    w["start"] -= offset_sec
+                    w["end"] -= offset_sec
+            self._pending.append(r)
+        self._ready = []
+        self._bytes_per_sec = sample_rate * sample_width
+        self._received = 0
+
+    def _now(self):
+        return self._received / self._bytes_per_sec
+
+    def accept(self, pcm_bytes):
+        self._received += len(pcm_bytes)
+        while self._pending and self._pending[0].get("result") and \
+                self._pending[0]["result"][-1]["end"] <= self._now():
+            self._ready.append(self._pending.pop(0))
+        return bool(self._ready)
+
+    def result(self):
+        return self._ready.pop(0) if self._ready else {"text": ""}
+
+    def final_result(self):
+        # ประโยคที่เริ่มหลังเสียงส่วนที่ป้อนเข้ามาแล้วจะไม่ถูกรายงาน
+        rest = self._ready + [r for r in self._pending
+                              if not r.get("result") or r["result"][0]["start"] < self._now()]
+        self._ready, self._pending = [], []
+        if len(rest) == 1:
+            # ประโยคเดียว: คง "alternatives" (ถ้ามี) ไว้ให้ rescorer
+            return rest[0]
+        return {
+            "text": " ".join(r["text"] for r in rest).strip(),
+            "result": [w for r in rest for w in r.get("result", [])],
+        }
+
+class ReplayBackend(Backend):
+    """
+    อ่านผลลัพธ์ที่บันทึกไว้จาก <audio>.replay.json (list ของผลลัพธ์แบบ Vosk)
+    ข้างไฟล์เสียง หรือในโฟลเดอร์ replay_dir (ถ้าระบุ)
+    หรือจาก dict ที่ส่งเข้ามาโดยตรง {audio_id: [results...]}
+    (N-best ที่บันทึกไว้ใน "alternatives" ถูกเล่นซ้ำตามเดิม max_alternatives ไม่มีผล)
+    """
+    name = "replay"
+
+    def __init__(self, recordings=None, max_alternatives=0):
+        self.replay_dir = recordings if isinstance(recordings, str) else None
+        self.recordings = recordings if isinstance(recordings, dict) else {}
+
+    def recognizer(self, sample_rate, audio_id=None, offset_sec=0.0):
+        results = self.recordings.get(audio_id)
+        if results is None and audio_id is not None:
+            replay_file = os.path.splitext(audio_id)[0] + ".replay.json"
+            if self.replay_dir:
+                replay_file = os.path.join(self.replay_dir, os.path.basename(replay_file))
+            if os.path.exists(replay_file):
+                with open(replay_file, encoding="utf-8") as f:
+                    results = json.load(f)
+        return ReplayRecognizer(results or [], sample_rate, offset_sec=offset_sec)
+
+def save_replay(audio_file, results):
+    """บันทึกผลลัพธ์ของ backend จริงไว้ใช้กับ ReplayBackend"""
+    replay_file = os.path.splitext(audio_file)[0] + ".replay.json"
+    with open(replay_file, "w", encoding="utf-8") as f:
+        json.dump([r for r in results if r.get("text")], f, ensure_ascii=False)
+    return replay_file
+
+# =========================================================
+# === 4. Registry ===
+# =========================================================
+
+BACKENDS = {"vosk": VoskBackend, "replay": ReplayBackend}
+
+def parse_spec(spec):
+    """
+    spec รูปแบบ "<name>" หรือ "<name>:<model_path>" เช่น "vosk:C:/.../vosk-model-en-us-0.22"
+    path ที่ไม่มีชื่อ backend นำหน้าจะถือว่าเป็นโมเดล Vosk คืนค่า (name, path)
+    """
+    name, _, arg = spec.partition(":")
+    if name not in BACKENDS:
+        # path ปกติ (รวมถึง C:/... บน Windows)
+        return "vosk", spec
+    return name, arg
+
+def load_backend(spec, **options):
+    """options เช่น max_alternatives=5 ส่งต่อให้ constructor ของ backend"""
+    name, arg = parse_spec(spec)
+    cls = BACKENDS[name]
+    return cls(arg, **options) if arg else cls(**options)
+
+def available_backends():
+    """ชื่อ backend ที่ติดตั้ง engine ไว้แล้วในเครื่องนี้"""
+    names = ["replay"]
+    try:
+        import vosk  # noqa: F401
+        names.insert(0, "vosk")
+    except ImportError:
+        pass
+    return names
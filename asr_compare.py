@@ -0,0 +1,153 @@
+import os
+import sys
+import glob
+import time
+import wave
+import multiprocessing
+
+from asr_backends import available_backends
+from vosk_transcrib_breast import load_model, decode_results, MODEL_PATH
+from filler_breast import parse_transcribed_text
+
+# =========================================================
+# === 1. การตั้งค่า - เปรียบเทียบ ASR backend แบบ offline ===
+# =========================================================
+
+# โฟลเดอร์ corpus: <name>.wav + <name>.txt (ข้อความอ้างอิงที่ถูกต้อง)
+CORPUS_DIR = "asr_corpus"
+
+# ฟิลด์ที่ใช้วัดความแม่นยำ (เทียบผล parse ของ transcript กับของข้อความอ้างอิง)
+COMPARE_FIELDS = ("targets_to_circle", "surgical_number", "specimen_dims", "kidney_dims", "ureter_vals")
+
+# =========================================================
+# === 2. วัดผลใน process แยก (ให้ค่าหน่วยความจำไม่ปนกัน) ===
+# =========================================================
+
+def _peak_rss_mb():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux รายงานเป็น KB, macOS เป็น bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    except ImportError:
+        return None
+
+def _run_backend(spec, wav_files):
+    """
+    ถอดความทั้ง corpus ด้วย backend เดียว (รันใน child process)
+    spec ลงท้ายด้วย "#nbest<N>" = ขอ N-best แล้ว rescore (เช่น "<small_model>#nbest5")
+    """
+    spec, _, nbest = spec.partition("#nbest")
+    t0 = time.perf_counter()
+    model = load_model(spec, int(nbest) if nbest else None)
+    load_sec = time.perf_counter() - t0
+
+    texts, audio_sec, decode_sec = {}, 0.0, 0.0
+    for path in wav_files:
+        with wave.open(path, "rb") as wf:
+            audio_sec += wf.getnframes() / wf.getframerate()
+            t0 = time.perf_counter()
+            results = decode_results(model, wf, audio_id=path)
+            decode_sec += time.perf_counter() - t0
+        texts[path] = " ".join(r.get("text", "") for r in results if r.get("text")).strip()
+
+    return {"texts": texts, "load_sec": load_sec, "audio_sec": audio_sec,
+            "decode_sec": decode_sec, "peak_rss_mb": _peak_rss_mb()}
+
+# =========================================================
+# === 3. ความแม่นยำระดับฟิลด์ ===
+# =========================================================
+
+def _normalize_field(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize_field(v) for v in value)
+    return value or None
+
+def field_accuracy(hypotheses, references, fields=COMPARE_FIELDS):
+    """
+    สัดส่วนฟิลด์ที่ parse ได้ตรงกับข้อความอ้างอิง (รวมทุกไฟล์)
+    คืนค่า (accuracy_รวม, {field: accuracy})
+    """
+    per_field = {f: [0, 0] for f in fields}
+    for path, ref_text in references.items():
+        ref = parse_transcribed_text(ref_text)
+        hyp = parse_transcribed_text(hypotheses.get(path, ""))
+        for f in fields:
+            per_field[f][1] += 1
+            if f == "targets_to_circle":
+                per_field[f][0] += set(hyp[f]) == set(ref[f])
+            else:
+                per_field[f][0] += _normalize_field(hyp[f]) == _normalize_field(ref[f])
+    correct = sum(c for c, _ in per_field.values())
+    total = sum(t for _, t in per_field.values())
+    return (correct / total if total else None), {f: (c / t if t else None) for f, (c, t) in per_field.items()}
+
+# =========================================================
+# === 4. Harness ===
+# =========================================================
+
+def load_corpus(corpus_dir=CORPUS_DIR):
+    wav_files = sorted(glob.glob(os.path.join(corpus_dir, "*.wav")))
+    references = {}
+    for path in wav_files:
+        ref_file = os.path.splitext(path)[0] + ".txt"
+        if os.path.exists(ref_file):
+            with open(ref_file, encoding="utf-8") as f:
+                references[path] = f.read().strip()
+    return wav_files, references
+
+def compare_backends(specs, corpus_dir=CORPUS_DIR):
+    """
+    รัน corpus เดียวกันผ่านทุก backend (process ละ backend)
+    รายงาน real-time factor, หน่วยความจำสูงสุด และความแม่นยำระดับฟิลด์
+    """
+    wav_files, references = load_corpus(corpus_dir)
+    if not wav_files:
+        print(f"Error: No WAV files found in {corpus_dir}")
+        return []
+
+    ctx = multiprocessing.get_context("spawn")
+    rows = []
+    for spec in specs:
+        print(f"\n--- Running backend: {spec} ({len(wav_files)} file(s)) ---")
+        with ctx.Pool(1) as pool:
+            try:
+                run = pool.apply(_run_backend, (spec, wav_files))
+            except Exception as e:
+                print(f"❌ Backend '{spec}' failed: {e}")
+                continue
+        acc, per_field = field_accuracy(run["texts"], references)
+        rows.append({
+            "backend": spec,
+            "load_sec": run["load_sec"],
+            "rtf": run["decode_sec"] / max(run["audio_sec"], 1e-9),
+            "peak_rss_mb": run["peak_rss_mb"],
+            "field_accuracy": acc,
+            "per_field": per_field,
+        })
+
+    print("\n====================================")
+    print(f"{'backend':<40} {'load s':>7} {'RTF':>7} {'RSS MB':>8} {'fields':>7}")
+    print("====================================")
+    for r in rows:
+        rss = f"{r['peak_rss_mb']:.0f}" if r["peak_rss_mb"] is not None else "n/a"
+        acc = f"{r['field_accuracy'] * 100:.0f}%" if r["field_accuracy"] is not None else "n/a"
+        print(f"{r['backend'][-40:]:<40} {r['load_sec']:>7.1f} {r['rtf']:>7.3f} {rss:>8} {acc:>7}")
+    return rows
+
+
+if __name__ == "__main__":
+    # ใช้งาน: python asr_compare.py [corpus_dir] [backend_spec[#nbest<N>] ...]
+    corpus = sys.argv[1] if len(sys.argv) > 1 else CORPUS_DIR
+    specs = sys.argv[2:]
+    if not specs:
+        specs = ["replay:" + corpus]
+        if "vosk" in available_backends():
+            specs.insert(0, MODEL_PATH)
+    compare_backends(specs, corpus)
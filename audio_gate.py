@@ -0,0 +1,208 @@
+import os
+import sys
+import time
+import wave
+
+import numpy as np
+
+# =========================================================
+# === 1. การตั้งค่า - ตรวจคุณภาพเสียงก่อนโหลดโมเดล ===
+# =========================================================
+# อ่าน header + ตัวอย่างเสียงบางช่วง (ไม่ถอดความ) แล้วคำนวณด้วย numpy ทีละ frame 20 ms
+# ไฟล์ที่เสีย เงียบ หรือ clip หนักจะถูกปฏิเสธก่อนเสียเวลาโหลดโมเดลและถอดความทั้งไฟล์
+# ผลลัพธ์: "ok" / "flag" (ถอดความต่อได้ แต่แจ้งเตือน) / "reject" (ไม่ควรถอดความ)
+
+EXPECTED_RATE = 16000
+EXPECTED_CHANNELS = 1
+EXPECTED_WIDTH = 2               # bytes ต่อ sample (16-bit)
+
+MIN_DURATION_SEC = 1.0
+FRAME_MS = 20
+SILENCE_DBFS = -50.0             # frame ที่เบากว่านี้ถือว่าเงียบ
+CLIP_LEVEL = 0.99                # sample ที่ |x| >= ระดับนี้ (สัดส่วนของ full scale) ถือว่า clip
+
+# เกณฑ์: (flag เมื่อเกิน, reject เมื่อเกิน)
+SILENCE_RATIO = (0.85, 0.98)
+CLIP_RATE = (0.001, 0.02)
+MIN_SNR_DB = (15.0, 5.0)         # flag เมื่อต่ำกว่า, reject เมื่อต่ำกว่า
+
+# ไฟล์ยาว: วิเคราะห์เฉพาะ SAMPLE_WINDOWS ช่วง ช่วงละ WINDOW_SEC กระจายทั่วไฟล์ (seek ไม่อ่านทั้งไฟล์)
+SAMPLE_WINDOWS = 12
+WINDOW_SEC = 5.0
+
+_DTYPES = {1: np.uint8, 2: np.int16, 4: np.int32}
+
+# =========================================================
+# === 2. อ่านตัวอย่างเสียง ===
+# =========================================================
+
+def _read_samples(wf):
+    """
+    sample (float32, -1..1, channel แรก) จากทั้งไฟล์หรือจากหลายช่วงที่กระจายทั่วไฟล์
+    คืนค่า (samples, data_frames) — data_frames < getnframes() แปลว่าข้อมูลเสียงจริงสั้นกว่าที่ header บอก
+    (ไฟล์ถูกตัด เช่น อัปโหลดไม่ครบ) ช่วงสุดท้ายจบที่ frame สุดท้ายตาม header เสมอ จึงตรวจพบได้แม้อ่านไม่ครบทั้งไฟล์
+    """
+    rate, n_frames = wf.getframerate(), wf.getnframes()
+    width, channels = wf.getsampwidth(), wf.getnchannels()
+    window = int(WINDOW_SEC * rate)
+    if n_frames <= SAMPLE_WINDOWS * window:
+        starts = [0]
+        window = n_frames
+    else:
+        starts = np.linspace(0, n_frames - window, SAMPLE_WINDOWS).astype(int)
+
+    blocks = []
+    data_frames, good = n_frames, 0
+    for start in starts:
+        wf.setpos(int(start))
+        data = wf.readframes(window)
+        got = len(data) // (width * channels)
+        if got < window and data_frames == n_frames:
+            # ข้อมูลจบก่อนที่ header บอก: จบในช่วงนี้ (got > 0) หรือระหว่างช่วงก่อนหน้ากับช่วงนี้
+            data_frames = int(start) + got if got else _data_end(wf, good, int(start))
+        elif got == window:
+            good = int(start) + window
+        raw = np.frombuffer(data[:got * width * channels], dtype=_DTYPES[width])
+        samples = raw.reshape(-1, channels)[:, 0].astype(np.float32)
+        if width == 1:
+            samples -= 128.0
+        blocks.append(samples / float(2 ** (8 * width - 1)))
+    samples = np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+    return samples, data_frames
+
+def _data_end(wf, lo, hi):
+    """frame สุดท้ายที่มีข้อมูลจริง +1 ระหว่าง lo (มีข้อมูล) และ hi (ไม่มี) — bisection อ่านทีละ frame"""
+    while lo < hi:
+        mid = (lo + hi) // 2
+        wf.setpos(mid)
+        if wf.readframes(1):
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+def _frame_dbfs(samples, rate):
+    """RMS (dBFS) ของแต่ละ frame ยาว FRAME_MS"""
+    size = max(1, int(rate * FRAME_MS / 1000))
+    n = len(samples) // size
+    if n == 0:
+        return np.zeros(0)
+    frames = samples[:n * size].reshape(n, size)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+# =========================================================
+# === 3. ตรวจคุณภาพ ===
+# =========================================================
+
+def _grade(report, level, message):
+    report["problems"].append(f"{level}: {message}")
+    if level == "reject" or report["status"] == "ok":
+        report["status"] = level
+
+def check_audio(audio_file, strict_format=False):
+    """
+    ตรวจไฟล์ WAV โดยไม่โหลดโมเดล คืนค่า dict:
+      status ("ok" / "flag" / "reject"), problems (list ของข้อความ), duration_sec, rate, channels,
+      silence_ratio, clip_rate, rms_dbfs, snr_db, elapsed_ms
+    strict_format=True: rate/channel/bit depth ที่ไม่ตรงถือว่า reject (ไม่ใช่แค่ flag)
+    """
+    t0 = time.perf_counter()
+    report = {"audio": audio_file, "status": "ok", "problems": []}
+
+    if not os.path.exists(audio_file):
+        _grade(report, "reject", f"file not found: {audio_file}")
+        return report
+    try:
+        wf = wave.open(audio_file, "rb")
+    except (wave.Error, EOFError) as e:
+        _grade(report, "reject", f"not a readable PCM WAV file ({e})")
+        return report
+
+    with wf:
+        rate, channels, width = wf.getframerate(), wf.getnchannels(), wf.getsampwidth()
+        duration = wf.getnframes() / rate if rate else 0.0
+        report.update(rate=rate, channels=channels, sample_width=width, duration_sec=duration)
+
+        format_level = "reject" if strict_format else "flag"
+        if width not in _DTYPES:
+            _grade(report, "reject", f"unsupported sample width: {width * 8}-bit")
+            return report
+        if channels != EXPECTED_CHANNELS:
+            # recognizer อ่าน sample แบบ mono: เสียงหลาย channel ที่สลับกันจะกลายเป็นเสียงรบกวน
+            _grade(report, "reject", f"{channels} channels (expected mono; convert with tran.py)")
+        if rate != EXPECTED_RATE:
+            _grade(report, format_level, f"sample rate {rate} Hz (expected {EXPECTED_RATE} Hz)")
+        if width != EXPECTED_WIDTH:
+            _grade(report, format_level, f"{width * 8}-bit samples (expected {EXPECTED_WIDTH * 8}-bit)")
+        if duration < MIN_DURATION_SEC:
+            _grade(report, "reject", f"too short ({duration:.2f} s)")
+            report["elapsed_ms"] = (time.perf_counter() - t0) * 1000
+            return report
+
+        try:
+            samples, data_frames = _read_samples(wf)
+        except (wave.Error, EOFError, ValueError) as e:
+            _grade(report, "reject", f"corrupt audio data ({e})")
+            return report
+
+    if data_frames < duration * rate:
+        # ไม่วัด SNR/silence จากข้อมูลที่ขาด (ไฟล์ที่ถูกตัดจะดูเหมือนเสียงเบา/SNR ต่ำ)
+        actual = data_frames / rate
+        report.update(duration_sec=actual, header_duration_sec=duration)
+        _grade(report, "reject", f"truncated file: header says {duration:.1f} s but only {actual:.1f} s of audio data")
+        report["elapsed_ms"] = (time.perf_counter() - t0) * 1000
+        return report
+
+    dbfs = _frame_dbfs(samples, rate)
+    if len(samples) == 0 or len(dbfs) == 0:
+        _grade(report, "reject", "no audio samples (truncated file?)")
+        return report
+
+    silence_ratio = float(np.mean(dbfs < SILENCE_DBFS))
+    clip_rate = float(np.mean(np.abs(samples) >= CLIP_LEVEL))
+    rms_dbfs = float(10 * np.log10(max(np.mean(samples * samples), 1e-20)))
+    # SNR โดยประมาณ: พลังงานของ frame ที่ดังที่สุด (เสียงพูด) เทียบกับ frame ที่เบาที่สุด (พื้นหลัง)
+    noise_db, speech_db = np.percentile(dbfs, [10, 90])
+    snr_db = float(speech_db - noise_db)
+    report.update(silence_ratio=silence_ratio, clip_rate=clip_rate, rms_dbfs=rms_dbfs, snr_db=snr_db)
+
+    if silence_ratio >= SILENCE_RATIO[1]:
+        _grade(report, "reject", f"almost silent ({silence_ratio:.0%} of frames below {SILENCE_DBFS:g} dBFS)")
+    elif silence_ratio >= SILENCE_RATIO[0]:
+        _grade(report, "flag", f"mostly silent ({silence_ratio:.0%} of frames)")
+    if clip_rate >= CLIP_RATE[1]:
+        _grade(report, "reject", f"heavily clipped ({clip_rate:.1%} of samples)")
+    elif clip_rate >= CLIP_RATE[0]:
+        _grade(report, "flag", f"clipping ({clip_rate:.2%} of samples)")
+    # ไฟล์ที่เงียบเกือบทั้งหมดถูกปฏิเสธไปแล้ว ไม่ต้องตัดสินจาก SNR ซ้ำ
+    if silence_ratio < SILENCE_RATIO[1]:
+        if snr_db < MIN_SNR_DB[1]:
+            _grade(report, "reject", f"no speech above background noise (SNR ~{snr_db:.1f} dB)")
+        elif snr_db < MIN_SNR_DB[0]:
+            _grade(report, "flag", f"noisy recording (SNR ~{snr_db:.1f} dB)")
+
+    report["elapsed_ms"] = (time.perf_counter() - t0) * 1000
+    return report
+
+def print_report(report):
+    icon = {"ok": "✅", "flag": "⚠️", "reject": "❌"}[report["status"]]
+    print(f"{icon} {report['audio']}: {report['status']}", end="")
+    if "snr_db" in report:
+        print(f" ({report['duration_sec']:.1f} s, silence {report['silence_ratio']:.0%}, "
+              f"clip {report['clip_rate']:.2%}, RMS {report['rms_dbfs']:.1f} dBFS, "
+              f"SNR ~{report['snr_db']:.1f} dB, checked in {report['elapsed_ms']:.1f} ms)", end="")
+    print()
+    for problem in report["problems"]:
+        print(f"   - {problem}")
+
+
+if __name__ == "__main__":
+    # ใช้งาน: python audio_gate.py <wav files ...>
+    if len(sys.argv) < 2:
+        print("Usage: python audio_gate.py <wav files ...>")
+        sys.exit(1)
+    reports = [check_audio(path) for path in sys.argv[1:]]
+    for r in reports:
+        print_report(r)
+    sys.exit(1 if any(r["status"] == "reject" for r in reports) else 0)
@@ -0,0 +1,181 @@
+import os
+import sys
+import json
+import time
+import wave
+import shutil
+import hashlib
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# =========================================================
+# === 1. การตั้งค่า - แปลงไฟล์เสียงทั้งโฟลเดอร์ (MP3/M4A/...) เป็น WAV ===
+# =========================================================
+# ใช้ ffmpeg หนึ่ง process ต่อไฟล์ (จำกัดจำนวนพร้อมกันด้วย WORKERS)
+# ไฟล์ที่ต้นฉบับและการตั้งค่าไม่เปลี่ยนจะถูกข้าม (ดู MANIFEST_NAME ในโฟลเดอร์ปลายทาง)
+
+INGEST_IN_DIR = "recordings"
+INGEST_OUT_DIR = "ingested_wav"
+WORKERS = max(1, min(8, os.cpu_count() or 1))
+AUDIO_EXTENSIONS = (".mp3", ".m4a", ".aac", ".wav", ".ogg", ".flac", ".wma", ".amr", ".3gp")
+MANIFEST_NAME = "ingest_manifest.json"
+MANIFEST_SAVE_EVERY = 20     # บันทึก manifest ทุกกี่ไฟล์ (กันงานหายถ้าโปรแกรมล่ม)
+
+# รูปแบบที่ recognizer ต้องการ (เหมือน tran.convert_audio_for_vosk)
+SETTINGS = {"rate": 16000, "channels": 1, "codec": "pcm_s16le"}
+
+# =========================================================
+# === 2. Manifest (ข้ามไฟล์ที่แปลงแล้ว) ===
+# =========================================================
+
+def file_sha1(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _settings_key(settings):
+    return hashlib.sha1(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+def load_manifest(out_dir):
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+def _source_hash(source, entry):
+    """ใช้ hash เดิมถ้าขนาด/mtime ไม่เปลี่ยน (ไม่ต้องอ่านไฟล์ใหม่ทั้งไฟล์)"""
+    st = os.stat(source)
+    if entry and entry.get("size") == st.st_size and entry.get("mtime") == st.st_mtime:
+        return entry["source_sha1"], st
+    return file_sha1(source), st
+
+def is_current(entry, source_sha1, settings_key, out_dir):
+    return bool(entry) and entry.get("source_sha1") == source_sha1 \
+        and entry.get("settings") == settings_key \
+        and os.path.exists(os.path.join(out_dir, entry["output"]))
+
+# =========================================================
+# === 3. แปลงหนึ่งไฟล์ (ffmpeg subprocess) ===
+# =========================================================
+
+def transcode(source, output_path, settings=SETTINGS):
+    """
+    แปลง source เป็น WAV ตาม settings แบบ atomic (เขียนไฟล์ชั่วคราวก่อนแล้ว os.replace)
+    คืนค่าความยาวเสียง (วินาที)
+    """
+    tmp = output_path + ".part"
+    cmd = ["ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-y", "-i", source,
+           "-vn", "-ac", str(settings["channels"]), "-ar", str(settings["rate"]),
+           "-c:a", settings["codec"], "-f", "wav", tmp]
+    try:
+        proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr.decode("utf-8", "replace").strip() or f"ffmpeg exit {proc.returncode}")
+        with wave.open(tmp, "rb") as wf:
+            duration = wf.getnframes() / wf.getframerate()
+        os.replace(tmp, output_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return duration
+
+# =========================================================
+# === 4. Bulk ingest ===
+# =========================================================
+
+def find_sources(in_dir, extensions=AUDIO_EXTENSIONS):
+    sources = []
+    for root, _, files in os.walk(in_dir):
+        for name in sorted(files):
+            if name.lower().endswith(extensions):
+                sources.append(os.path.join(root, name))
+    return sorted(sources)
+
+def _output_names(in_dir, sources):
+    """ชื่อ WAV ปลายทาง (โฟลเดอร์ย่อยคั่นด้วย "__") ถ้าชื่อซ้ำกัน เช่น a.mp3 กับ a.m4a จะคงนามสกุลเดิมไว้"""
+    stems = {s: os.path.splitext(os.path.relpath(s, in_dir))[0].replace(os.sep, "__") for s in sources}
+    counts = {}
+    for stem in stems.values():
+        counts[stem] = counts.get(stem, 0) + 1
+    return {s: (stem if counts[stem] == 1 else os.path.relpath(s, in_dir).replace(os.sep, "__")) + ".wav"
+            for s, stem in stems.items()}
+
+def bulk_ingest(in_dir=INGEST_IN_DIR, out_dir=INGEST_OUT_DIR, workers=WORKERS, settings=SETTINGS):
+    """
+    แปลงทุกไฟล์เสียงใน in_dir (รวมโฟลเดอร์ย่อย) ไปเป็น WAV ใน out_dir
+    คืนค่า dict สรุป (converted / skipped / errors / files_per_sec / audio_hours_per_sec)
+    """
+    if shutil.which("ffmpeg") is None:
+        print("Error: ffmpeg not found. Install FFmpeg and add it to your PATH.")
+        return None
+
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = load_manifest(out_dir)
+    settings_key = _settings_key(settings)
+    sources = find_sources(in_dir)
+    previous = dict(manifest)
+    outputs = _output_names(in_dir, sources)
+    summary = {"files": len(sources), "converted": 0, "skipped": 0, "errors": 0, "audio_sec": 0.0}
+
+    def work(source):
+        rel = os.path.relpath(source, in_dir)
+        entry = previous.get(rel)
+        sha1, st = _source_hash(source, entry)
+        if is_current(entry, sha1, settings_key, out_dir):
+            return rel, None, "skipped"
+        output = outputs[source]
+        duration = transcode(source, os.path.join(out_dir, output), settings)
+        return rel, {"source_sha1": sha1, "size": st.st_size, "mtime": st.st_mtime,
+                     "settings": settings_key, "output": output, "audio_sec": duration}, "converted"
+
+    print(f"Ingesting {len(sources)} file(s) from {in_dir} with {workers} ffmpeg process(es)...")
+    t0 = time.perf_counter()
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(work, s): s for s in sources}
+        for fut in as_completed(futures):
+            try:
+                rel, entry, status = fut.result()
+            except Exception as e:
+                summary["errors"] += 1
+                print(f"❌ {futures[fut]}: {e}")
+                continue
+            summary[status] += 1
+            if entry:
+                manifest[rel] = entry
+                summary["audio_sec"] += entry["audio_sec"]
+                done += 1
+                if done % MANIFEST_SAVE_EVERY == 0:
+                    save_manifest(out_dir, manifest)
+    save_manifest(out_dir, manifest)
+    elapsed = time.perf_counter() - t0
+
+    summary["seconds"] = elapsed
+    summary["files_per_sec"] = summary["converted"] / max(elapsed, 1e-9)
+    summary["audio_hours_per_sec"] = summary["audio_sec"] / 3600 / max(elapsed, 1e-9)
+    print("\n====================================")
+    print(f"✅ Converted {summary['converted']}, skipped {summary['skipped']} (unchanged), "
+          f"errors {summary['errors']} in {elapsed:.1f} s")
+    print(f"   {summary['files_per_sec']:.2f} files/s, {summary['audio_hours_per_sec']:.4f} audio-hours/s "
+          f"({summary['audio_sec'] / 3600:.2f} h of audio)")
+    print("====================================")
+    return summary
+
+
+if __name__ == "__main__":
+    # ใช้งาน: python bulk_ingest.py [in_dir] [out_dir] [workers]
+    bulk_ingest(
+        sys.argv[1] if len(sys.argv) > 1 else INGEST_IN_DIR,
+        sys.argv[2] if len(sys.argv) > 2 else INGEST_OUT_DIR,
+        int(sys.argv[3]) if len(sys.argv) > 3 else WORKERS,
+    )
@@ -0,0 +1,253 @@
+import os
+import re
+import sys
+import json
+import sqlite3
+import datetime
+
+from case_store import COLUMNS, flatten_parsed
+
+# =========================================================
+# === 1. การตั้งค่า - ดัชนีค้นหา transcript + ฟิลด์ (SQLite FTS5) ===
+# =========================================================
+
+INDEX_DB = "case_index.sqlite"
+
+# ฐานข้อมูลที่สร้าง schema แล้วใน process นี้
+_READY = set()
+
+# คอลัมน์ตัวเลขจาก case_store + คอลัมน์ที่คำนวณเพิ่ม (ด้านที่ยาวที่สุดของก้อน/ชิ้นเนื้อ)
+NUM_COLUMNS = [name for name, kind in COLUMNS if kind == "num"] + ["mass_max", "specimen_max"]
+STR_COLUMNS = [name for name, kind in COLUMNS if kind == "str" and name not in ("case_id", "saved_at")]
+# คอลัมน์ที่สร้าง index ไว้สำหรับ range query
+INDEXED_COLUMNS = ("mass_max", "specimen_max", "surgical_number", "side", "procedure")
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS cases (
+    case_id TEXT PRIMARY KEY,
+    audio_file TEXT,
+    indexed_at TEXT,
+    transcript TEXT,
+    {", ".join(f"{c} TEXT" for c in STR_COLUMNS)},
+    {", ".join(f"{c} REAL" for c in NUM_COLUMNS)}
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS transcripts USING fts5(
+    case_id UNINDEXED, transcript, tokenize = "unicode61 tokenchars '.-'"
+);
+CREATE TABLE IF NOT EXISTS words (
+    case_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    word TEXT NOT NULL,
+    start REAL,
+    end REAL,
+    conf REAL,
+    PRIMARY KEY (case_id, idx)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS words_word ON words (word);
+CREATE TABLE IF NOT EXISTS field_spans (
+    case_id TEXT NOT NULL,
+    field TEXT NOT NULL,
+    start REAL,
+    end REAL,
+    PRIMARY KEY (case_id, field)
+) WITHOUT ROWID;
+""" + "".join(f"CREATE INDEX IF NOT EXISTS cases_{c} ON cases ({c});\n" for c in INDEXED_COLUMNS)
+
+# =========================================================
+# === 2. เชื่อมต่อ / เพิ่มเคส (incremental) ===
+# =========================================================
+
+def connect(db=INDEX_DB):
+    """
+    เปิดฐานข้อมูล (สร้าง schema ถ้ายังไม่มี)
+    ใช้ WAL เพื่อให้ค้นหาได้ระหว่างที่ pipeline กำลังเพิ่มเคสใหม่
+    """
+    conn = sqlite3.connect(db, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA synchronous=NORMAL")
+    # path สัมพัทธ์ชี้ไปคนละไฟล์ได้ถ้า working directory เปลี่ยน -> จำตาม path เต็ม
+    key = os.path.abspath(db)
+    if key not in _READY:
+        # journal_mode=WAL ถูกเก็บไว้ในไฟล์ฐานข้อมูล ตั้งครั้งเดียวพอ
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        _READY.add(key)
+    return conn
+
+def _nan_to_none(value):
+    return None if isinstance(value, float) and value != value else value
+
+def _max_dim(record, prefix, n):
+    dims = [record[f"{prefix}_{i}"] for i in range(1, n + 1) if _nan_to_none(record[f"{prefix}_{i}"]) is not None]
+    return max(dims) if dims else None
+
+def index_case(case_id, transcript, parsed_data, results=None, audio_file=None, db=INDEX_DB):
+    """
+    เพิ่ม/แทนที่เคสหนึ่งเคสในดัชนี (transaction เดียว)
+    results: list ของผลลัพธ์ Vosk (มี "result" = เวลารายคำ) หรือ list ของคำโดยตรง
+    ถ้ามีเวลารายคำ แต่ละฟิลด์จะถูกผูกกับช่วงเวลาในไฟล์เสียงด้วย (ดู field_clips.py)
+    """
+    from field_clips import link_fields
+
+    record = flatten_parsed(parsed_data)
+    record["mass_max"] = _max_dim(record, "mass", 3)
+    record["specimen_max"] = _max_dim(record, "specimen", 3)
+
+    words = []
+    for r in results or []:
+        if "word" in r:
+            words.append(r)
+        else:
+            words.extend(r.get("result", []))
+
+    spans = link_fields(parsed_data, words)
+
+    case_id = str(case_id)
+    columns = ["case_id", "audio_file", "indexed_at", "transcript"] + STR_COLUMNS + NUM_COLUMNS
+    values = [case_id, audio_file, datetime.datetime.now().isoformat(timespec="seconds"), transcript]
+    values += [_nan_to_none(record.get(c)) for c in STR_COLUMNS + NUM_COLUMNS]
+
+    conn = connect(db)
+    try:
+        with conn:
+            conn.execute(f"INSERT OR REPLACE INTO cases ({', '.join(columns)}) "
+                         f"VALUES ({', '.join('?' * len(columns))})", values)
+            conn.execute("DELETE FROM transcripts WHERE case_id = ?", (case_id,))
+            conn.execute("INSERT INTO transcripts (case_id, transcript) VALUES (?, ?)", (case_id, transcript))
+            conn.execute("DELETE FROM words WHERE case_id = ?", (case_id,))
+            conn.executemany(
+                "INSERT INTO words (case_id, idx, word, start, end, conf) VALUES (?, ?, ?, ?, ?, ?)",
+                [(case_id, i, w["word"].lower(), w.get("start"), w.get("end"), w.get("conf"))
+                 for i, w in enumerate(words)],
+            )
+            conn.execute("DELETE FROM field_spans WHERE case_id = ?", (case_id,))
+            conn.executemany("INSERT INTO field_spans (case_id, field, start, end) VALUES (?, ?, ?, ?)",
+                             [(case_id, field, start, end) for field, (start, end) in spans.items()])
+    finally:
+        conn.close()
+    return case_id
+
+def update_fields(case_id, parsed_data, db=INDEX_DB):
+    """อัปเดตเฉพาะคอลัมน์ฟิลด์ของเคสที่มีอยู่แล้ว (transcript / เวลารายคำคงเดิม)"""
+    record = flatten_parsed(parsed_data)
+    record["mass_max"] = _max_dim(record, "mass", 3)
+    record["specimen_max"] = _max_dim(record, "specimen", 3)
+    columns = STR_COLUMNS + NUM_COLUMNS
+    conn = connect(db)
+    try:
+        with conn:
+            cur = conn.execute(f"UPDATE cases SET {', '.join(c + ' = ?' for c in columns)} WHERE case_id = ?",
+                               [_nan_to_none(record.get(c)) for c in columns] + [str(case_id)])
+    finally:
+        conn.close()
+    return cur.rowcount > 0
+
+# =========================================================
+# === 3. ค้นหา (phrase + range) ===
+# =========================================================
+
+def _fts_phrase(phrase):
+    """แปลงข้อความเป็น FTS5 phrase query (ป้องกันอักขระพิเศษของ FTS5)"""
+    return '"' + phrase.replace('"', '""') + '"'
+
+def search(phrase=None, ranges=None, equals=None, limit=100, db=INDEX_DB):
+    """
+    ค้นหาเคสตามวลีใน transcript และ/หรือเงื่อนไขของฟิลด์
+    ranges: {column: (min, max)} (None = ไม่จำกัด) เช่น {"mass_max": (3, None)}
+    equals: {column: value} เช่น {"side": "left"}
+    คืนค่า list ของ dict (คอลัมน์ของตาราง cases ไม่รวม transcript)
+    """
+    where, params = [], []
+    for col, (lo, hi) in (ranges or {}).items():
+        if col not in NUM_COLUMNS:
+            raise ValueError(f"Unknown numeric column: {col}")
+        if lo is not None:
+            where.append(f"c.{col} >= ?")
+            params.append(lo)
+        if hi is not None:
+            where.append(f"c.{col} <= ?")
+            params.append(hi)
+    for col, value in (equals or {}).items():
+        if col not in STR_COLUMNS:
+            raise ValueError(f"Unknown text column: {col}")
+        where.append(f"c.{col} = ?")
+        params.append(value)
+
+    if phrase:
+        sql = "SELECT c.* FROM transcripts t JOIN cases c ON c.case_id = t.case_id WHERE transcripts MATCH ?"
+        params.insert(0, _fts_phrase(phrase.lower()))
+        if where:
+            sql += " AND " + " AND ".join(where)
+    else:
+        sql = "SELECT c.* FROM cases c" + (" WHERE " + " AND ".join(where) if where else "")
+    sql += " LIMIT ?"
+    params.append(limit)
+
+    conn = connect(db)
+    try:
+        rows = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+    return [{k: row[k] for k in row.keys() if k != "transcript"} for row in rows]
+
+def phrase_timings(case_id, phrase, db=INDEX_DB):
+    """
+    คืนค่า list ของ (start, end) ของทุกตำแหน่งที่วลีปรากฏในเคส (จากเวลารายคำ)
+    """
+    tokens = phrase.lower().split()
+    if not tokens:
+        return []
+    conn = connect(db)
+    try:
+        rows = conn.execute("SELECT word, start, end FROM words WHERE case_id = ? ORDER BY idx",
+                            (str(case_id),)).fetchall()
+    finally:
+        conn.close()
+    words = [r["word"] for r in rows]
+    spans = []
+    for i in range(len(words) - len(tokens) + 1):
+        if words[i:i + len(tokens)] == tokens:
+            spans.append((rows[i]["start"], rows[i + len(tokens) - 1]["end"]))
+    return spans
+
+def field_spans(case_id, db=INDEX_DB):
+    """
+    คืนค่า ({ฟิลด์: (start, end)}, audio_file) ของเคส — ใช้กับ field_clips.field_clip
+    """
+    conn = connect(db)
+    try:
+        row = conn.execute("SELECT audio_file FROM cases WHERE case_id = ?", (str(case_id),)).fetchone()
+        rows = conn.execute("SELECT field, start, end FROM field_spans WHERE case_id = ?",
+                            (str(case_id),)).fetchall()
+    finally:
+        conn.close()
+    return {r["field"]: (r["start"], r["end"]) for r in rows}, (row["audio_file"] if row else None)
+
+def count_cases(db=INDEX_DB):
+    conn = connect(db)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM cases").fetchone()[0]
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    # ใช้งาน: python case_index.py search "<phrase>" [column>=value | column<=value | column=value ...]
+    #   เช่น: python case_index.py search "focal necrosis" mass_max>=3
+    if len(sys.argv) >= 2 and sys.argv[1] == "search":
+        args = sys.argv[2:]
+        phrase = args.pop(0) if args and not re.match(r"^\w+(>=|<=|=)", args[0]) else None
+        ranges, equals = {}, {}
+        for cond in args:
+            col, op, value = re.match(r"^(\w+)(>=|<=|=)(.*)$", cond).groups()
+            if op == "=":
+                equals[col] = value
+            else:
+                lo, hi = ranges.get(col, (None, None))
+                ranges[col] = (float(value), hi) if op == ">=" else (lo, float(value))
+        rows = search(phrase, ranges, equals)
+        for r in rows:
+            print(json.dumps(r, ensure_ascii=False))
+        print(f"--- {len(rows)} case(s) of {count_cases()} ---")
+    else:
+        print('Usage: python case_index.py search "<phrase>" [column>=value ...]')
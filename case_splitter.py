@@ -0,0 +1,136 @@
+import os
+import sys
+import time
+import multiprocessing
+
+from vosk_transcrib_breast import transcribe_audio, MODEL_PATH
+from filler_breast import parse_transcribed_text
+from field_specs import SPECS
+from case_store import save_case
+from case_index import index_case
+from render_cache import RENDER_STORE
+import rerender_archive
+
+# =========================================================
+# === 1. การตั้งค่า - แยกไฟล์เสียงที่มีหลายเคส ===
+# =========================================================
+# ถอดความครั้งเดียว แล้วใช้เวลารายคำหาจุดเริ่มเคสใหม่:
+#   - "next case" (ตัดทิ้งคำนี้ และเริ่มเคสใหม่เสมอ)
+#   - "surgical/specimen number/id is ..." (รูปแบบเดียวกับ parse_transcribed_text)
+#     เริ่มเคสใหม่ก็ต่อเมื่อเคสปัจจุบันมีหมายเลขไปแล้ว
+
+SPLIT_OUT_DIR = "split_out"
+NEXT_CASE = (("next",), ("case",))
+CASE_NUMBER = (("surgical", "specimen"), ("number", "id"), ("is", "number"))
+MIN_SEGMENT_WORDS = 3     # ส่วนที่สั้นกว่านี้ถูกรวมเข้ากับเคสก่อนหน้า (เช่นคำพูดหลุด)
+
+# =========================================================
+# === 2. หาจุดแบ่งเคส ===
+# =========================================================
+
+def _matches(tokens, i, pattern):
+    if i + len(pattern) > len(tokens):
+        return False
+    return all(tokens[i + k] in options for k, options in enumerate(pattern))
+
+def split_words(words):
+    """
+    แบ่ง list ของคำ (จาก transcribe_audio(..., with_words=True)) เป็นเคส
+    คืนค่า list ของ dict: {"text", "words", "start", "end"}
+    """
+    tokens = [w["word"].lower() for w in words]
+    segments, current, has_number = [], [], False
+    i = 0
+    while i < len(words):
+        if _matches(tokens, i, NEXT_CASE):
+            segments.append(current)
+            current, has_number = [], False
+            i += len(NEXT_CASE)
+            continue
+        if _matches(tokens, i, CASE_NUMBER):
+            if has_number:
+                segments.append(current)
+                current = []
+            has_number = True
+        current.append(words[i])
+        i += 1
+    segments.append(current)
+
+    merged = []
+    for seg in segments:
+        if not seg:
+            continue
+        if merged and len(seg) < MIN_SEGMENT_WORDS:
+            merged[-1].extend(seg)
+        else:
+            merged.append(list(seg))
+    return [{"text": " ".join(w["word"] for w in seg), "words": seg,
+             "start": seg[0].get("start"), "end": seg[-1].get("end")} for seg in merged]
+
+def segment_case_id(parsed, audio_file, n, total):
+    """ใช้หมายเลข surgical ถ้ามี ไม่เช่นนั้นใช้ <ชื่อไฟล์เสียง>_<ลำดับ>"""
+    stem = os.path.splitext(os.path.basename(audio_file))[0]
+    if parsed.get("surgical_number"):
+        return parsed["surgical_number"]
+    return stem if total == 1 else f"{stem}_{n + 1}"
+
+# =========================================================
+# === 3. parse + render แต่ละเคสแบบขนาน (process pool) ===
+# =========================================================
+
+def _parse_and_render(job):
+    """(segment_text, audio_file, n, total, out_dir) -> (case_id, parsed, output_pdf, status)"""
+    text, audio_file, n, total, out_dir = job
+    parsed = parse_transcribed_text(text, SPECS.current())
+    case_id = segment_case_id(parsed, audio_file, n, total)
+    output_pdf = os.path.join(out_dir, rerender_archive.safe_name(case_id) + ".pdf")
+    _, _, status = rerender_archive.render_job((case_id, parsed, output_pdf))
+    return case_id, parsed, output_pdf, status
+
+def split_and_render(audio_file, out_dir=SPLIT_OUT_DIR, model_path=MODEL_PATH, workers=None, store=RENDER_STORE):
+    """
+    ถอดความไฟล์เสียงครั้งเดียว -> แยกเคส -> parse/วาดแต่ละเคสพร้อมกัน
+    คืนค่า list ของ (case_id, output_pdf)
+    """
+    text, words = transcribe_audio(model_path, audio_file, with_words=True)
+    if text.startswith("Error"):
+        print(text)
+        return []
+
+    segments = split_words(words)
+    if not segments:
+        print("Error: Empty transcript")
+        return []
+    print(f"Found {len(segments)} case(s) in {audio_file}")
+    for n, seg in enumerate(segments):
+        print(f"  [{n + 1}] {seg['start']:.1f}s - {seg['end']:.1f}s: {seg['text'][:60]}...")
+
+    os.makedirs(out_dir, exist_ok=True)
+    template = SPECS.current().template
+    jobs = [(seg["text"], audio_file, n, len(segments), out_dir) for n, seg in enumerate(segments)]
+    workers = workers or min(len(jobs), rerender_archive.WORKERS)
+
+    t0 = time.perf_counter()
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(workers, initializer=rerender_archive.init_worker, initargs=(template, store)) as pool:
+        results = pool.map(_parse_and_render, jobs)
+
+    outputs = []
+    for (case_id, parsed, output_pdf, status), seg in zip(results, segments):
+        if status.startswith("error"):
+            print(f"❌ {case_id}: {status}")
+            continue
+        save_case(case_id, parsed)
+        index_case(case_id, seg["text"], parsed, seg["words"], audio_file=audio_file)
+        outputs.append((case_id, output_pdf))
+        print(f"✅ {case_id} -> {output_pdf} ({status})")
+    print(f"Rendered {len(outputs)} report(s) in {time.perf_counter() - t0:.1f} s")
+    return outputs
+
+
+if __name__ == "__main__":
+    # ใช้งาน: python case_splitter.py <audio.wav> [out_dir]
+    if len(sys.argv) < 2:
+        print("Usage: python case_splitter.py <audio.wav> [out_dir]")
+        sys.exit(1)
+    split_and_render(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else SPLIT_OUT_DIR)
@@ -0,0 +1,237 @@
+import os
+import csv
+import sys
+import json
+import datetime
+import numpy as np
+
+# =========================================================
+# === 1. การตั้งค่า - ที่เก็บข้อมูลที่ parse แล้ว ===
+# =========================================================
+
+# ไฟล์หลัก (append-only JSON Lines) หนึ่งบรรทัดต่อหนึ่งเคส
+CASE_STORE = "parsed_cases.jsonl"
+
+SIDES = ("right", "left")
+PROCEDURES = ("modified radical", "simple", "radical", "total", "partial")
+COLORS = ("white", "yellow", "brown", "grey", "tan", "grey-tan", "grey-white", "dark brown", "yellow-white")
+MARGINS = ("deep", "superior", "inferior", "medial", "lateral", "skin")
+NIPPLES = ("inverted", "everted")
+
+# ค่า nipple ของ parse_breast() -> ตัวเลือกใน choice_groups ของ spec
+NIPPLE_CHOICES = {"inverted": "inverted", "normal": "everted"}
+
+# คอลัมน์ทั้งหมด: (ชื่อ, ชนิด) ชนิด "num" จะถูกแปลงเป็น float (ค่าว่าง = NaN)
+COLUMNS = (
+    [("case_id", "str"), ("saved_at", "str"), ("surgical_number", "str"),
+     ("side", "str"), ("procedure", "str"), ("nipple", "str"), ("quadrant", "str")]
+    + [(f"specimen_{i}", "num") for i in (1, 2, 3)]
+    + [(f"skin_{i}", "num") for i in (1, 2)]
+    + [(f"mass_{i}", "num") for i in (1, 2, 3)]
+    + [(f"margin_{m}", "num") for m in MARGINS]
+    + [("colors", "str")]
+)
+COLUMN_NAMES = [name for name, _ in COLUMNS]
+
+# =========================================================
+# === 2. แปลง dict จาก parser ให้เป็น record แบบแบน ===
+# =========================================================
+
+def _to_float(value):
+    try:
+        return float(str(value).strip().rstrip("."))
+    except (TypeError, ValueError):
+        return float("nan")
+
+def _put_dims(record, prefix, dims, n):
+    dims = list(dims or [])
+    for i in range(n):
+        record[f"{prefix}_{i + 1}"] = _to_float(dims[i]) if i < len(dims) else float("nan")
+
+def flatten_parsed(parsed_data):
+    """
+    รับ dict จาก parse_transcribed_text() (filler_breast.py) หรือ parse_breast() (Filled*.py)
+    แล้วคืนค่า record แบบแบนตาม COLUMNS
+    """
+    targets = parsed_data.get("targets_to_circle", [])
+
+    side = parsed_data.get("side") or next((t for t in targets if t in SIDES), None)
+    procedure = parsed_data.get("procedure") or next((t for t in targets if t in PROCEDURES), None)
+    nipple = parsed_data.get("nipple") or next((t for t in targets if t in NIPPLES), None)
+    colors = list(parsed_data.get("mass_color") or []) + [t for t in targets if t in COLORS]
+    quadrant = " ".join(q for q in (parsed_data.get("quadrant_vert"), parsed_data.get("quadrant_hori")) if q)
+
+    record = {
+        "surgical_number": parsed_data.get("surgical_number") or "",
+        "side": side or "",
+        "procedure": procedure or "",
+        "nipple": nipple or "",
+        "quadrant": quadrant,
+        "colors": "|".join(dict.fromkeys(colors)),
+    }
+    _put_dims(record, "specimen", parsed_data.get("specimen") or parsed_data.get("specimen_dims"), 3)
+    _put_dims(record, "skin", parsed_data.get("skin"), 2)
+    _put_dims(record, "mass", parsed_data.get("mass_dim") or parsed_data.get("mass_dims"), 3)
+
+    margins = parsed_data.get("margins") or {}
+    for m in MARGINS:
+        record[f"margin_{m}"] = _to_float(margins[m]) if m in margins else float("nan")
+    return record
+
+def normalize_parsed(parsed_data):
+    """
+    dict จาก parse_breast() (Filled*.py) -> รูปแบบของ parse_transcribed_text() (filler_breast.py)
+    ที่ draw_parsed_data / corrections ใช้ (ตัวเลือก -> targets_to_circle, ขนาด -> *_dims)
+    ค่าที่รูปแบบนั้นไม่มี (skin, margins, quadrant_*) คงไว้ตามเดิม
+    dict ที่อยู่ในรูปแบบของ filler_breast แล้ว: เติมเฉพาะ key ที่ขาด (เคสเก่าก่อนมี mass_dims)
+    """
+    out = dict(parsed_data)
+    if "targets_to_circle" not in out:
+        targets = [out.pop("side", None), out.pop("procedure", None), NIPPLE_CHOICES.get(out.pop("nipple", None))]
+        targets += list(out.pop("mass_color", None) or [])
+        out["targets_to_circle"] = [t for t in dict.fromkeys(targets) if t]
+        out["specimen_dims"] = out.pop("specimen", None)
+        out["mass_dims"] = out.pop("mass_dim", None)
+    out["surgical_number"] = out.get("surgical_number") or ""
+    for key in ("specimen_dims", "kidney_dims", "ureter_vals", "mass_dims"):
+        out.setdefault(key, None)
+    return out
+
+# =========================================================
+# === 3. บันทึก / โหลด ===
+# =========================================================
+
+def save_case(case_id, parsed_data, store=CASE_STORE):
+    """
+    ต่อท้าย record ของเคสลงใน store (ถ้า case_id ซ้ำ record ล่าสุดจะถูกใช้)
+    เก็บ dict ไว้ใน "parsed" ด้วย เพื่อใช้วาดใหม่/แก้ไขภายหลังโดยไม่ต้องถอดความใหม่
+    "parsed" อยู่ในรูปแบบของ parse_transcribed_text เสมอ (ดู normalize_parsed)
+    "kind" = parser ที่สร้างข้อมูล ("parse_transcribed_text" หรือ "parse_breast")
+    """
+    kind = "parse_transcribed_text" if "targets_to_circle" in parsed_data else "parse_breast"
+    parsed_data = normalize_parsed(parsed_data)
+    record = {"case_id": str(case_id), "saved_at": datetime.datetime.now().isoformat(timespec="seconds"),
+              "kind": kind}
+    record.update(flatten_parsed(parsed_data))
+    record["parsed"] = parsed_data
+    line = json.dumps({k: (None if isinstance(v, float) and v != v else v) for k, v in record.items()},
+                      ensure_ascii=False)
+    with open(store, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+    return record
+
+def load_cases(store=CASE_STORE):
+    """โหลดทุกเคสจาก store (เคสที่บันทึกซ้ำจะใช้ record ล่าสุด)"""
+    cases = {}
+    if not os.path.exists(store):
+        return []
+    with open(store, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            cases[record["case_id"]] = record
+    return list(cases.values())
+
+def load_case(case_id, store=CASE_STORE):
+    """record ล่าสุดของเคสเดียว (หรือ None)"""
+    found = None
+    if not os.path.exists(store):
+        return None
+    with open(store, encoding="utf-8") as f:
+        for line in f:
+            if str(case_id) in line:
+                record = json.loads(line)
+                if record["case_id"] == str(case_id):
+                    found = record
+    return found
+
+def load_columns(store=CASE_STORE):
+    """
+    คืนค่า dict ของคอลัมน์เป็น numpy array (ตัวเลขเป็น float64 + NaN, ข้อความเป็น object)
+    สำหรับงานวิเคราะห์แบบ vectorized
+    """
+    records = load_cases(store)
+    columns = {}
+    for name, kind in COLUMNS:
+        values = [r.get(name) for r in records]
+        if kind == "num":
+            columns[name] = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        else:
+            columns[name] = np.array(["" if v is None else v for v in values], dtype=object)
+    return columns
+
+# =========================================================
+# === 4. Export แบบ bulk (CSV / JSON Lines / Columnar) ===
+# =========================================================
+
+def export_csv(output_csv, store=CASE_STORE):
+    records = load_cases(store)
+    with open(output_csv, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMN_NAMES, extrasaction="ignore")
+        writer.writeheader()
+        for r in records:
+            writer.writerow({k: ("" if r.get(k) is None else r.get(k)) for k in COLUMN_NAMES})
+    return len(records)
+
+def export_jsonl(output_jsonl, store=CASE_STORE):
+    records = load_cases(store)
+    with open(output_jsonl, "w", encoding="utf-8") as f:
+        for r in records:
+            f.write(json.dumps({k: r.get(k) for k in COLUMN_NAMES}, ensure_ascii=False) + "\n")
+    return len(records)
+
+def export_columnar(output_path, store=CASE_STORE):
+    """
+    ส่งออกแบบ columnar: Parquet (ถ้ามี pyarrow) หรือ .npz ของ NumPy (ถ้าไม่มี)
+    คืนค่า path ของไฟล์ที่เขียนจริง
+    """
+    columns = load_columns(store)
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        base = os.path.splitext(output_path)[0] + ".npz"
+        np.savez_compressed(base, **{k: (v.astype(str) if v.dtype == object else v) for k, v in columns.items()})
+        print("⚠ pyarrow not installed, wrote NumPy .npz instead of Parquet")
+        return base
+
+    table = pa.table({k: (v.tolist() if v.dtype == object else v) for k, v in columns.items()})
+    pq.write_table(table, output_path)
+    return output_path
+
+# =========================================================
+# === 5. ตัวอย่างงานวิเคราะห์ (vectorized) ===
+# =========================================================
+
+def mass_size_stats(columns, bins=(0, 1, 2, 3, 5, 10, np.inf)):
+    """
+    สรุปการกระจายขนาดก้อน (ใช้ด้านที่ยาวที่สุด, cm) จากผลของ load_columns()
+    """
+    dims = np.column_stack([columns["mass_1"], columns["mass_2"], columns["mass_3"]])
+    has_mass = ~np.all(np.isnan(dims), axis=1)
+    largest = np.nanmax(dims[has_mass], axis=1) if has_mass.any() else np.array([])
+    counts, edges = np.histogram(largest, bins=np.asarray(bins, dtype=float))
+    return {
+        "cases": int(len(has_mass)),
+        "with_mass": int(has_mass.sum()),
+        "median_cm": float(np.median(largest)) if largest.size else None,
+        "p90_cm": float(np.percentile(largest, 90)) if largest.size else None,
+        "histogram": list(zip(edges[:-1].tolist(), edges[1:].tolist(), counts.tolist())),
+    }
+
+
+if __name__ == "__main__":
+    # ใช้งาน: python case_store.py export <output_prefix>
+    #         python case_store.py stats
+    if len(sys.argv) >= 3 and sys.argv[1] == "export":
+        prefix = sys.argv[2]
+        n = export_csv(prefix + ".csv")
+        export_jsonl(prefix + ".jsonl")
+        path = export_columnar(prefix + ".parquet")
+        print(f"✅ Exported {n} case(s): {prefix}.csv, {prefix}.jsonl, {path}")
+    elif len(sys.argv) >= 2 and sys.argv[1] == "stats":
+        print(json.dumps(mass_size_stats(load_columns()), indent=2))
+    else:
+        print("Usage: python case_store.py export <output_prefix> | stats")
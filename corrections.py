@@ -0,0 +1,189 @@
+import os
+import re
+import sys
+import shutil
+import tempfile
+
+import fitz  # PyMuPDF
+
+from vosk_transcrib_breast import transcribe_audio, MODEL_PATH
+from filler_breast import parse_transcribed_text, draw_parsed_data, FOCAL_TERMS
+from field_clips import normalize_numbers
+from field_specs import SPECS
+from template_layout import FormPages, get_layout, save_form
+from case_store import load_case, save_case, normalize_parsed
+from case_index import update_fields
+from render_cache import render_key, object_path, render_cached, link_output, RENDER_STORE
+
+# =========================================================
+# === 1. การตั้งค่า - กฎการแก้ไขข้อมูลด้วยเสียง ===
+# =========================================================
+# ถอดความเฉพาะคลิปแก้ไขสั้นๆ (เช่น "correction, specimen measuring 2.1 by 1.8 by 1.5")
+# แล้วรวมเข้ากับข้อมูลเดิมของเคสตามกฎด้านล่าง ฟิลด์ที่คลิปไม่ได้พูดถึงจะคงค่าเดิมเสมอ
+#
+#   replace    : ค่าใหม่แทนค่าเดิมทั้งหมด (ถ้าคลิปมีค่านั้น)
+#   per_item   : แทนทีละตำแหน่ง เฉพาะตำแหน่งที่คลิปมีค่า (เช่น ureter ความยาว / เส้นผ่านศูนย์กลาง)
+#   by_group   : ตัวเลือกใหม่แทนตัวเลือกเดิมในกลุ่มเดียวกัน (choice_groups ใน spec) ตัวเลือกอื่นคงเดิม
+#                เฉพาะตัวเลือกที่พูดในคลิปตรงตัว: คลิปแก้ไขถูก parse แบบไม่ fuzzy
+#                (คำที่ใกล้เคียง เช่น "eight" -> right ต้องไม่กลับข้างของเคส)
+OVERRIDE_RULES = {
+    "surgical_number": "replace",
+    "specimen_dims": "replace",
+    "kidney_dims": "replace",
+    "mass_dims": "replace",
+    "ureter_vals": "per_item",
+    "targets_to_circle": "by_group",
+}
+
+# คำนำหน้าคลิปที่ตัดทิ้งก่อน parse
+CORRECTION_PREFIX = re.compile(r"^\s*(?:correction|correct that|amend(?:ment)?)\b[\s,.:]*", re.IGNORECASE)
+
+# =========================================================
+# === 2. รวมข้อมูล ===
+# =========================================================
+
+def _as_list(value):
+    return list(value) if isinstance(value, (list, tuple)) else value
+
+def merge_correction(stored, correction, spec=None):
+    """
+    คืนค่า (merged, changed) — changed คือ dict {field: ค่าที่ต้องวาดเพิ่ม} ของฟิลด์ที่เปลี่ยน
+    """
+    spec = spec or SPECS.current()
+    merged = dict(stored)
+    changed = {}
+
+    for field, rule in OVERRIDE_RULES.items():
+        new = correction.get(field)
+        old = stored.get(field)
+        if not new:
+            continue
+
+        if rule == "replace":
+            value = new
+        elif rule == "per_item":
+            old_items = list(old or [None] * len(new))
+            value = [n if n else o for n, o in zip(new, old_items)]
+        elif rule == "by_group":
+            value = list(old or [])
+            for opt in new:
+                group = next((g for g in spec.choice_groups
+                              if opt in (spec.lexicon.canonical(o) for o in g)), None)
+                if group:
+                    canon = {spec.lexicon.canonical(o) for o in group}
+                    value = [v for v in value if v not in canon]
+                if opt == "without":
+                    # "without focal ..." ยกเลิกผล focal ที่เคยวงไว้ด้วย
+                    value = [v for v in value if v not in FOCAL_TERMS]
+                if opt not in value:
+                    value.append(opt)
+        else:
+            raise ValueError(f"Unknown override rule for {field}: {rule}")
+
+        if _as_list(value) != _as_list(old):
+            merged[field] = value
+            changed[field] = value
+    return merged, changed
+
+def _is_additive(stored, merged, changed):
+    """True ถ้าทุกฟิลด์ที่เปลี่ยนเป็นการเพิ่มค่าใหม่ ไม่ได้แก้ค่าที่วาดไว้แล้ว"""
+    for field in changed:
+        old = stored.get(field)
+        if field == "targets_to_circle":
+            if not set(old or []) <= set(merged[field]):
+                return False
+        elif old:
+            return False
+    return True
+
+# =========================================================
+# === 3. วาดใหม่เฉพาะฟิลด์ที่เปลี่ยน ===
+# =========================================================
+
+def rerender_changed(stored, merged, changed, output_pdf, spec=None, store=RENDER_STORE):
+    """
+    ถ้าการแก้ไขเป็นการเพิ่มค่า: วาดเฉพาะฟิลด์ที่เปลี่ยนลงบน PDF เดิม (บันทึกแบบ incremental)
+    ถ้าแก้ค่าที่วาดไว้แล้ว: วาดใหม่จาก template ผ่าน render cache
+    คืนค่า (object_path, mode)
+    """
+    spec = spec or SPECS.current()
+    template = spec.template
+    new_obj = object_path(render_key(merged, template, spec), store)
+    old_obj = object_path(render_key(stored, template, spec), store)
+
+    if os.path.exists(new_obj):
+        link_output(new_obj, output_pdf)
+        return new_obj, "cached"
+
+    if not (_is_additive(stored, merged, changed) and os.path.exists(old_obj)):
+        obj, _ = render_cached(merged, output_pdf, template, spec, store)
+        return obj, "full"
+
+    # เฉพาะส่วนที่เพิ่ม: ตัวเลือกใหม่ + ฟิลด์ตัวเลขที่เปลี่ยน (ฟิลด์อื่นว่าง)
+    delta = {field: None for field in merged}
+    delta["targets_to_circle"] = []
+    delta.update(changed)
+    if "targets_to_circle" in changed:
+        delta["targets_to_circle"] = [t for t in merged["targets_to_circle"]
+                                      if t not in (stored.get("targets_to_circle") or [])]
+
+    fd, tmp = tempfile.mkstemp(suffix=".pdf", dir=os.path.dirname(old_obj))
+    os.close(fd)
+    try:
+        shutil.copyfile(old_obj, tmp)
+        form = FormPages(fitz.open(tmp), get_layout(template), tmp)
+        draw_parsed_data(form, delta, spec)
+        save_form(form)
+        os.makedirs(os.path.dirname(new_obj), exist_ok=True)
+        os.replace(tmp, new_obj)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    link_output(new_obj, output_pdf)
+    return new_obj, "incremental"
+
+# =========================================================
+# === 4. Workflow ===
+# =========================================================
+
+def apply_correction(case_id, clip_file, output_pdf, model_path=MODEL_PATH):
+    """
+    ถอดความคลิปแก้ไข -> รวมกับข้อมูลเดิมของเคส -> บันทึก -> วาดใหม่เฉพาะส่วนที่เปลี่ยน
+    คืนค่า dict ที่รวมแล้ว (หรือ None ถ้าทำไม่สำเร็จ)
+    """
+    record = load_case(case_id)
+    if not record or "parsed" not in record:
+        print(f"Error: No stored parsed data for case {case_id}")
+        return None
+
+    text = transcribe_audio(model_path, clip_file)
+    if text.startswith("Error"):
+        print(text)
+        return None
+    # ตัวเลขเป็นคำ ("twelve by eight by three") -> ตัวเลข เพื่อให้ regex ของขนาดจับได้
+    text = normalize_numbers(CORRECTION_PREFIX.sub("", text))
+    print(f"[correction] {case_id}: {text}")
+
+    spec = SPECS.current()
+    # เคสจาก Filled*.py ถูกเก็บในรูปแบบของ parse_breast
+    stored = normalize_parsed(record["parsed"])
+    merged, changed = merge_correction(stored, parse_transcribed_text(text, spec, fuzzy=False), spec)
+    if not changed:
+        print("[correction] No field changed")
+        return stored
+
+    for field, value in changed.items():
+        print(f"[correction] {field}: {stored.get(field)} -> {value}")
+    save_case(case_id, merged)
+    update_fields(case_id, merged)
+    obj, mode = rerender_changed(stored, merged, changed, output_pdf, spec)
+    print(f"✅ Correction applied ({mode}) -> {output_pdf}")
+    return merged
+
+
+if __name__ == "__main__":
+    # ใช้งาน: python corrections.py <case_id> <correction.wav> <output.pdf>
+    if len(sys.argv) < 4:
+        print("Usage: python corrections.py <case_id> <correction.wav> <output.pdf>")
+        sys.exit(1)
+    apply_correction(sys.argv[1], sys.argv[2], sys.argv[3])
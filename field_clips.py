@@ -0,0 +1,223 @@
+import io
+import os
+import re
+import sys
+import wave
+import shutil
+import subprocess
+
+# =========================================================
+# === 1. การตั้งค่า - คลิปเสียงหลักฐานของแต่ละฟิลด์ ===
+# =========================================================
+# ตอนสร้างดัชนี (case_index.index_case) แต่ละฟิลด์ที่ parse ได้ถูกผูกกับช่วงเวลาในไฟล์เสียง
+# จากเวลารายคำของ recognizer เมื่อผู้ตรวจสงสัยค่าใด เปิดฟังเฉพาะช่วงนั้นได้ทันที
+# WAV: seek ไปยัง frame ที่ต้องการแล้วอ่านเฉพาะช่วงนั้น
+# ไฟล์บีบอัด (MP3/M4A/...): ffmpeg -ss ก่อน -i (seek ในไฟล์ ไม่ถอดรหัสตั้งแต่ต้นไฟล์)
+
+CLIP_DIR = "field_clips"
+PAD_SEC = 0.3            # เผื่อเสียงก่อน/หลังช่วงของคำ (วินาที)
+
+# คำนำหน้าค่าของฟิลด์ (แต่ละตำแหน่งคือ tuple ของคำที่ใช้ได้ เหมือน case_splitter)
+# ช่วงของฟิลด์ = ตั้งแต่คำนำหน้าจนถึงคำสุดท้ายของค่า
+FIELD_CUES = {
+    "surgical_number": (("surgical", "specimen"), ("number", "id"), ("is", "number")),
+    "specimen_dims": (("specimen",), ("measuring", "measures")),
+    "specimen": (("measuring", "measures"),),
+    "kidney_dims": (("kidney",), ("measures",)),
+    "ureter_length": (("ureter",), ("measures",)),
+    "ureter_diameter": (("length",), ("and",)),
+    "skin": (("skin",),),
+    "mass_dim": (("mass",),),
+    "mass_dims": (("mass",), ("measures", "measuring")),
+}
+
+NUMBER_VALUES = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14,
+    "fifteen": 15, "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19,
+    "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50, "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90,
+}
+UNITS = {"centimeter": "cm", "centimeters": "cm", "centimetre": "cm", "centimetres": "cm", "by": "x"}
+
+# =========================================================
+# === 2. ผูกฟิลด์กับช่วงเวลา ===
+# =========================================================
+
+def _is_number(token):
+    return re.fullmatch(r"\d+(?:\.\d+)?\.?", token) is not None
+
+def _tokens(text):
+    return [t for t in re.split(r"[\s-]+", str(text).lower()) if t]
+
+def normalized_tokens(words):
+    """
+    คำจาก recognizer -> list ของ [token, index คำแรก, index คำสุดท้าย]
+    ตัวเลขที่เป็นคำถูกแปลงเป็นตัวเลข ("twenty five" -> "25", "two point five" -> "2.5")
+    และ "by" -> "x", "centimeters" -> "cm" ให้ตรงกับค่าที่ parser คืนมา
+    """
+    out = []
+    for i, w in enumerate(words):
+        for part in _tokens(w["word"]):
+            if part in NUMBER_VALUES:
+                part = str(NUMBER_VALUES[part])
+                # "twenty" + "five" -> "25"
+                if out and out[-1][3] and out[-1][2] == i - 1 and int(part) < 10:
+                    out[-1] = [str(int(out[-1][0]) + int(part)), out[-1][1], i, False]
+                    continue
+                out.append([part, i, i, int(part) >= 20])
+            else:
+                out.append([UNITS.get(part, part), i, i, False])
+    merged = []
+    for tok in out:
+        # "2" "point" "5" -> "2.5"
+        if len(merged) >= 2 and merged[-1][0] == "point" and _is_number(merged[-2][0]) and _is_number(tok[0]):
+            merged[-2:] = [[merged[-2][0] + "." + tok[0], merged[-2][1], tok[2]]]
+        else:
+            merged.append(tok[:3])
+    return merged
+
+def normalize_numbers(text):
+    """ข้อความ -> ข้อความที่ตัวเลขเป็นตัวเลข ("twelve by eight" -> "12 x 8") ด้วยกฎเดียวกับ normalized_tokens"""
+    return " ".join(tok[0] for tok in normalized_tokens([{"word": w} for w in str(text).split()]))
+
+def _same(token, value):
+    if token == value:
+        return True
+    if _is_number(token) and _is_number(value):
+        return float(token.rstrip(".")) == float(value.rstrip("."))
+    return False
+
+def _find(tokens, pattern, start=0):
+    """index แรกที่ pattern (list ของ tuple คำที่ใช้ได้) ตรงกับ tokens หรือ None"""
+    for i in range(start, len(tokens) - len(pattern) + 1):
+        if all(any(_same(tokens[i + k][0], opt) for opt in options) for k, options in enumerate(pattern)):
+            return i
+    return None
+
+def _field_values(parsed):
+    """(ชื่อฟิลด์, token ของค่า) จาก dict ของ parser (filler_breast หรือ Filled*.py)"""
+    for key, value in parsed.items():
+        if not value:
+            continue
+        if key == "ureter_vals":
+            for name, v in zip(("ureter_length", "ureter_diameter"), value):
+                if v:
+                    yield name, _tokens(v)
+        elif key == "margins":
+            for margin, v in value.items():
+                yield f"margins:{margin}", _tokens(v) + ["cm", "from", margin]
+        elif isinstance(value, (list, tuple)):
+            if all(_is_number(str(v)) for v in value):
+                yield key, _tokens(" x ".join(str(v) for v in value))
+            else:
+                for item in value:
+                    yield f"{key}:{item}", _tokens(item)
+        else:
+            yield key, _tokens(value)
+
+def link_fields(parsed, words):
+    """
+    คืนค่า dict: ชื่อฟิลด์ -> (start, end) วินาที ในไฟล์เสียง
+    ฟิลด์ในรายการ (เช่น targets_to_circle) ใช้ชื่อ "<ฟิลด์>:<ค่า>" เช่น "targets_to_circle:firm"
+    """
+    if not words:
+        return {}
+    tokens = normalized_tokens(words)
+    spans = {}
+    for field, value in _field_values(parsed):
+        if not value:
+            continue
+        pattern = [(v,) for v in value]
+        cue = FIELD_CUES.get(field)
+        first = _find(tokens, cue) if cue else None
+        at = _find(tokens, pattern, first + len(cue) if first is not None else 0)
+        if at is None:
+            # ไม่พบหลังคำนำหน้า (ASR ฟังคำนำหน้าผิด) -> ใช้ตำแหน่งแรกของค่าเอง
+            first, at = None, _find(tokens, pattern)
+            if at is None:
+                continue
+        w0 = tokens[first if first is not None else at][1]
+        w1 = tokens[at + len(pattern) - 1][2]
+        if words[w0].get("start") is not None and words[w1].get("end") is not None:
+            spans[field] = (words[w0]["start"], words[w1]["end"])
+    return spans
+
+# =========================================================
+# === 3. อ่านเฉพาะช่วงของไฟล์เสียง ===
+# =========================================================
+
+def _wav_bytes(pcm, channels, sampwidth, rate):
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as out:
+        out.setnchannels(channels)
+        out.setsampwidth(sampwidth)
+        out.setframerate(rate)
+        out.writeframes(pcm)
+    return buf.getvalue()
+
+def clip_wav(audio_file, start, end, pad=PAD_SEC):
+    """
+    คืนค่า bytes ของไฟล์ WAV ช่วง [start - pad, end + pad] วินาที ของ audio_file
+    อ่านเฉพาะช่วงนั้น (WAV: seek ตาม frame, ไฟล์อื่น: ffmpeg input seeking)
+    """
+    start = max(0.0, start - pad)
+    end = end + pad
+    if audio_file.lower().endswith(".wav"):
+        with wave.open(audio_file, "rb") as wf:
+            rate = wf.getframerate()
+            first = min(int(start * rate), wf.getnframes())
+            wf.setpos(first)
+            pcm = wf.readframes(max(0, min(int(end * rate), wf.getnframes()) - first))
+            return _wav_bytes(pcm, wf.getnchannels(), wf.getsampwidth(), rate)
+
+    if shutil.which("ffmpeg") is None:
+        raise RuntimeError("ffmpeg not found. Install FFmpeg and add it to your PATH.")
+    cmd = ["ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error",
+           "-ss", f"{start:.3f}", "-t", f"{end - start:.3f}", "-i", audio_file,
+           "-vn", "-c:a", "pcm_s16le", "-f", "wav", "pipe:1"]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.decode("utf-8", "replace").strip() or f"ffmpeg exit {proc.returncode}")
+    return proc.stdout
+
+def field_clip(case_id, field, out_path=None, pad=PAD_SEC, db=None):
+    """
+    คลิปเสียงของฟิลด์หนึ่งของเคส (จาก case_index) คืนค่า bytes ของ WAV หรือ None ถ้าไม่มีช่วงเวลา
+    out_path: บันทึกเป็นไฟล์ด้วย
+    """
+    from case_index import field_spans, INDEX_DB
+
+    spans, audio_file = field_spans(case_id, db or INDEX_DB)
+    if field not in spans:
+        print(f"Error: No time span for field '{field}' of case {case_id}")
+        return None
+    if not audio_file or not os.path.exists(audio_file):
+        print(f"Error: Audio file not found at {audio_file}")
+        return None
+    data = clip_wav(audio_file, *spans[field], pad=pad)
+    if out_path:
+        os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+        with open(out_path, "wb") as f:
+            f.write(data)
+    return data
+
+
+if __name__ == "__main__":
+    # ใช้งาน: python field_clips.py <case_id>            (แสดงช่วงเวลาของทุกฟิลด์)
+    #         python field_clips.py <case_id> <field>    (บันทึกคลิปไว้ใน CLIP_DIR)
+    if len(sys.argv) < 2:
+        print("Usage: python field_clips.py <case_id> [field]")
+        sys.exit(1)
+    case_id = sys.argv[1]
+    if len(sys.argv) == 2:
+        from case_index import field_spans
+        spans, audio_file = field_spans(case_id)
+        print(f"Case {case_id} ({audio_file}):")
+        for field, (start, end) in sorted(spans.items(), key=lambda kv: kv[1]):
+            print(f"  {field:<40} {start:7.2f} s - {end:7.2f} s")
+    else:
+        field = sys.argv[2]
+        name = re.sub(r"[^\w.-]", "_", f"{case_id}_{field}") + ".wav"
+        out = os.path.join(CLIP_DIR, name)
+        if field_clip(case_id, field, out) is not None:
+            print(f"✅ Clip saved to {out}")
@@ -0,0 +1,120 @@
+import os
+import json
+import time
+import threading
+
+from term_matcher import DomainLexicon
+
+# =========================================================
+# === 1. การตั้งค่า - Field spec จากไฟล์ข้อมูล (hot-reload) ===
+# =========================================================
+# กลุ่มตัวเลือก, anchor และ template ของแบบฟอร์มเก็บใน form_specs/*.json
+# แก้ไฟล์แล้วระบบจะโหลดใหม่เอง โดยไม่ต้อง restart (ไม่ต้องโหลดโมเดล Vosk ใหม่)
+
+SPEC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "form_specs")
+SPEC_FILE = os.path.join(SPEC_DIR, "breast_fields.json")
+POLL_INTERVAL = 1.0   # ตรวจ mtime ของไฟล์ไม่บ่อยกว่านี้ (วินาที)
+
+REQUIRED_KEYS = ("template", "choice_groups", "anchors")
+
+# =========================================================
+# === 2. Spec (snapshot ที่ไม่เปลี่ยนระหว่างใช้งาน) ===
+# =========================================================
+
+class FieldSpec:
+    """
+    snapshot ของ spec หนึ่งเวอร์ชัน เคสที่กำลังประมวลผลถือ snapshot เดิมไว้จนจบ
+    แม้ว่าจะมีการโหลด spec ใหม่ระหว่างทาง
+    """
+    def __init__(self, data, source, mtime):
+        missing = [k for k in REQUIRED_KEYS if k not in data]
+        if missing:
+            raise ValueError(f"spec {source} is missing: {missing}")
+
+        self.source = source
+        self.mtime = mtime
+        self.template = data["template"]
+        if not os.path.isabs(self.template):
+            self.template = os.path.join(os.path.dirname(os.path.dirname(source)), self.template)
+        self.choice_groups = [list(group) for group in data["choice_groups"]]
+        self.anchors = {name: dict(a) for name, a in data["anchors"].items()}
+        self.fuzzy_min_confidence = float(data.get("fuzzy_min_confidence", 0.75))
+        # วลีตัวอย่างสำหรับ domain LM ของ N-best rescoring ("{a|b}" = ตัวเลือก)
+        self.lm_phrases = list(data.get("lm_phrases", []))
+        # fuzzy match เฉพาะคำที่อยู่ใกล้คำนำของกลุ่ม (key = ตัวเลือกใดก็ได้ในกลุ่ม)
+        # กลุ่มที่ไม่มีคำนำจะไม่ถูกเติมแบบ fuzzy เลย
+        self.fuzzy_cues = {DomainLexicon.canonical(k): list(v) for k, v in data.get("fuzzy_cues", {}).items()}
+        # ตัวเลือกที่ต้องพูดตรงตัวเท่านั้น (เช่น ข้าง ซ้าย/ขวา) คำที่ใกล้เคียงจะถูกแจ้งให้ยืนยันแทนการเติม
+        self.exact_only = {DomainLexicon.canonical(o) for o in data.get("exact_only", [])}
+        # วลีที่ ASR ฟังผิดบ่อยและรู้ค่าที่ถูก ("nipple is averted" -> inverted)
+        self.aliases = {k.lower(): v for k, v in data.get("aliases", {}).items()}
+
+        terms = [opt for group in self.choice_groups for opt in group] + list(data.get("extra_terms", []))
+        self.lexicon = DomainLexicon(terms)
+
+    def cues_for(self, options):
+        """คำนำสำหรับ fuzzy match ของกลุ่มตัวเลือก (ว่าง = ไม่ fuzzy)"""
+        cues = []
+        for opt in options:
+            cues += self.fuzzy_cues.get(DomainLexicon.canonical(opt), [])
+        return list(dict.fromkeys(cues))
+
+def load_spec(path=SPEC_FILE):
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return FieldSpec(data, path, os.path.getmtime(path))
+
+# =========================================================
+# === 3. SpecStore: โหลดใหม่อัตโนมัติเมื่อไฟล์เปลี่ยน ===
+# =========================================================
+
+class SpecStore:
+    """
+    current() คืนค่า FieldSpec ล่าสุด (ตรวจ mtime ไม่บ่อยกว่า POLL_INTERVAL)
+    การสลับ spec เป็นการแทนที่ reference เดียว (atomic) หลังจากสร้างและตรวจ spec ใหม่ครบแล้ว
+    ถ้าไฟล์ใหม่ผิดรูปแบบ จะใช้ spec เดิมต่อและแจ้งเตือน
+    """
+    def __init__(self, path=SPEC_FILE, poll_interval=POLL_INTERVAL):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._spec = load_spec(path)
+        self._checked = time.monotonic()
+        self._lock = threading.Lock()
+        self._watcher = None
+
+    def current(self):
+        if time.monotonic() - self._checked >= self.poll_interval:
+            self.refresh()
+        return self._spec
+
+    def refresh(self):
+        """โหลด spec ใหม่ถ้าไฟล์ถูกแก้ไข คืนค่า True ถ้ามีการสลับ"""
+        with self._lock:
+            self._checked = time.monotonic()
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                return False
+            if mtime == self._spec.mtime:
+                return False
+            try:
+                spec = load_spec(self.path)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f"⚠ Spec reload failed, keeping previous version: {e}")
+                return False
+            self._spec = spec
+        print(f"[spec] reloaded {self.path}")
+        return True
+
+    def watch(self):
+        """เริ่ม thread เบื้องหลังที่ตรวจไฟล์ทุก poll_interval วินาที"""
+        if self._watcher is None:
+            def loop():
+                while True:
+                    time.sleep(self.poll_interval)
+                    self.refresh()
+            self._watcher = threading.Thread(target=loop, name="spec-watcher", daemon=True)
+            self._watcher.start()
+        return self
+
+SPECS = SpecStore()
@@ -13,6 +13,9 @@ except ImportError:
     # หากไม่สามารถนำเข้าได้ ให้หยุดการทำงาน
     sys.exit(1)
 
+from field_specs import SPECS
+from template_layout import open_form, save_form
+
 # =========================================================
 # === 1. การตั้งค่า - ไฟล์และ Mapping (ใช้ข้อความ Anchor) ===
 # =========================================================
@@ -26,35 +29,82 @@ PDF_OUT = "Breast_gross_form_onepag_filled.pdf" + datetime.datetime.now().strfti
 # (ส่วนนี้ใช้ได้แล้ว จึงคงไว้ตามเดิม)
 # =========================================================
 
-def parse_transcribed_text(transcript):
+# กลุ่มตัวเลือก / anchor / ดัชนีคำศัพท์ อยู่ใน form_specs/breast_fields.json (ดู field_specs.py)
+# ส่ง spec เข้ามาเพื่อให้ทั้งเคสใช้ spec เวอร์ชันเดียวกัน (ไม่ส่ง = ใช้เวอร์ชันล่าสุด)
+
+# ผล "with/without focal ..." กลุ่ม with/without อยู่ใน choice_groups (ให้ corrections แทนค่ากันได้)
+# แต่ต้องตัดสินจากวลี focal ด้านล่าง ไม่ใช่จากคำว่า "with" ที่ไหนก็ได้ในประโยค
+FOCAL_GROUP = ("with", "without")
+FOCAL_TERMS = ("focal hemorrhage", "focal necrosis")
+
+def parse_transcribed_text(transcript, spec=None, fuzzy=True):
+    """
+    fuzzy=False: นับเฉพาะตัวเลือกที่พูดตรงตัว (หรือตรงกับ aliases) เช่น คลิปแก้ไขใน corrections.py
+    """
+    spec = spec or SPECS.current()
+    lexicon = spec.lexicon
+
     # 2.0 ทำความสะอาดข้อความ (รวมถึงการแปลง 'point' และ 'by' เป็นสัญลักษณ์)
     transcript_cleaned = transcript.lower().replace(" point ", ".").replace(" by ", " x ")
+    # รูปแบบเดียวกับคำศัพท์ของ lexicon ("well - defined" -> "well-defined")
+    transcript_canon = lexicon.canonical(transcript_cleaned)
 
     # -- 2a) PARSE CHOICES --
+    needs_confirmation = []
+
+    def exact(opt):
+        # "well-defined" ตรงกับ "well-defined" / "well - defined" / "well defined"
+        pattern = re.escape(lexicon.canonical(opt)).replace(r"\-", r"[\s-]*")
+        return re.search(rf"\b{pattern}\b", transcript_canon) is not None
+
+    def near_misses(options):
+        # คำที่ ASR ฟังผิด (เช่น "necrossis" -> "necrosis") เฉพาะคำที่อยู่ใกล้คำนำของกลุ่มนี้
+        cues = spec.cues_for(options)
+        if not fuzzy or not cues:
+            return []
+        wanted = {lexicon.canonical(o) for o in options}
+        return [hit for hit in lexicon.match_text(transcript_cleaned, spec.fuzzy_min_confidence, near=cues)
+                if hit[0] in wanted]
+
     def pick_one(options):
         for opt in options:
-            if re.search(rf"\b{re.escape(opt)}\b", transcript_cleaned):
+            if exact(opt):
                 return opt
-        return None
+        for phrase, target in spec.aliases.items():
+            if target in options and re.search(rf"\b{re.escape(phrase)}\b", transcript_canon):
+                print(f"[alias] '{phrase}' -> '{target}'")
+                return target
+        hits = near_misses(options)
+        if not hits:
+            return None
+        term, conf, _, raw = hits[0]
+        if term in spec.exact_only:
+            # ค่าที่ผิดแล้วอันตราย (ข้างซ้าย/ขวา) ไม่เติมจากคำที่ใกล้เคียง ให้ผู้ตรวจยืนยัน
+            print(f"⚠ [fuzzy] '{raw}' may be '{term}' (confidence {conf:.2f}) - not filled, needs confirmation")
+            needs_confirmation.append(term)
+            return None
+        print(f"[fuzzy] '{raw}' -> '{term}' (confidence {conf:.2f})")
+        return term
 
     choices_to_find = []
-    for group in [
-        ["previously opened"], ["right", "left"], ["radical", "total", "partial"],
-        ["attached", "separated"], ["homogeneous", "inhomogeneous"], 
-        ["well-defined", "ill-defined", "well - defined", "ill - defined"],
-        ["papillary", "cauliflower", "well-encapsulated", "well - encapsulated"],
-        ["soft", "firm", "hard"],
-        ["white", "yellow", "brown", "grey", "tan", "grey-tan", "grey-white", "dark brown"],
-    ]:
+    for group in spec.choice_groups:
+        if tuple(group) == FOCAL_GROUP:
+            continue
         val = pick_one(group)
         if val:
-            choices_to_find.append(val.replace(" - ", "-"))
+            choices_to_find.append(val)
 
-    if "with" in transcript_cleaned and ("focal hemorrhage" in transcript_cleaned or "focal necrosis" in transcript_cleaned):
+    focal = [t for t in FOCAL_TERMS if exact(t)]
+    if not focal:
+        for term, conf, _, raw in near_misses(FOCAL_TERMS):
+            print(f"[fuzzy] '{raw}' -> '{term}' (confidence {conf:.2f})")
+            focal.append(term)
+    if re.search(r"\bwithout\s+(?:focal|hemorrhage|necrosis)", transcript_canon):
+        choices_to_find.append("without")
+    elif focal:
         choices_to_find.append("with")
-        if "focal hemorrhage" in transcript_cleaned: choices_to_find.append("focal hemorrhage")
-        if "focal necrosis" in transcript_cleaned: choices_to_find.append("focal necrosis")
-    elif "without" in transcript_cleaned:
+        choices_to_find.extend(dict.fromkeys(focal))
+    elif re.search(r"\bwithout\b", transcript_canon):
         choices_to_find.append("without")
 
     seen = set()
@@ -82,20 +132,36 @@ def parse_transcribed_text(transcript):
     # 4. Surgical Number
     m_surgical = re.search(r"(?:surgical|specimen)\s+(?:number|id)\s+(?:is|number)\s*(\d+)", transcript_cleaned)
     surgical_number = m_surgical.group(1) if m_surgical else ""
+
+    # 5. Mass
+    m_mass = re.search(r"mass (?:measures|measuring)\s*([\d.]+)\s*x\s*([\d.]+)\s*x\s*([\d.]+)", transcript_cleaned)
+    mass_dims = m_mass.groups() if m_mass else None
     
-    return {
+    parsed = {
         'targets_to_circle': targets,
         'surgical_number': surgical_number,
         'specimen_dims': specimen_dims,
         'kidney_dims': kidney_dims,
         'ureter_vals': ureter_vals,
+        'mass_dims': mass_dims,
     }
+    if needs_confirmation:
+        parsed['needs_confirmation'] = needs_confirmation
+    return parsed
 
 
 # =========================================================
 # === 3. ฟังก์ชัน Helpers สำหรับ PyMuPDF (fitz) === 
 # =========================================================
 
+def _locate(page, text):
+    """
+    คืนค่า (page ที่พบ, hits) — page อาจเป็น FormPages (ค้นได้หลายหน้า) หรือ page เดียวก็ได้
+    """
+    if hasattr(page, "locate"):
+        return page.locate(text)
+    return page, page.search_for(text)
+
 def write_after_anchor(page, anchor_text_list, to_write, dx=6, dy=-2, box_width=260, fontsize=10):
     """
     ค้นหา 'anchor_text' (สามารถเป็น List ของตัวเลือกได้) แล้ววาด 'to_write' ลงในกล่องข้อความที่กำหนด
@@ -105,13 +171,13 @@ def write_after_anchor(page, anchor_text_list, to_write, dx=6, dy=-2, box_width=
         anchor_text_list = [anchor_text_list]
         
     for anchor_text in anchor_text_list:
-        hits = page.search_for(anchor_text)
+        target, hits = _locate(page, anchor_text)
         if hits:
             anchor = hits[0] 
             x_start = anchor.x1 + dx
             # สร้าง Rect สำหรับกล่องข้อความ
             rect = fitz.Rect(x_start, anchor.y0 - 2, x_start + box_width, anchor.y1 + 10) 
-            page.insert_textbox(rect, to_write, fontsize=fontsize, fontname="helv", color=(0, 0, 0), align=0)
+            target.insert_textbox(rect, to_write, fontsize=fontsize, fontname="helv", color=(0, 0, 0), align=0)
             print(f"[write] FOUND anchor '{anchor_text}' -> Wrote '{to_write}'")
             return True # คืนค่า True ทันทีที่เขียนสำเร็จ
             
@@ -120,7 +186,7 @@ def write_after_anchor(page, anchor_text_list, to_write, dx=6, dy=-2, box_width=
 
 def circle_word(page, word, max_hits=1):
     # (ฟังก์ชันนี้ใช้ได้แล้ว จึงคงไว้ตามเดิม)
-    hits = page.search_for(word)
+    page, hits = _locate(page, word)
     count = 0
     for rect in hits:
         pad = 1.5
@@ -138,16 +204,15 @@ def circle_word(page, word, max_hits=1):
 # === 4. ฟังก์ชันหลักในการวาดข้อมูลลง PDF === (ใช้ PyMuPDF)
 # =========================================================
 
-def draw_data_on_pdf(input_pdf, output_pdf, parsed_data):
-    
-    if not os.path.exists(input_pdf):
-        print(f"Error: Input PDF file not found at {input_pdf}")
-        return
-        
-    doc = fitz.open(input_pdf)
-    page = doc[0] 
+def _write_field(page, spec, field, to_write):
+    a = spec.anchors[field]
+    return write_after_anchor(page, a["anchors"], to_write, dx=a.get("dx", 6), box_width=a.get("box_width", 260))
 
-    print("\n--- Starting PDF Drawing ---")
+def draw_parsed_data(page, parsed_data, spec=None):
+    """
+    วาดข้อมูลที่ parse แล้วลงบน page (วงกลมตัวเลือก + ตัวเลข) โดยไม่เปิด/บันทึกไฟล์
+    """
+    spec = spec or SPECS.current()
 
     # A. CIRCLE CHECKBOX WORDS (ทำเครื่องหมายตัวเลือก)
     print("\n--- Circling Checkbox/Radio Options ---")
@@ -160,43 +225,45 @@ def draw_data_on_pdf(input_pdf, output_pdf, parsed_data):
             
     # B. FILL NUMBERS BY ANCHOR (กรอกข้อมูลตัวเลข)
     
-    # 1. Surgical Number (ลองค้นหาหลายรูปแบบ)
+    # (anchor หลายรูปแบบต่อฟิลด์ เผื่อการพิมพ์ผิดใน template กำหนดไว้ใน spec)
+
+    # 1. Surgical Number
     if parsed_data['surgical_number']:
-        # ลองใช้ anchor หลายตัวเผื่อการพิมพ์ผิดใน template
-        anchors = ["Surgical number:", "Surgical No:", "Specimen No:"]
-        write_after_anchor(page, anchors, parsed_data['surgical_number'], dx=100, box_width=100)
+        _write_field(page, spec, "surgical_number", parsed_data['surgical_number'])
         
     # 2. Specimen Dimensions 
     if parsed_data['specimen_dims']:
-        dims_str = " x ".join(parsed_data['specimen_dims']) + " cm"
-        # ลองค้นหา anchor หลายรูปแบบ
-        anchors = ["specimen measuring", "specimen measures"]
-        write_after_anchor(page, anchors, dims_str, dx=150, box_width=100)
+        _write_field(page, spec, "specimen_dims", " x ".join(parsed_data['specimen_dims']) + " cm")
     
     # 3. Kidney Dimensions 
     if parsed_data['kidney_dims']:
-        dims_str = " x ".join(parsed_data['kidney_dims']) + " cm"
-        # ลองค้นหา anchor ทั้งตัวใหญ่/เล็ก และรูปแบบอื่น
-        anchors = ["The kidney measures", "the kidney measures", "kidney measures"]
-        write_after_anchor(page, anchors, dims_str, dx=100, box_width=100)
+        _write_field(page, spec, "kidney_dims", " x ".join(parsed_data['kidney_dims']) + " cm")
             
     # 4. Ureter Length & Diameter 
     if parsed_data['ureter_vals']:
-        # Length
-        length_txt = parsed_data['ureter_vals'][0] + " cm"
-        anchors_length = ["ureter measures", "The ureter measures"]
-        write_after_anchor(page, anchors_length, length_txt, dx=100, box_width=50) 
-        
-        # Diameter 
+        _write_field(page, spec, "ureter_length", parsed_data['ureter_vals'][0] + " cm")
         if parsed_data['ureter_vals'][1]:
-            diam_txt = parsed_data['ureter_vals'][1] + " cm"
-            anchors_diameter = ["in length and", "in length, and"]
-            write_after_anchor(page, anchors_diameter, diam_txt, dx=10, box_width=50)
+            _write_field(page, spec, "ureter_diameter", parsed_data['ureter_vals'][1] + " cm")
+
+    # 5. Mass Dimensions (เคสที่บันทึกก่อนมีฟิลด์นี้ไม่มี key)
+    if parsed_data.get('mass_dims'):
+        _write_field(page, spec, "mass_dims", " x ".join(parsed_data['mass_dims']) + " cm")
+
+def draw_data_on_pdf(input_pdf, output_pdf, parsed_data, spec=None):
+    
+    if not os.path.exists(input_pdf):
+        print(f"Error: Input PDF file not found at {input_pdf}")
+        return
+        
+    # เปิดทุกหน้าของ template: ค้นหา anchor ได้ทุกหน้า แต่แก้เฉพาะหน้าที่มีการวาด
+    form = open_form(input_pdf, output_pdf)
+
+    print("\n--- Starting PDF Drawing ---")
+    draw_parsed_data(form, parsed_data, spec)
             
-    # C. บันทึกไฟล์ใหม่
-    doc.save(output_pdf)
-    doc.close()
-    print(f"\n✅ PDF Drawing Complete. New report saved as: {output_pdf}")
+    # C. บันทึกไฟล์ใหม่ (incremental: เขียนเพิ่มเฉพาะหน้าที่ถูกแก้)
+    pages = save_form(form)
+    print(f"\n✅ PDF Drawing Complete. New report saved as: {output_pdf} (page(s) updated: {pages})")
 
 
 # =========================================================
@@ -207,7 +274,7 @@ if __name__ == "__main__":
     
     # 1. ถอดความเสียง (ใช้ Vosk)
     print("\n--- Starting Transcription (Vosk) ---")
-    transcribed_text = transcribe_audio(MODEL_PATH, AUDIO_FILE)
+    transcribed_text, words = transcribe_audio(MODEL_PATH, AUDIO_FILE, with_words=True)
     
     if transcribed_text.startswith("Error:"):
         print(f"\nFATAL ERROR: {transcribed_text}")
@@ -221,6 +288,14 @@ if __name__ == "__main__":
         parsed_data = parse_transcribed_text(transcribed_text)
         
         print("\n[PARSED DATA]:", parsed_data)
+
+        # เก็บข้อมูลที่ parse แล้วไว้สำหรับ export / วิเคราะห์ภายหลัง
+        from case_store import save_case
+        from case_index import index_case
+        case_id = parsed_data['surgical_number'] or os.path.splitext(os.path.basename(PDF_OUT))[0]
+        save_case(case_id, parsed_data)
+        index_case(case_id, transcribed_text, parsed_data, words, audio_file=AUDIO_FILE)
         
-        # 3. วาดข้อมูลลง PDF
-        draw_data_on_pdf(PDF_IN, PDF_OUT, parsed_data)
\ No newline at end of file
+        # 3. วาดข้อมูลลง PDF (ผ่าน render cache: ข้อมูลเดิม = ไม่วาดซ้ำ, ไฟล์ซ้ำ = hard link)
+        from render_cache import render_cached
+        render_cached(parsed_data, PDF_OUT, PDF_IN)
\ No newline at end of file
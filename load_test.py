@@ -0,0 +1,298 @@
+import io
+import os
+import sys
+import time
+import wave
+import random
+import threading
+import contextlib
+
+import numpy as np
+
+from asr_backends import Backend, ReplayRecognizer, parse_spec
+from vosk_transcrib_breast import load_model, iter_decode, MODEL_PATH
+from filler_breast import parse_transcribed_text
+from render_cache import render_cached
+from field_specs import SPECS
+from prefork_workers import memory_info
+
+# =========================================================
+# === 1. การตั้งค่า - จำลองแพทย์หลายคนบอกผลพร้อมกัน ===
+# =========================================================
+# แต่ละ session ป้อนเสียงทีละ chunk ตามเวลาจริง (หรือเร็วกว่า SPEEDUP เท่า) ผ่าน iter_decode
+# แล้ว parse + วาด PDF แบบเดียวกับ pipeline
+# ถ้าไม่มีโมเดล (หรือ model_path = "stub") จะใช้ stub recognizer ที่ปล่อยคำบอกผลตัวอย่างตามเวลาเสียง (แบบ ReplayBackend)
+# PDF และ render store ของการทดสอบแยกอยู่ใน LOAD_OUT_DIR (ไม่ปนกับ case_store / render_store จริง)
+
+LOAD_OUT_DIR = "loadtest_out"
+CONCURRENCY = 20             # จำนวน session พร้อมกัน
+SPEEDUP = 1.0                # 1.0 = เวลาจริง, 10 = เร็วกว่าเวลาจริง 10 เท่า, 0 = เร็วที่สุด
+SOAK_SEC = 0                 # > 0: วนซ้ำจนครบเวลานี้ (soak test), 0 = แต่ละ session เล่นครบ corpus หนึ่งรอบ
+CHUNK_FRAMES = 4000
+MEMORY_SAMPLE_SEC = 1.0      # ความถี่ในการวัดหน่วยความจำ
+WARMUP_SEC = 5.0             # ไม่นับช่วงแรก (โหลดโมเดล/template) ในการคำนวณการโตของหน่วยความจำ
+
+# เสียงสังเคราะห์ (เมื่อไม่มี corpus)
+SYNTH_DIR = os.path.join(LOAD_OUT_DIR, "synth")
+SYNTH_FILES = 4
+SYNTH_SECONDS = (20, 60)     # ความยาวสุ่มในช่วงนี้ (วินาที)
+SAMPLE_RATE = 16000
+
+# คำบอกผลตัวอย่างของ stub recognizer ({n} = หมายเลขเคสไม่ซ้ำ เพื่อไม่ให้ render cache hit ทุกเคส)
+STUB_DICTATION = (
+    "surgical number is {n} . received in formalin is a right total mastectomy "
+    "specimen measuring 18 x 12 x 4 cm . the nipple is inverted . "
+    "cut sections show a firm grey-white mass measuring 2.5 x 2 x 1.8 cm with focal necrosis"
+)
+STUB_WORDS_PER_SENTENCE = 8
+
+# =========================================================
+# === 2. Corpus (WAV จริงหรือสังเคราะห์) ===
+# =========================================================
+
+def synth_wav(path, seconds, rate=SAMPLE_RATE, seed=0):
+    """PCM 16-bit mono ที่ดูคล้ายเสียงพูด: พยางค์ (tone + noise) สลับกับช่วงเงียบ"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * rate)) / rate
+    envelope = (np.sin(2 * np.pi * 3.0 * t) > 0.2) * (rng.random(t.size) * 0.1 + 0.9)
+    voice = 0.3 * np.sin(2 * np.pi * 140 * t) + 0.15 * np.sin(2 * np.pi * 280 * t)
+    signal = envelope * voice + 0.01 * rng.standard_normal(t.size)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes((np.clip(signal, -1, 1) * 32767).astype("<i2").tobytes())
+    return path
+
+def load_corpus(paths=None):
+    """WAV ที่ระบุ (หรือทุก .wav ในโฟลเดอร์) ถ้าไม่มีจะสร้างเสียงสังเคราะห์ใน SYNTH_DIR"""
+    files = []
+    for p in paths or []:
+        if os.path.isdir(p):
+            files += sorted(os.path.join(p, f) for f in os.listdir(p) if f.lower().endswith(".wav"))
+        elif p.lower().endswith(".wav"):
+            files.append(p)
+    if files:
+        return files
+    rng = random.Random(0)
+    return [synth_wav(os.path.join(SYNTH_DIR, f"synth_{i}.wav"), rng.uniform(*SYNTH_SECONDS), seed=i)
+            for i in range(SYNTH_FILES)]
+
+def wav_seconds(path):
+    with wave.open(path, "rb") as wf:
+        return wf.getnframes() / wf.getframerate()
+
+# =========================================================
+# === 3. Stub recognizer (แทนโมเดลที่ไม่มีในเครื่อง) ===
+# =========================================================
+
+def stub_results(seconds, n):
+    """ผลลัพธ์แบบ Vosk ของ STUB_DICTATION ที่กระจายคำเท่าๆ กันตลอดความยาวเสียง"""
+    tokens = STUB_DICTATION.format(n=n).split()
+    step = seconds / (len(tokens) + 1)
+    words = [{"word": tok, "start": (i + 0.5) * step, "end": (i + 1.2) * step, "conf": 1.0}
+             for i, tok in enumerate(tokens)]
+    return [{"text": " ".join(w["word"] for w in chunk), "result": chunk}
+            for chunk in (words[i:i + STUB_WORDS_PER_SENTENCE]
+                          for i in range(0, len(words), STUB_WORDS_PER_SENTENCE))]
+
+class StubBackend(Backend):
+    """เล่นคำบอกผลตัวอย่างแบบ ReplayBackend โดยไม่ต้องมีไฟล์ .replay.json (audio_id = "<wav>#<n>")"""
+    name = "stub"
+    model_path = "stub"
+
+    def recognizer(self, sample_rate, audio_id=None, offset_sec=0.0):
+        path, _, n = audio_id.rpartition("#")
+        return ReplayRecognizer(stub_results(wav_seconds(path), n), sample_rate, offset_sec=offset_sec)
+
+def load_recognizer_backend(model_path):
+    """โมเดลจริงถ้ามี ไม่เช่นนั้นใช้ StubBackend"""
+    if model_path != "stub":
+        _, path = parse_spec(model_path)
+        if not path or os.path.exists(path):
+            return load_model(model_path)
+    print(f"Model not available ({model_path}): using stub recognizer")
+    return StubBackend()
+
+# =========================================================
+# === 4. Session และการวัดผล ===
+# =========================================================
+
+def percentile(values, p):
+    """nearest-rank percentile (p = 0-100)"""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(np.ceil(p / 100 * len(values))) - 1))]
+
+class LoadTest:
+    def __init__(self, corpus, model_path=MODEL_PATH, concurrency=CONCURRENCY, speedup=SPEEDUP,
+                 soak_sec=SOAK_SEC, out_dir=LOAD_OUT_DIR):
+        self.corpus = corpus
+        self.backend = load_recognizer_backend(model_path)
+        self.concurrency = concurrency
+        self.speedup = speedup
+        self.soak_sec = soak_sec
+        self.out_dir = out_dir
+        self.store = os.path.join(out_dir, "render_store")
+        self.spec = SPECS.current()
+        self.records = []            # หนึ่ง dict ต่อ session ที่จบแล้ว
+        self.memory = []             # (เวลาตั้งแต่เริ่ม, RSS MB)
+        self._lock = threading.Lock()
+        # PyMuPDF ไม่ thread-safe: วาดทีละเคส เหมือน render worker เดียวของ pipeline
+        self._render_lock = threading.Lock()
+        self._seq = 0
+        self._stop = threading.Event()
+
+    def _next_n(self):
+        with self._lock:
+            self._seq += 1
+            return self._seq
+
+    def _session(self, wav_path, n):
+        """ป้อนเสียงหนึ่งไฟล์ตามเวลาจริง -> parse -> render คืนค่า record ของ session"""
+        t_start = time.perf_counter()
+        with wave.open(wav_path, "rb") as wf:
+            rate = wf.getframerate()
+            audio_sec = wf.getnframes() / rate
+            decode_busy = 0.0
+            audio_id = f"{wav_path}#{n}" if isinstance(self.backend, StubBackend) else wav_path
+            steps = iter_decode(self.backend, wf, chunk_frames=CHUNK_FRAMES, audio_id=audio_id)
+            while True:
+                t0 = time.perf_counter()
+                try:
+                    pos = next(steps)
+                except StopIteration as done:
+                    results = done.value
+                    decode_busy += time.perf_counter() - t0
+                    break
+                decode_busy += time.perf_counter() - t0
+                if self.speedup:
+                    # chunk ถัดไปยังไม่ "ถูกพูด" จนถึงเวลานี้
+                    delay = t_start + pos / rate / self.speedup - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+        # เวลาที่เสียงส่วนสุดท้ายมาถึง = จุดเริ่มนับ latency ที่ผู้ใช้รู้สึก
+        # (โหมดเร็วที่สุด: เสียงทั้งหมดมาถึงตั้งแต่เริ่ม)
+        t_audio_end = t_start + audio_sec / self.speedup if self.speedup else t_start
+
+        text = " ".join(r.get("text", "") for r in results).strip()
+        parsed = parse_transcribed_text(text, self.spec)
+        output_pdf = os.path.join(self.out_dir, "pdf", f"session_{n}.pdf")
+        # ข้อความ log ของการวาดทีละเคสไม่จำเป็นระหว่าง load test (เหมือน rerender_archive)
+        with self._render_lock, contextlib.redirect_stdout(io.StringIO()):
+            _, hit = render_cached(parsed, output_pdf, self.spec.template, self.spec, store=self.store)
+        t_end = time.perf_counter()
+        return {"n": n, "audio": wav_path, "audio_sec": audio_sec, "decode_sec": decode_busy,
+                "latency": t_end - t_audio_end, "total": t_end - t_start, "cache_hit": hit}
+
+    def _worker(self, index):
+        # แต่ละ session เริ่มที่ไฟล์ต่างกัน แล้วไล่ไปตาม corpus
+        k = index
+        while not self._stop.is_set():
+            wav_path = self.corpus[k % len(self.corpus)]
+            k += 1
+            try:
+                record = self._session(wav_path, self._next_n())
+            except Exception as e:
+                record = {"audio": wav_path, "error": str(e)}
+                print(f"❌ [session {index}] {wav_path}: {e}")
+            with self._lock:
+                self.records.append(record)
+            if not self.soak_sec and k - index >= len(self.corpus):
+                break
+
+    def _sample_memory(self, t0):
+        while not self._stop.wait(MEMORY_SAMPLE_SEC):
+            rss = memory_info()["rss"]
+            if rss is not None:
+                self.memory.append((time.perf_counter() - t0, rss))
+
+    def run(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        mode = f"{self.speedup:g}x real time" if self.speedup else "as fast as possible"
+        span = f"soak {self.soak_sec:g} s" if self.soak_sec else "one pass over the corpus per session"
+        print(f"Load test: {self.concurrency} session(s), {len(self.corpus)} file(s), {mode}, {span}")
+
+        t0 = time.perf_counter()
+        start_rss = memory_info()["rss"]
+        if start_rss is not None:
+            self.memory.append((0.0, start_rss))
+        sampler = threading.Thread(target=self._sample_memory, args=(t0,), daemon=True)
+        sampler.start()
+        workers = [threading.Thread(target=self._worker, args=(i,), name=f"session-{i}", daemon=True)
+                   for i in range(self.concurrency)]
+        for t in workers:
+            t.start()
+        if self.soak_sec:
+            # หยุดเริ่ม session ใหม่เมื่อครบเวลา session ที่กำลังทำอยู่จะเล่นจนจบ
+            time.sleep(self.soak_sec)
+            self._stop.set()
+        for t in workers:
+            t.join()
+        self._stop.set()
+        sampler.join()
+        end_rss = memory_info()["rss"]
+        wall = time.perf_counter() - t0
+        if end_rss is not None:
+            self.memory.append((wall, end_rss))
+        return self.report(wall)
+
+    def memory_growth(self):
+        """(RSS เริ่ม, RSS สูงสุด, RSS สุดท้าย, ความชันหลัง warm-up เป็น MB/ชั่วโมง)"""
+        if not self.memory:
+            return None
+        rss = [m for _, m in self.memory]
+        steady = [(t, m) for t, m in self.memory if t >= WARMUP_SEC]
+        slope = None
+        if len(steady) >= 2 and steady[-1][0] > steady[0][0]:
+            t, m = np.array(steady).T
+            slope = float(np.polyfit(t, m, 1)[0]) * 3600
+        return rss[0], max(rss), rss[-1], slope
+
+    def report(self, wall):
+        ok = [r for r in self.records if "error" not in r]
+        latencies = [r["latency"] for r in ok]
+        audio_sec = sum(r["audio_sec"] for r in ok)
+        summary = {
+            "sessions": len(self.records),
+            "errors": len(self.records) - len(ok),
+            "seconds": wall,
+            "sessions_per_min": len(ok) / max(wall, 1e-9) * 60,
+            "audio_sec_per_sec": audio_sec / max(wall, 1e-9),
+            "decode_rtf": sum(r["decode_sec"] for r in ok) / max(audio_sec, 1e-9),
+            "cache_hits": sum(1 for r in ok if r["cache_hit"]),
+            "latency_p50": percentile(latencies, 50),
+            "latency_p95": percentile(latencies, 95),
+            "latency_p99": percentile(latencies, 99),
+            "memory": self.memory_growth(),
+        }
+
+        def sec(v):
+            return f"{v:.2f} s" if v is not None else "n/a"
+
+        print("\n====================================")
+        print(f"Load test finished in {wall:.1f} s")
+        print("====================================")
+        print(f"Sessions: {len(ok)} ok, {summary['errors']} error(s), {summary['cache_hits']} render cache hit(s)")
+        print(f"Throughput: {summary['sessions_per_min']:.1f} sessions/min, "
+              f"{summary['audio_sec_per_sec']:.2f} audio-sec/s (decode RTF {summary['decode_rtf']:.3f})")
+        print(f"Latency after end of audio: p50 {sec(summary['latency_p50'])}, "
+              f"p95 {sec(summary['latency_p95'])}, p99 {sec(summary['latency_p99'])}")
+        if summary["memory"]:
+            first, peak, last, slope = summary["memory"]
+            trend = f", trend {slope:+.1f} MB/h after warm-up" if slope is not None else ""
+            print(f"Memory (RSS): start {first:.0f} MB, peak {peak:.0f} MB, end {last:.0f} MB{trend}")
+        return summary
+
+
+if __name__ == "__main__":
+    # ใช้งาน: python load_test.py [concurrency] [speedup] [soak_sec] [wav files / folders ...]
+    # เช่น python load_test.py 20 1            (20 session เวลาจริง เสียงสังเคราะห์)
+    #      python load_test.py 20 10 3600 recordings/   (soak 1 ชั่วโมง เร็ว 10 เท่า)
+    args = sys.argv[1:]
+    concurrency = int(args[0]) if len(args) > 0 else CONCURRENCY
+    speedup = float(args[1]) if len(args) > 1 else SPEEDUP
+    soak_sec = float(args[2]) if len(args) > 2 else SOAK_SEC
+    LoadTest(load_corpus(args[3:]), MODEL_PATH, concurrency, speedup, soak_sec).run()
@@ -0,0 +1,160 @@
+import re
+import math
+
+from asr_backends import Backend, Recognizer
+from field_specs import SPECS
+
+# =========================================================
+# === 1. การตั้งค่า - เลือก N-best ด้วยคำศัพท์ของแบบฟอร์ม ===
+# =========================================================
+# โมเดลเล็กมักเลือกคำผิดที่เสียงใกล้กัน ("averted" แทน "inverted", "ten" แทน "tan")
+# ขอหลายตัวเลือกจาก recognizer แล้วให้คะแนนใหม่ด้วย bigram LM ที่สร้างจาก field spec
+# (choice_groups + extra_terms + lm_phrases + anchor ตามด้วยตัวเลข) แล้วเลือกตัวเลือกที่คะแนนรวมสูงสุด
+
+ACOUSTIC_WEIGHT = 1.0    # น้ำหนักของคะแนนจาก recognizer (เทียบกับอันดับ 1)
+LM_WEIGHT = 0.5          # น้ำหนักของ log-prob จาก domain LM
+BIGRAM_LAMBDA = 0.5      # interpolation ระหว่าง bigram กับ unigram
+OOV_MASS = 0.05          # ความน่าจะเป็นรวมของคำนอกคำศัพท์แบบฟอร์ม
+OOV_VOCAB = 10000        # ขนาดคำศัพท์ทั่วไปโดยประมาณ (กระจาย OOV_MASS)
+
+NUM = "<num>"
+NUMBER_WORDS = {
+    "zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten",
+    "eleven", "twelve", "thirteen", "fourteen", "fifteen", "sixteen", "seventeen", "eighteen",
+    "nineteen", "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety", "hundred",
+}
+# รูปแบบของตัวเลขขนาดที่พบบ่อยในการบอกขนาด
+NUMBER_PHRASES = ["<num> by <num> by <num>", "<num> x <num> x <num>", "<num> point <num>", "<num> cm"]
+
+# =========================================================
+# === 2. Domain LM ===
+# =========================================================
+
+def expand_phrase(phrase):
+    """"{soft|firm} mass" -> ["soft mass", "firm mass"]"""
+    m = re.search(r"\{([^{}]*)\}", phrase)
+    if not m:
+        return [phrase]
+    return [expanded for option in m.group(1).split("|")
+            for expanded in expand_phrase(phrase[:m.start()] + option + phrase[m.end():])]
+
+def tokenize(text):
+    tokens = re.findall(r"[a-z]+|\d+(?:\.\d+)?|<num>", text.lower())
+    return [NUM if t in NUMBER_WORDS or t[0].isdigit() else t for t in tokens]
+
+class DomainLM:
+    """
+    bigram LM เล็กๆ จากวลีของแบบฟอร์ม คำนอกคำศัพท์ได้ความน่าจะเป็นต่ำคงที่
+    จึงวัดได้ว่าตัวเลือกไหน "เข้ากับแบบฟอร์ม" มากกว่า
+    """
+    def __init__(self, phrases):
+        self.unigrams = {}
+        self.bigrams = {}
+        self.contexts = {}
+        for phrase in phrases:
+            prev = "<s>"
+            for tok in tokenize(phrase):
+                self.unigrams[tok] = self.unigrams.get(tok, 0) + 1
+                self.bigrams[(prev, tok)] = self.bigrams.get((prev, tok), 0) + 1
+                self.contexts[prev] = self.contexts.get(prev, 0) + 1
+                prev = tok
+        self.total = sum(self.unigrams.values()) or 1
+
+    @classmethod
+    def from_spec(cls, spec):
+        phrases = [opt for group in spec.choice_groups for opt in group]
+        phrases += spec.lexicon.terms
+        phrases += [p for template in spec.lm_phrases for p in expand_phrase(template)]
+        for a in spec.anchors.values():
+            phrases += [f"{anchor} <num>" for anchor in a["anchors"]]
+        return cls(phrases + NUMBER_PHRASES)
+
+    def _unigram(self, tok):
+        if tok in self.unigrams:
+            return (1 - OOV_MASS) * self.unigrams[tok] / self.total
+        return OOV_MASS / OOV_VOCAB
+
+    def logprob(self, text):
+        score, prev = 0.0, "<s>"
+        for tok in tokenize(text):
+            p = (1 - BIGRAM_LAMBDA) * self._unigram(tok)
+            if self.contexts.get(prev):
+                p += BIGRAM_LAMBDA * self.bigrams.get((prev, tok), 0) / self.contexts[prev]
+            else:
+                p += BIGRAM_LAMBDA * self._unigram(tok)
+            score += math.log(p)
+            prev = tok
+        return score
+
+# LM ต่อ spec (สร้างใหม่อัตโนมัติเมื่อ spec ถูกโหลดใหม่)
+_LMS = {}
+
+def lm_for(spec):
+    if _LMS.get("spec") is not spec:
+        _LMS.update(spec=spec, lm=DomainLM.from_spec(spec))
+    return _LMS["lm"]
+
+# =========================================================
+# === 3. Rescore ===
+# =========================================================
+
+def _with_agreement(words, alternatives):
+    """
+    เพิ่ม "agreement" รายคำ = สัดส่วนของตัวเลือกที่มีคำเดียวกันในช่วงเวลาเดียวกัน
+    "conf" (ความมั่นใจจาก recognizer ถ้ามี) คงไว้ตามเดิม: สองค่านี้วัดคนละอย่าง ใช้เกณฑ์คนละค่า
+    """
+    n = len(alternatives)
+    out = []
+    for w in words:
+        votes = sum(1 for alt in alternatives if any(
+            o["word"] == w["word"] and o["start"] < w["end"] and w["start"] < o["end"]
+            for o in alt.get("result", [])))
+        out.append(dict(w, agreement=votes / n if n else 1.0))
+    return out
+
+def rescore(result, lm, acoustic_weight=ACOUSTIC_WEIGHT, lm_weight=LM_WEIGHT):
+    """
+    เลือกตัวเลือกที่ดีที่สุดจาก result["alternatives"] แล้วคืนค่า result ในรูปแบบปกติ
+    ("text"/"result" ของตัวเลือกที่เลือก, เพิ่ม "rescored_from" = อันดับเดิมของตัวเลือกนั้น)
+    """
+    alts = [a for a in result.get("alternatives", []) if a.get("text")]
+    if not alts:
+        return result
+    best_ac = max(a.get("confidence", 0.0) for a in alts)
+    scores = [acoustic_weight * (a.get("confidence", 0.0) - best_ac) + lm_weight * lm.logprob(a["text"])
+              for a in alts]
+    i = max(range(len(alts)), key=scores.__getitem__)
+    return {
+        "text": alts[i]["text"],
+        "result": _with_agreement(alts[i].get("result", []), alts),
+        "alternatives": result["alternatives"],
+        "rescored_from": i,
+    }
+
+class RescoringRecognizer(Recognizer):
+    def __init__(self, inner, lm):
+        self._inner = inner
+        self._lm = lm
+
+    def accept(self, pcm_bytes):
+        return self._inner.accept(pcm_bytes)
+
+    def result(self):
+        return rescore(self._inner.result(), self._lm)
+
+    def final_result(self):
+        return rescore(self._inner.final_result(), self._lm)
+
+class RescoringBackend(Backend):
+    """
+    ครอบ backend ที่ขอ N-best ไว้แล้ว (max_alternatives > 0) ให้คืนผลลัพธ์ที่ rescore แล้ว
+    ใช้ spec ล่าสุด ณ ตอนสร้าง recognizer (หนึ่งไฟล์ใช้ LM เดียว)
+    """
+    def __init__(self, inner, max_alternatives):
+        self.inner = inner
+        self.name = inner.name
+        self.model_path = f"{getattr(inner, 'model_path', inner.name)}#nbest{max_alternatives}"
+
+    def recognizer(self, sample_rate, audio_id=None, offset_sec=0.0):
+        inner = self.inner.recognizer(sample_rate, audio_id=audio_id, offset_sec=offset_sec)
+        return RescoringRecognizer(inner, lm_for(SPECS.current()))
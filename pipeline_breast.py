@@ -0,0 +1,205 @@
+import os
+import sys
+import time
+import hashlib
+import queue
+import threading
+
+from tran import convert_audio_for_vosk
+from vosk_transcrib_breast import transcribe_audio, MODEL_PATH
+from filler_breast import parse_transcribed_text
+from render_cache import render_cached
+from field_specs import SPECS
+from case_store import save_case
+from case_index import index_case
+from case_splitter import split_words, segment_case_id
+
+# =========================================================
+# === 1. การตั้งค่า - Pipeline 3 ขั้น (decode / recognize / render) ===
+# =========================================================
+
+WORK_DIR = "pipeline_work"       # ไฟล์ WAV ที่แปลงแล้ว
+OUTPUT_DIR = "pipeline_out"      # PDF ที่กรอกแล้ว
+QUEUE_SIZE = 2                   # ขนาดคิวระหว่างขั้น (bounded)
+WORKERS = {"decode": 1, "recognize": 1, "render": 1}
+
+_STOP = object()
+
+# =========================================================
+# === 2. Stage (worker threads + metrics) ===
+# =========================================================
+
+class Stage:
+    """
+    หนึ่งขั้นของ pipeline: อ่านจาก in_q -> เรียก func -> ส่งต่อไป out_q
+    เก็บเวลาทำงาน (busy), จำนวนงาน และความลึกของคิวขาเข้าเพื่อดูว่าขั้นไหนเป็นคอขวด
+    """
+    def __init__(self, name, func, in_q, out_q, workers=1):
+        self.name = name
+        self.func = func
+        self.in_q = in_q
+        self.out_q = out_q
+        self.workers = workers
+        self.done = 0
+        self.errors = 0
+        self.busy_sec = 0.0
+        self.depth_samples = []
+        self._alive = workers
+        self._lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True)
+                         for i in range(workers)]
+
+    def start(self):
+        for t in self._threads:
+            t.start()
+
+    def join(self):
+        for t in self._threads:
+            t.join()
+
+    def _run(self):
+        while True:
+            self.depth_samples.append(self.in_q.qsize())
+            item = self.in_q.get()
+            if item is _STOP:
+                with self._lock:
+                    self._alive -= 1
+                    last = self._alive == 0
+                if last:
+                    # worker สุดท้ายของขั้นนี้ส่งสัญญาณหยุดต่อไปยังขั้นถัดไป
+                    if self.out_q is not None:
+                        self.out_q.put(_STOP)
+                else:
+                    self.in_q.put(_STOP)
+                return
+
+            t0 = time.perf_counter()
+            try:
+                result = self.func(item)
+            except Exception as e:
+                result = None
+                print(f"❌ [{self.name}] {item[0]}: {e}")
+            elapsed = time.perf_counter() - t0
+
+            with self._lock:
+                self.busy_sec += elapsed
+                if result is None:
+                    self.errors += 1
+                else:
+                    self.done += 1
+            if result is not None and self.out_q is not None:
+                self.out_q.put(result)
+
+    def metrics(self, wall_sec):
+        depths = self.depth_samples or [0]
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "done": self.done,
+            "errors": self.errors,
+            "utilisation": self.busy_sec / max(wall_sec * self.workers, 1e-9),
+            "avg_queue_depth": sum(depths) / len(depths),
+            "max_queue_depth": max(depths),
+        }
+
+# =========================================================
+# === 3. งานของแต่ละขั้น ===
+# =========================================================
+
+def audio_case_id(audio_file):
+    """
+    id ของงานต่อไฟล์เสียง: <ชื่อไฟล์>_<SHA-1 ของ path เต็ม 8 ตัวแรก>
+    ไฟล์ชื่อซ้ำจากคนละโฟลเดอร์ (เช่น dictation/<วันที่>/case1.wav) จึงไม่ทับกันทั้งใน WORK_DIR และ OUTPUT_DIR
+    """
+    stem = os.path.splitext(os.path.basename(audio_file))[0]
+    digest = hashlib.sha1(os.path.abspath(audio_file).encode("utf-8")).hexdigest()[:8]
+    return f"{stem}_{digest}"
+
+def decode_step(item):
+    """(case_id, source_audio) -> (case_id, wav_path)"""
+    case_id, source = item
+    wav_path = os.path.join(WORK_DIR, f"{case_id}.wav")
+    convert_audio_for_vosk(source, wav_path)
+    if not os.path.exists(wav_path):
+        return None
+    return case_id, wav_path
+
+def recognize_step(item):
+    """(case_id, wav_path) -> (case_id, transcribed_text, words, wav_path)"""
+    case_id, wav_path = item
+    text, words = transcribe_audio(MODEL_PATH, wav_path, with_words=True)
+    if text.startswith("Error:"):
+        print(f"❌ [recognize] {case_id}: {text}")
+        return None
+    return case_id, text, words, wav_path
+
+def render_step(item):
+    """(case_id, transcribed_text, words, wav_path) -> (case_id, [output_pdf, ...])"""
+    case_id, text, words, wav_path = item
+    # ใช้ spec เวอร์ชันเดียวตลอดทั้งไฟล์ แม้จะมีการโหลด spec ใหม่ระหว่างทาง
+    spec = SPECS.current()
+    # ไฟล์เดียวอาจมีหลายเคส ("next case" / หมายเลข surgical ใหม่) ดู case_splitter.py
+    segments = split_words(words) or [{"text": text, "words": words}]
+    outputs = []
+    for n, seg in enumerate(segments):
+        parsed_data = parse_transcribed_text(seg["text"], spec)
+        # หมายเลข surgical ถ้ามี ไม่เช่นนั้นใช้ id ของงาน (ชื่อ wav ใน WORK_DIR = audio_case_id ของไฟล์ต้นฉบับ)
+        seg_id = segment_case_id(parsed_data, wav_path, n, len(segments))
+        save_case(seg_id, parsed_data)
+        index_case(seg_id, seg["text"], parsed_data, seg["words"], audio_file=wav_path)
+        output_pdf = os.path.join(OUTPUT_DIR, f"{seg_id}.pdf")
+        # เคสที่ข้อมูล/template ไม่เปลี่ยนจะไม่ถูกวาดใหม่ (ดู render_cache.py)
+        render_cached(parsed_data, output_pdf, spec.template, spec)
+        outputs.append(output_pdf)
+    return case_id, outputs
+
+# =========================================================
+# === 4. รัน pipeline ===
+# =========================================================
+
+def run_pipeline(audio_files, workers=WORKERS, queue_size=QUEUE_SIZE):
+    """
+    ประมวลผลหลายเคสแบบซ้อนกัน: ขณะที่เคส N กำลังถอดความ
+    เคส N+1 กำลังแปลงไฟล์เสียง และเคส N-1 กำลังวาด/บันทึก PDF
+    คืนค่า list ของ metrics ต่อขั้น
+    """
+    os.makedirs(WORK_DIR, exist_ok=True)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    # แก้ form_specs/*.json ระหว่างรันได้ โมเดลที่โหลดไว้ยังคงอยู่
+    SPECS.watch()
+
+    q_in = queue.Queue(maxsize=queue_size)
+    q_wav = queue.Queue(maxsize=queue_size)
+    q_text = queue.Queue(maxsize=queue_size)
+    stages = [
+        Stage("decode", decode_step, q_in, q_wav, workers.get("decode", 1)),
+        Stage("recognize", recognize_step, q_wav, q_text, workers.get("recognize", 1)),
+        Stage("render", render_step, q_text, None, workers.get("render", 1)),
+    ]
+
+    t0 = time.perf_counter()
+    for s in stages:
+        s.start()
+    for path in audio_files:
+        q_in.put((audio_case_id(path), path))
+    q_in.put(_STOP)
+    for s in stages:
+        s.join()
+    wall = time.perf_counter() - t0
+
+    metrics = [s.metrics(wall) for s in stages]
+    print("\n====================================")
+    print(f"Pipeline finished in {wall:.1f} s")
+    print("====================================")
+    for m in metrics:
+        print(f"{m['stage']:<10} workers={m['workers']} done={m['done']} errors={m['errors']} "
+              f"util={m['utilisation'] * 100:.0f}% queue avg={m['avg_queue_depth']:.1f} max={m['max_queue_depth']}")
+    return metrics
+
+
+if __name__ == "__main__":
+    # ใช้งาน: python pipeline_breast.py <ไฟล์เสียง ...>
+    if len(sys.argv) < 2:
+        print("Usage: python pipeline_breast.py <audio files ...>")
+        sys.exit(1)
+    run_pipeline(sys.argv[1:])
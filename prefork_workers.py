@@ -0,0 +1,137 @@
+import gc
+import os
+import sys
+import time
+import multiprocessing
+
+from vosk_transcrib_breast import load_model, transcribe_audio, MODEL_PATH
+
+# =========================================================
+# === 1. การตั้งค่า - โหลดโมเดลครั้งเดียวแล้ว fork worker ===
+# =========================================================
+# โมเดล Vosk ขนาดใหญ่ถูกโหลดใน process แม่ครั้งเดียว แล้ว fork worker ออกมา
+# หน่วยความจำของโมเดล (C++ heap) ถูกแชร์แบบ copy-on-write เพราะ worker อ่านอย่างเดียว
+# ใช้ได้เฉพาะระบบที่มี fork (Linux/macOS) บน Windows จะโหลดโมเดลแยกใน worker แต่ละตัว
+
+WORKERS = os.cpu_count() or 1
+
+# =========================================================
+# === 2. วัดหน่วยความจำ (RSS / PSS / USS) ===
+# =========================================================
+
+def memory_info(pid=None):
+    """
+    คืนค่า dict (MB): rss = หน่วยความจำที่อยู่ใน RAM, pss = RSS ที่หารส่วนที่แชร์ตามจำนวน process,
+    uss = หน่วยความจำเฉพาะของ process นี้ (ที่จะคืนเมื่อ process จบ)
+    """
+    pid = pid or os.getpid()
+    rollup = f"/proc/{pid}/smaps_rollup"
+    if os.path.exists(rollup):
+        values = {}
+        with open(rollup) as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                    values[parts[0][:-1]] = int(parts[1]) / 1024
+        return {"rss": values.get("Rss"), "pss": values.get("Pss"),
+                "uss": values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)}
+    try:
+        import psutil
+        info = psutil.Process(pid).memory_full_info()
+        mb = 1024 * 1024
+        return {"rss": info.rss / mb, "pss": getattr(info, "pss", None) and info.pss / mb,
+                "uss": getattr(info, "uss", None) and info.uss / mb}
+    except (ImportError, AttributeError):
+        return {"rss": None, "pss": None, "uss": None}
+
+# =========================================================
+# === 3. Worker ===
+# =========================================================
+
+_MODEL_PATH = {}
+
+def _init_worker(model_path):
+    _MODEL_PATH["path"] = model_path
+    # spawn (Windows): ไม่มีโมเดลที่ fork มา ต้องโหลดเอง
+    load_model(model_path)
+
+def _transcribe_job(audio_file):
+    t0 = time.perf_counter()
+    text = transcribe_audio(_MODEL_PATH["path"], audio_file)
+    return {"audio": audio_file, "text": text, "pid": os.getpid(),
+            "sec": time.perf_counter() - t0, "memory": memory_info()}
+
+# =========================================================
+# === 4. Pre-fork pool ===
+# =========================================================
+
+def prefork_pool(model_path=MODEL_PATH, workers=WORKERS):
+    """
+    โหลดโมเดลใน process นี้ แล้วสร้าง Pool ของ worker ที่แชร์โมเดลผ่าน fork
+    (ต้องเรียกก่อนสร้าง thread อื่นๆ ใน process แม่)
+    """
+    t0 = time.perf_counter()
+    load_model(model_path)
+    print(f"Model loaded in parent in {time.perf_counter() - t0:.1f} s")
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        # ย้าย object ที่มีอยู่ออกจาก GC เพื่อไม่ให้ GC ของ worker เขียนทับหน้าหน่วยความจำที่แชร์
+        gc.collect()
+        gc.freeze()
+        pool = multiprocessing.get_context("fork").Pool(workers, initializer=_init_worker, initargs=(model_path,))
+        gc.unfreeze()
+        return pool
+    print("⚠ fork is not available: each worker loads its own copy of the model")
+    return multiprocessing.get_context("spawn").Pool(workers, initializer=_init_worker, initargs=(model_path,))
+
+def run_prefork(audio_files, model_path=MODEL_PATH, workers=WORKERS):
+    """
+    ถอดความหลายไฟล์พร้อมกันด้วย worker ที่แชร์โมเดลเดียว
+    คืนค่า (results, memory_report)
+    """
+    pool = prefork_pool(model_path, workers)
+    parent = memory_info()
+    t0 = time.perf_counter()
+    try:
+        results = pool.map(_transcribe_job, audio_files, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+    elapsed = time.perf_counter() - t0
+
+    # หน่วยความจำสูงสุดต่อ worker (วัดหลังแต่ละงาน)
+    per_worker = {}
+    for r in results:
+        m = r["memory"]
+        best = per_worker.setdefault(r["pid"], dict(m))
+        for k, v in m.items():
+            if v is not None and (best[k] is None or v > best[k]):
+                best[k] = v
+
+    report = {"parent": parent, "workers": per_worker, "seconds": elapsed}
+    print("\n====================================")
+    print(f"Pre-fork run: {len(audio_files)} file(s), {len(per_worker)} worker(s), {elapsed:.1f} s")
+    print("====================================")
+    print(f"{'process':<12} {'RSS MB':>9} {'PSS MB':>9} {'USS MB':>9}")
+
+    def row(name, m):
+        cells = [f"{m[k]:.0f}" if m[k] is not None else "n/a" for k in ("rss", "pss", "uss")]
+        print(f"{name:<12} {cells[0]:>9} {cells[1]:>9} {cells[2]:>9}")
+
+    row("parent", parent)
+    for pid, m in sorted(per_worker.items()):
+        row(f"worker {pid}", m)
+    total_uss = sum(m["uss"] or 0 for m in per_worker.values())
+    print(f"Total unique memory of workers: {total_uss:.0f} MB "
+          f"(vs {(parent['rss'] or 0) * len(per_worker):.0f} MB if each loaded its own model)")
+    return results, report
+
+
+if __name__ == "__main__":
+    # ใช้งาน: python prefork_workers.py <wav ...>
+    if len(sys.argv) < 2:
+        print("Usage: python prefork_workers.py <wav files ...>")
+        sys.exit(1)
+    results, _ = run_prefork(sys.argv[1:])
+    for r in results:
+        print(f"\n[{r['audio']}] {r['text']}")
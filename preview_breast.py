@@ -0,0 +1,212 @@
+import os
+import sys
+import glob
+import fitz # PyMuPDF
+import numpy as np
+
+from filler_breast import PDF_IN, parse_transcribed_text, draw_parsed_data
+from template_layout import FormPages, get_layout, template_hash
+
+# =========================================================
+# === 1. การตั้งค่า - Preview / Thumbnail ===
+# =========================================================
+
+PREVIEW_DPI = 100                  # ความละเอียดของ preview (PNG)
+THUMB_FACTOR = 4                   # ย่อ thumbnail ลง 1/4 ของ preview
+PREVIEW_CACHE_DIR = "preview_cache"  # เก็บภาพ template ที่ rasterize แล้ว (.npy)
+
+# template ที่เปิดค้างไว้ และภาพ base ที่ rasterize แล้ว (ต่อ process)
+_TEMPLATES = {}
+_BASE_IMAGES = {}
+
+# =========================================================
+# === 2. Cache ของ template (rasterize ครั้งเดียวต่อความละเอียด) ===
+# =========================================================
+
+class _OverlayPage:
+    """
+    หน้าหนึ่งของ template: ค้นหา anchor/ข้อความบนหน้า template แต่วาดลงหน้าเปล่า (overlay) แทน
+    ทำให้ draw_parsed_data() ใช้ได้โดยไม่ต้องแก้ helper เดิม
+    """
+    def __init__(self, template, n, overlay_page):
+        self._template = template
+        self._n = n
+        self._overlay = overlay_page
+
+    def search_for(self, text, **kwargs):
+        hits = self._template["hits"]
+        if (self._n, text) not in hits:
+            hits[(self._n, text)] = self._template["doc"][self._n].search_for(text, **kwargs)
+        return hits[(self._n, text)]
+
+    def get_text(self, *args, **kwargs):
+        return self._template["doc"][self._n].get_text(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._overlay, name)
+
+class _OverlayForm(FormPages):
+    """
+    FormPages บน template ที่เปิดค้างไว้ (ค้นหาได้ทุกหน้าเหมือนตอนกรอกจริง)
+    แต่ละหน้าเป็น _OverlayPage ที่วาดลงหน้าเปล่าขนาดเท่ากัน
+    (หน้าเปล่าอยู่คนละเอกสาร: การเพิ่มหน้าใหม่ในเอกสารเดียวกันทำให้ Page ที่ถืออยู่ใช้ไม่ได้)
+    """
+    def __init__(self, template):
+        super().__init__(template["doc"], template["layout"])
+        self._template = template
+        self._text = template["text"]    # ข้อความของแต่ละหน้าใช้ร่วมกันทุกเคส
+        self.overlays = {}
+
+    def page(self, n, touch=True):
+        if n not in self._loaded:
+            rect = self.doc[n].rect
+            self.overlays[n] = fitz.open().new_page(width=rect.width, height=rect.height)
+            self._loaded[n] = _OverlayPage(self._template, n, self.overlays[n])
+        return super().page(n, touch)
+
+def _open_template(pdf_path):
+    """เปิด template ครั้งเดียวต่อ process พร้อม cache ผลการค้นหา anchor และข้อความของแต่ละหน้า"""
+    key = (os.path.abspath(pdf_path), os.path.getmtime(pdf_path))
+    template = _TEMPLATES.get(key)
+    if template is None:
+        doc = fitz.open(pdf_path)
+        template = {"doc": doc, "layout": get_layout(pdf_path), "hash": template_hash(pdf_path),
+                    "hits": {}, "text": {}}
+        _TEMPLATES[key] = template
+    return template
+
+def _pixmap_to_array(pix):
+    return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+
+def get_base_image(pdf_path=PDF_IN, dpi=PREVIEW_DPI, page=0):
+    """
+    คืนค่าภาพ RGB (numpy, HxWx3) ของหน้า page ของ template เปล่า
+    rasterize จริงเพียงครั้งเดียวต่อ (template hash, dpi, หน้า) แล้วเก็บทั้งในหน่วยความจำและดิสก์
+    """
+    template = _open_template(pdf_path)
+    key = (template["hash"], dpi, page)
+    if key in _BASE_IMAGES:
+        return _BASE_IMAGES[key]
+
+    cache_file = os.path.join(PREVIEW_CACHE_DIR, f"{template['hash']}_{dpi}_p{page}.npy")
+    if os.path.exists(cache_file):
+        base = np.load(cache_file)
+    else:
+        pix = template["doc"][page].get_pixmap(dpi=dpi, alpha=False)
+        base = _pixmap_to_array(pix).copy()
+        os.makedirs(PREVIEW_CACHE_DIR, exist_ok=True)
+        np.save(cache_file, base)
+
+    base.setflags(write=False)
+    _BASE_IMAGES[key] = base
+    return base
+
+# =========================================================
+# === 3. สร้าง Preview ต่อเคส (rasterize เฉพาะ overlay) ===
+# =========================================================
+
+def render_overlay(parsed_data, pdf_path=PDF_IN, dpi=PREVIEW_DPI):
+    """
+    วาดเฉพาะ overlay (วงกลม / ตัวเลข) ลงหน้าเปล่าขนาดเท่า template ทุกหน้าที่ anchor อยู่ (เหมือน FormPages ตอนกรอกจริง)
+    แล้ว rasterize เฉพาะกรอบที่มีการวาด คืนค่า dict {หน้า: (rgba_array, x, y)} เฉพาะหน้าที่มีการวาด
+    """
+    form = _OverlayForm(_open_template(pdf_path))
+    draw_parsed_data(form, parsed_data)
+
+    overlays = {}
+    for n in sorted(form.touched):
+        overlay_page = form.overlays[n]
+        clip = None
+        for _, bbox in overlay_page.get_bboxlog():
+            clip = fitz.Rect(bbox) if clip is None else clip | fitz.Rect(bbox)
+        if clip is None or clip.is_empty:
+            continue
+        pix = overlay_page.get_pixmap(dpi=dpi, alpha=True, clip=clip + (-2, -2, 2, 2))
+        overlays[n] = (_pixmap_to_array(pix).copy(), pix.x, pix.y)
+    for overlay_page in form.overlays.values():
+        overlay_page.parent.close()
+    return overlays
+
+def _blend(out, overlay, x, y):
+    """ซ้อน overlay (premultiplied RGBA) ลงบนภาพ out ที่ตำแหน่ง (x, y) ในตัว"""
+    # ตัดส่วนที่เกินขอบภาพ
+    h, w = out.shape[:2]
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + overlay.shape[1], w), min(y + overlay.shape[0], h)
+    if x0 >= x1 or y0 >= y1:
+        return
+    patch = overlay[y0 - y:y1 - y, x0 - x:x1 - x].astype(np.float32)
+
+    # samples ของ MuPDF เป็นแบบ premultiplied alpha
+    alpha = patch[..., 3:4] / 255.0
+    region = out[y0:y1, x0:x1].astype(np.float32)
+    out[y0:y1, x0:x1] = np.clip(region * (1.0 - alpha) + patch[..., :3], 0, 255).astype(np.uint8)
+
+def render_preview(parsed_data, pdf_path=PDF_IN, dpi=PREVIEW_DPI):
+    """
+    คืนค่าภาพ preview (numpy RGB) ของแบบฟอร์มที่กรอกแล้ว (ทุกหน้าเรียงต่อกันจากบนลงล่าง)
+    โดยนำ overlay ของแต่ละหน้ามาซ้อนบนภาพ template ที่ cache ไว้ (alpha blend ด้วย NumPy)
+    """
+    overlays = render_overlay(parsed_data, pdf_path, dpi)
+
+    pages = []
+    for n in range(len(_open_template(pdf_path)["doc"])):
+        out = get_base_image(pdf_path, dpi, n).copy()
+        if n in overlays:
+            _blend(out, *overlays[n])
+        pages.append(out)
+    if len(pages) == 1:
+        return pages[0]
+
+    # หน้ากว้างไม่เท่ากัน: เติมขอบขวาเป็นสีขาว
+    width = max(p.shape[1] for p in pages)
+    return np.concatenate([np.pad(p, ((0, 0), (0, width - p.shape[1]), (0, 0)), constant_values=255)
+                           for p in pages])
+
+def make_thumbnail(image, factor=THUMB_FACTOR):
+    """ย่อภาพแบบ box filter (เฉลี่ยทีละบล็อก factor x factor)"""
+    if factor <= 1:
+        return image
+    h = image.shape[0] - image.shape[0] % factor
+    w = image.shape[1] - image.shape[1] % factor
+    blocks = image[:h, :w].reshape(h // factor, factor, w // factor, factor, image.shape[2])
+    return blocks.mean(axis=(1, 3)).astype(np.uint8)
+
+def save_png(image, output_png):
+    pix = fitz.Pixmap(fitz.csRGB, image.shape[1], image.shape[0], np.ascontiguousarray(image).tobytes(), False)
+    pix.save(output_png)
+
+# =========================================================
+# === 4. Batch Thumbnail (ทั้งวัน) ===
+# =========================================================
+
+def thumbnail_batch(cases, out_dir, pdf_path=PDF_IN, dpi=PREVIEW_DPI, factor=THUMB_FACTOR):
+    """
+    cases: iterable ของ (case_id, parsed_data)
+    บันทึก <case_id>.png (thumbnail) ลงใน out_dir แล้วคืนค่าจำนวนไฟล์ที่สร้าง
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    count = 0
+    for case_id, parsed_data in cases:
+        image = make_thumbnail(render_preview(parsed_data, pdf_path, dpi), factor)
+        save_png(image, os.path.join(out_dir, f"{case_id}.png"))
+        count += 1
+    return count
+
+def iter_transcript_cases(transcript_dir):
+    """อ่านไฟล์ transcript (*.txt) ในโฟลเดอร์ แล้ว parse เป็น (case_id, parsed_data)"""
+    for path in sorted(glob.glob(os.path.join(transcript_dir, "*.txt"))):
+        with open(path, encoding="utf-8") as f:
+            transcript = f.read()
+        case_id = os.path.splitext(os.path.basename(path))[0]
+        yield case_id, parse_transcribed_text(transcript)
+
+
+if __name__ == "__main__":
+    # ใช้งาน: python preview_breast.py <โฟลเดอร์ transcript ของวัน> <โฟลเดอร์ PNG>
+    if len(sys.argv) < 3:
+        print("Usage: python preview_breast.py <transcript_dir> <out_dir>")
+        sys.exit(1)
+
+    n = thumbnail_batch(iter_transcript_cases(sys.argv[1]), sys.argv[2])
+    print(f"\n✅ Preview Complete. {n} thumbnail(s) saved to: {sys.argv[2]}")
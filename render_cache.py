@@ -0,0 +1,129 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+
+from template_layout import template_hash, ANALYZER_VERSION
+from field_specs import SPECS
+
+# =========================================================
+# === 1. การตั้งค่า - ที่เก็บ PDF แบบ content-addressed ===
+# =========================================================
+# key = hash(ข้อมูลที่ parse แล้ว + template + spec ของ anchor + เวอร์ชันของตัววาด)
+# เคสที่ key ไม่เปลี่ยนจะไม่ถูกวาดใหม่ และ PDF ที่เหมือนกันจะมีบนดิสก์เพียงชุดเดียว
+# (ไฟล์ output เป็น hard link ไปยัง object ใน store)
+
+RENDER_STORE = "render_store"
+
+# เพิ่มค่านี้ทุกครั้งที่แก้โค้ดวาด (draw_parsed_data / template_layout) ให้ผลลัพธ์ต่างไปจากเดิม
+RENDERER_VERSION = 1
+
+STATS = {"hits": 0, "misses": 0, "linked": 0, "copied": 0}
+
+# template hash ตาม (path, mtime, size) — ไม่ต้องอ่านทั้งไฟล์ทุกเคส
+_TEMPLATE_HASHES = {}
+
+# =========================================================
+# === 2. Key ===
+# =========================================================
+
+def _template_hash(pdf_path):
+    st = os.stat(pdf_path)
+    key = (os.path.abspath(pdf_path), st.st_mtime_ns, st.st_size)
+    if key not in _TEMPLATE_HASHES:
+        _TEMPLATE_HASHES[key] = template_hash(pdf_path)
+    return _TEMPLATE_HASHES[key]
+
+def render_key(parsed_data, template_pdf, spec):
+    """SHA-1 ของทุกอย่างที่มีผลต่อ PDF ที่วาดออกมา"""
+    payload = {
+        "parsed": parsed_data,
+        "template": _template_hash(template_pdf),
+        "anchors": spec.anchors,
+        "renderer": RENDERER_VERSION,
+        "analyzer": ANALYZER_VERSION,
+    }
+    blob = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=list)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+def object_path(key, store=RENDER_STORE):
+    return os.path.join(store, "objects", key[:2], key + ".pdf")
+
+# =========================================================
+# === 3. วาดผ่าน cache ===
+# =========================================================
+
+def _same_file(a, b):
+    try:
+        return os.path.samefile(a, b)
+    except OSError:
+        return False
+
+def link_output(src, dst):
+    """ให้ dst ชี้ไปที่ src (hard link; ถ้าระบบไฟล์ไม่รองรับจะคัดลอกแทน) แบบ atomic"""
+    if _same_file(src, dst):
+        # (rename ระหว่าง hard link ของไฟล์เดียวกันไม่มีผล และจะทิ้ง .tmp ไว้)
+        return
+    tmp = dst + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    try:
+        os.link(src, tmp)
+        STATS["linked"] += 1
+    except OSError:
+        shutil.copyfile(src, tmp)
+        STATS["copied"] += 1
+    os.replace(tmp, dst)
+
+def render_cached(parsed_data, output_pdf, template_pdf=None, spec=None, store=RENDER_STORE):
+    """
+    วาด parsed_data ลง template แล้วให้ output_pdf ชี้ไปที่ผลลัพธ์
+    คืนค่า (object_path, hit) — hit=True หมายถึงไม่ต้องวาดใหม่
+    """
+    from filler_breast import draw_data_on_pdf
+
+    spec = spec or SPECS.current()
+    template_pdf = template_pdf or spec.template
+    key = render_key(parsed_data, template_pdf, spec)
+    obj = object_path(key, store)
+
+    hit = os.path.exists(obj)
+    if hit:
+        STATS["hits"] += 1
+    else:
+        STATS["misses"] += 1
+        os.makedirs(os.path.dirname(obj), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(suffix=".pdf", dir=os.path.dirname(obj))
+        os.close(fd)
+        try:
+            draw_data_on_pdf(template_pdf, tmp, parsed_data, spec)
+            os.replace(tmp, obj)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    if output_pdf:
+        out_dir = os.path.dirname(output_pdf)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+        link_output(obj, output_pdf)
+    if hit:
+        print(f"[render-cache] unchanged, skipped drawing -> {output_pdf or obj}")
+    return obj, hit
+
+def store_usage(store=RENDER_STORE):
+    """(จำนวน object, ขนาดรวมเป็น bytes)"""
+    count, size = 0, 0
+    for dirpath, _, files in os.walk(os.path.join(store, "objects")):
+        for name in files:
+            count += 1
+            size += os.path.getsize(os.path.join(dirpath, name))
+    return count, size
+
+
+if __name__ == "__main__":
+    # ใช้งาน: python render_cache.py   (แสดงขนาดของ store)
+    count, size = store_usage(sys.argv[1] if len(sys.argv) > 1 else RENDER_STORE)
+    print(f"{count} rendered PDF(s), {size / 1024:.0f} KB")
@@ -0,0 +1,137 @@
+import io
+import os
+import re
+import sys
+import time
+import tempfile
+import contextlib
+import multiprocessing
+
+import fitz  # PyMuPDF
+
+from filler_breast import draw_parsed_data
+from field_specs import SPECS
+from template_layout import FormPages, get_layout, save_form
+from case_store import load_cases, normalize_parsed
+from render_cache import render_key, object_path, link_output, RENDER_STORE
+
+# =========================================================
+# === 1. การตั้งค่า - วาดเคสเก่าทั้งหมดลง template เวอร์ชันใหม่ ===
+# =========================================================
+# ไม่ถอดความใหม่: ใช้ข้อมูลที่ parse แล้วจาก case_store
+# ผลลัพธ์อยู่ใน render store (key รวม hash ของ template) จึง resume ได้เอง:
+# รันซ้ำหลังถูกขัดจังหวะ เคสที่วาดเสร็จแล้วจะถูกข้าม
+
+ARCHIVE_OUT_DIR = "archive_out"
+WORKERS = max(1, (os.cpu_count() or 2) - 1)
+CHUNK_SIZE = 8
+
+# =========================================================
+# === 2. Worker (โหลด template ครั้งเดียวต่อ process) ===
+# =========================================================
+
+_WORKER = {}
+
+def init_worker(template_pdf, store):
+    with open(template_pdf, "rb") as f:
+        _WORKER["template_bytes"] = f.read()
+    _WORKER["template"] = template_pdf
+    _WORKER["layout"] = get_layout(template_pdf)
+    _WORKER["spec"] = SPECS.current()
+    _WORKER["store"] = store
+
+def render_job(job):
+    """(case_id, parsed, output_pdf) -> (case_id, pages, status)"""
+    case_id, parsed, output_pdf = job
+    spec, store = _WORKER["spec"], _WORKER["store"]
+    # record ที่บันทึกก่อนมี normalize_parsed อาจอยู่ในรูปแบบของ parse_breast (Filled*.py)
+    parsed = normalize_parsed(parsed)
+    try:
+        obj = object_path(render_key(parsed, _WORKER["template"], spec), store)
+        if os.path.exists(obj):
+            link_output(obj, output_pdf)
+            return case_id, 0, "skipped"
+
+        os.makedirs(os.path.dirname(obj), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(suffix=".pdf", dir=os.path.dirname(obj))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_WORKER["template_bytes"])
+            form = FormPages(fitz.open(tmp), _WORKER["layout"], tmp)
+            pages = len(form.doc)
+            # ข้อความ log ของการวาดทีละเคสไม่จำเป็นในโหมด bulk
+            with contextlib.redirect_stdout(io.StringIO()):
+                draw_parsed_data(form, parsed, spec)
+            save_form(form)
+            os.replace(tmp, obj)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        link_output(obj, output_pdf)
+        return case_id, pages, "rendered"
+    except Exception as e:
+        return case_id, 0, f"error: {e}"
+
+# =========================================================
+# === 3. Bulk re-render ===
+# =========================================================
+
+def safe_name(case_id):
+    return re.sub(r"[^\w.-]", "_", str(case_id))
+
+def rerender_archive(template_pdf, out_dir=ARCHIVE_OUT_DIR, workers=WORKERS, store=RENDER_STORE):
+    """
+    วาดทุกเคสใน case_store ลง template_pdf ด้วย process pool
+    คืนค่า dict สรุป (rendered / skipped / errors / pages_per_sec)
+    """
+    if not os.path.exists(template_pdf):
+        print(f"Error: Template not found at {template_pdf}")
+        return None
+
+    records = [r for r in load_cases() if r.get("parsed")]
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = [(r["case_id"], r["parsed"], os.path.join(out_dir, safe_name(r["case_id"]) + ".pdf"))
+            for r in records]
+
+    # วิเคราะห์ layout ครั้งเดียวใน parent (worker อ่านจาก layout_cache)
+    for _ in get_layout(template_pdf).pages():
+        pass
+
+    summary = {"cases": len(jobs), "rendered": 0, "skipped": 0, "errors": 0, "pages": 0}
+    print(f"Re-rendering {len(jobs)} case(s) onto {template_pdf} with {workers} worker(s)...")
+    t0 = time.perf_counter()
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(workers, initializer=init_worker, initargs=(template_pdf, store)) as pool:
+        for i, (case_id, pages, status) in enumerate(pool.imap_unordered(render_job, jobs, CHUNK_SIZE), 1):
+            if status == "rendered":
+                summary["rendered"] += 1
+                summary["pages"] += pages
+            elif status == "skipped":
+                summary["skipped"] += 1
+            else:
+                summary["errors"] += 1
+                print(f"❌ {case_id}: {status}")
+            if i % 100 == 0 or i == len(jobs):
+                elapsed = time.perf_counter() - t0
+                print(f"  {i}/{len(jobs)} done, {summary['pages'] / max(elapsed, 1e-9):.1f} pages/s")
+    elapsed = time.perf_counter() - t0
+
+    summary["seconds"] = elapsed
+    summary["pages_per_sec"] = summary["pages"] / max(elapsed, 1e-9)
+    print("\n====================================")
+    print(f"✅ Rendered {summary['rendered']}, skipped {summary['skipped']} (already current), "
+          f"errors {summary['errors']} in {elapsed:.1f} s ({summary['pages_per_sec']:.1f} pages/s)")
+    print("====================================")
+    return summary
+
+
+if __name__ == "__main__":
+    # ใช้งาน: python rerender_archive.py <new_template.pdf> [out_dir] [workers]
+    if len(sys.argv) < 2:
+        print("Usage: python rerender_archive.py <new_template.pdf> [out_dir] [workers]")
+        sys.exit(1)
+    rerender_archive(
+        sys.argv[1],
+        sys.argv[2] if len(sys.argv) > 2 else ARCHIVE_OUT_DIR,
+        int(sys.argv[3]) if len(sys.argv) > 3 else WORKERS,
+    )
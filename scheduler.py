@@ -0,0 +1,254 @@
+import os
+import sys
+import time
+import heapq
+import wave
+import itertools
+import threading
+
+from vosk_transcrib_breast import load_model, iter_decode, checkpoint_path, CHECKPOINT_DIR, MODEL_PATH, QUALITY_GATE
+from audio_gate import check_audio
+from pipeline_breast import decode_step, render_step, WORK_DIR, OUTPUT_DIR
+
+# =========================================================
+# === 1. การตั้งค่า - คิวตามลำดับความเร่งด่วน ===
+# =========================================================
+# เคส frozen section (ระหว่างผ่าตัด) ต้องไม่รอหลังคิวเคส routine
+# งานถูกเลือกตามระดับความเร่งด่วนก่อน แล้วตาม deadline ที่ใกล้ที่สุด (EDF) ภายในระดับเดียวกัน
+# ถ้ามีงานระดับที่สูงกว่ารออยู่และไม่มี worker ว่าง งานที่กำลังถอดความจะถูกพักไว้ที่ขอบ chunk
+# (ดู iter_decode) แล้วกลับเข้าคิวพร้อมสถานะเดิม ไม่ต้องเริ่มถอดความใหม่
+
+PRIORITIES = {"frozen": 0, "urgent": 1, "routine": 2}
+
+# deadline เริ่มต้นนับจากเวลาที่ส่งงาน (วินาที)
+DEFAULT_DEADLINE_SEC = {"frozen": 20 * 60, "urgent": 4 * 3600, "routine": 24 * 3600}
+
+WORKERS = 1
+CHUNK_FRAMES = 4000      # ขนาด chunk ของการถอดความ = ความถี่ในการตรวจว่าต้องพักงานหรือไม่
+
+# =========================================================
+# === 2. งานหนึ่งงาน ===
+# =========================================================
+
+class Job:
+    def __init__(self, case_id, audio_file, priority, deadline, seq):
+        self.case_id = case_id
+        self.audio_file = audio_file
+        self.priority = priority
+        self.deadline = deadline          # เวลา (time.time()) ที่ต้องเสร็จ
+        self.seq = seq
+        self.submitted = time.time()
+        self.enqueued = self.submitted    # เวลาที่เข้าคิวล่าสุด (ใหม่ หรือหลังถูกพัก)
+        self.started = None
+        self.finished = None
+        self.queue_wait = 0.0             # เวลารอในคิวรวม (รวมช่วงที่ถูกพัก)
+        self.preemptions = 0
+        self.state = "queued"             # queued / running / preempted / done / error
+        self.wav_path = None
+        self.outputs = []
+        self._wf = None
+        self._steps = None
+
+    def sort_key(self):
+        return (PRIORITIES[self.priority], self.deadline, self.seq)
+
+    def __lt__(self, other):
+        return self.sort_key() < other.sort_key()
+
+    @property
+    def missed(self):
+        return self.finished is not None and self.finished > self.deadline
+
+# =========================================================
+# === 3. Scheduler ===
+# =========================================================
+
+class Scheduler:
+    """
+    worker threads ที่ถอดความทีละ chunk แล้ววาดรายงานด้วย render_step ของ pipeline
+    ใช้: s = Scheduler(); s.start(); s.submit("a.wav", "frozen"); ...; s.shutdown()
+    """
+    def __init__(self, workers=WORKERS, model_path=MODEL_PATH, chunk_frames=CHUNK_FRAMES):
+        self.workers = workers
+        self.model_path = model_path
+        self.chunk_frames = chunk_frames
+        self.jobs = []
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._idle = 0
+        self._closing = False
+        self._threads = [threading.Thread(target=self._run, name=f"scheduler-{i}", daemon=True)
+                         for i in range(workers)]
+
+    def start(self):
+        os.makedirs(WORK_DIR, exist_ok=True)
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        load_model(self.model_path)
+        for t in self._threads:
+            t.start()
+        return self
+
+    def submit(self, audio_file, priority="routine", deadline_sec=None, case_id=None):
+        """ส่งงานเข้าคิว คืนค่า Job (ดูสถานะ/เวลาได้จาก job.state, job.outputs)"""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}' (use one of {', '.join(PRIORITIES)})")
+        if deadline_sec is None:
+            deadline_sec = DEFAULT_DEADLINE_SEC[priority]
+        case_id = case_id or os.path.splitext(os.path.basename(audio_file))[0]
+        with self._cond:
+            job = Job(case_id, audio_file, priority, time.time() + deadline_sec, next(self._seq))
+            self.jobs.append(job)
+            heapq.heappush(self._heap, job)
+            self._cond.notify()
+        return job
+
+    def shutdown(self, wait=True):
+        """หยุดรับงาน แล้วรอจนงานในคิวเสร็จทั้งหมด (wait=True)"""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        if wait:
+            for t in self._threads:
+                t.join()
+
+    # --- ภายใน worker ---
+
+    def _next_job(self):
+        with self._cond:
+            self._idle += 1
+            while not self._heap and not self._closing:
+                self._cond.wait()
+            self._idle -= 1
+            if not self._heap:
+                return None
+            job = heapq.heappop(self._heap)
+            now = time.time()
+            job.queue_wait += now - job.enqueued
+            if job.started is None:
+                job.started = now
+            job.state = "running"
+            return job
+
+    def _should_yield(self, job):
+        """มีงานที่ด่วนกว่ารออยู่ และไม่มี worker ว่างรับงานนั้น"""
+        with self._cond:
+            if self._heap and self._idle == 0 \
+                    and PRIORITIES[self._heap[0].priority] < PRIORITIES[job.priority]:
+                job.state = "preempted"
+                job.preemptions += 1
+                job.enqueued = time.time()
+                heapq.heappush(self._heap, job)
+                self._cond.notify()
+                return True
+        return False
+
+    def _open(self, job):
+        wav_path = job.audio_file
+        if not wav_path.lower().endswith(".wav"):
+            converted = decode_step((job.case_id, wav_path))
+            if converted is None:
+                raise RuntimeError(f"could not convert {wav_path}")
+            wav_path = converted[1]
+        if QUALITY_GATE:
+            # ไฟล์เสีย/เงียบไม่ควรใช้เวลาของ worker (ดู audio_gate.py)
+            report = check_audio(wav_path)
+            if report["status"] == "reject":
+                raise RuntimeError("audio rejected: " + "; ".join(report["problems"]))
+        job.wav_path = wav_path
+        job._wf = wave.open(wav_path, "rb")
+        checkpoint = checkpoint_path(wav_path) if CHECKPOINT_DIR else None
+        job._steps = iter_decode(load_model(self.model_path), job._wf, chunk_frames=self.chunk_frames,
+                                 audio_id=wav_path, checkpoint=checkpoint)
+
+    def _close(self, job):
+        if job._wf is not None:
+            job._wf.close()
+        job._wf = job._steps = None
+
+    def _run(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            try:
+                if job._steps is None:
+                    self._open(job)
+                while True:
+                    try:
+                        next(job._steps)
+                    except StopIteration as done:
+                        results = done.value
+                        break
+                    if self._should_yield(job):
+                        results = None
+                        break
+                if results is None:
+                    continue    # ถูกพักไว้ จะถอดความต่อเมื่อได้คิวอีกครั้ง
+                self._close(job)
+
+                text = " ".join(r.get("text", "") for r in results).strip()
+                words = [w for r in results for w in r.get("result", [])]
+                _, job.outputs = render_step((job.case_id, text, words, job.wav_path))
+                job.state = "done"
+            except Exception as e:
+                self._close(job)
+                job.state = "error"
+                print(f"❌ [scheduler] {job.case_id}: {e}")
+            job.finished = time.time()
+            if job.state != "done":
+                continue
+            late = " (deadline missed)" if job.missed else ""
+            print(f"✅ [{job.priority}] {job.case_id}: waited {job.queue_wait:.1f} s, "
+                  f"preempted {job.preemptions}x{late}")
+
+    # --- metrics ---
+
+    def metrics(self):
+        """สรุปต่อระดับความเร่งด่วน: เวลารอในคิว (p50/max), จำนวนงานที่เลย deadline, จำนวนครั้งที่ถูกพัก"""
+        with self._cond:
+            jobs = list(self.jobs)
+        out = {}
+        for priority in PRIORITIES:
+            group = [j for j in jobs if j.priority == priority]
+            if not group:
+                continue
+            finished = [j for j in group if j.finished is not None]
+            waits = sorted(j.queue_wait for j in finished)
+            out[priority] = {
+                "jobs": len(group),
+                "finished": len(finished),
+                "errors": sum(1 for j in group if j.state == "error"),
+                "queue_wait_p50": waits[len(waits) // 2] if waits else None,
+                "queue_wait_max": waits[-1] if waits else None,
+                "deadline_misses": sum(1 for j in finished if j.missed),
+                "preemptions": sum(j.preemptions for j in group),
+            }
+        return out
+
+    def print_metrics(self):
+        print("\n====================================")
+        print("Scheduler metrics")
+        print("====================================")
+        print(f"{'priority':<9} {'jobs':>5} {'done':>5} {'wait p50':>9} {'wait max':>9} {'missed':>7} {'preempt':>8}")
+        for priority, m in self.metrics().items():
+            p50 = f"{m['queue_wait_p50']:.1f}s" if m["queue_wait_p50"] is not None else "n/a"
+            mx = f"{m['queue_wait_max']:.1f}s" if m["queue_wait_max"] is not None else "n/a"
+            print(f"{priority:<9} {m['jobs']:>5} {m['finished']:>5} {p50:>9} {mx:>9} "
+                  f"{m['deadline_misses']:>7} {m['preemptions']:>8}")
+
+
+if __name__ == "__main__":
+    # ใช้งาน: python scheduler.py [priority:]<audio> ...
+    # เช่น python scheduler.py a.wav b.wav frozen:intraop.wav   (ไม่ระบุ = routine)
+    if len(sys.argv) < 2:
+        print("Usage: python scheduler.py [frozen|urgent|routine:]<audio files ...>")
+        sys.exit(1)
+    scheduler = Scheduler().start()
+    for arg in sys.argv[1:]:
+        priority, sep, path = arg.partition(":")
+        if not sep or priority not in PRIORITIES:
+            priority, path = "routine", arg
+        scheduler.submit(path, priority)
+    scheduler.shutdown()
+    scheduler.print_metrics()
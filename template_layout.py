@@ -0,0 +1,410 @@
+import os
+import re
+import sys
+import json
+import shutil
+import hashlib
+import fitz # PyMuPDF
+
+# =========================================================
+# === 1. การตั้งค่า - วิเคราะห์ตำแหน่งช่องในแบบฟอร์ม ===
+# =========================================================
+# วิเคราะห์ template ครั้งเดียว (ช่อง ☐, เส้นจุดไข่ปลา, ตัวเลือกในวงเล็บ และข้อความกำกับ)
+# แล้วเก็บเป็นไฟล์ JSON ตาม hash ของ template เพื่อให้การวาดใช้พิกัดที่คำนวณไว้แล้ว
+# โดยไม่ต้องค้นหาข้อความทุกครั้ง และไม่ต้องปรับพิกัดด้วยมือเมื่อ export ฟอร์มใหม่
+
+LAYOUT_CACHE_DIR = "layout_cache"
+ANALYZER_VERSION = 2
+
+CHECKBOX_CHARS = "☐□❑▢"
+DOT_CHARS = ".…"
+MIN_DOTS = 3            # จุดติดกันอย่างน้อยเท่านี้จึงนับเป็นช่องเติม ("…" นับเป็น 3)
+LINE_TOLERANCE = 3.0    # ตัวอักษรที่จุดกึ่งกลางแนวตั้งห่างกันไม่เกินนี้ (pt) อยู่บรรทัดเดียวกัน
+BOX_MIN, BOX_MAX = 5.0, 15.0   # ขนาดสี่เหลี่ยมจัตุรัส (pt) ที่นับเป็น checkbox แบบ vector
+
+_LAYOUTS = {}
+
+def template_hash(pdf_path):
+    """
+    คืนค่า SHA-1 ของไฟล์ template (ใช้เป็น key ของ cache ต่างๆ)
+    """
+    h = hashlib.sha1()
+    with open(pdf_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+# =========================================================
+# === 2. อ่านตัวอักษร / รูปสี่เหลี่ยมจากหน้า PDF ===
+# =========================================================
+
+def _page_glyphs(page):
+    """คืนค่า list ของ (char, Rect) ทั้งหน้า รวม checkbox ที่วาดเป็น vector (แทนด้วย '☐')"""
+    glyphs = []
+    raw = page.get_text("rawdict")
+    for block in raw["blocks"]:
+        for line in block.get("lines", []):
+            for span in line["spans"]:
+                for ch in span["chars"]:
+                    glyphs.append((ch["c"], fitz.Rect(ch["bbox"])))
+
+    for drawing in page.get_drawings():
+        r = drawing["rect"]
+        items = [item[0] for item in drawing["items"]]
+        square = BOX_MIN <= r.width <= BOX_MAX and BOX_MIN <= r.height <= BOX_MAX and abs(r.width - r.height) < 1.5
+        if square and (items == ["re"] or items == ["l"] * 4 or items == ["qu"]):
+            glyphs.append(("☐", fitz.Rect(r)))
+    return glyphs
+
+def _visual_lines(glyphs):
+    """จัดกลุ่มตัวอักษรเป็นบรรทัดตามตำแหน่งจริงบนหน้า (ไม่ขึ้นกับลำดับใน PDF)"""
+    lines = []
+    for ch, r in sorted(glyphs, key=lambda g: (g[1].y0 + g[1].y1) / 2):
+        cy = (r.y0 + r.y1) / 2
+        if lines and abs(cy - lines[-1]["cy"]) <= LINE_TOLERANCE:
+            line = lines[-1]
+            line["chars"].append((ch, r))
+            line["cy"] += (cy - line["cy"]) / len(line["chars"])
+        else:
+            lines.append({"cy": cy, "chars": [(ch, r)]})
+    return [sorted(line["chars"], key=lambda g: g[1].x0) for line in lines]
+
+def _segments(chars):
+    """
+    แบ่งตัวอักษรในบรรทัดเป็นส่วนๆ: box (☐), blank (จุดไข่ปลา) และ text
+    คืนค่า list ของ (kind, text, Rect, words) โดย words = [(word, Rect)] สำหรับส่วน text
+    """
+    segments = []
+
+    def flush_text(buf):
+        if not buf:
+            return
+        words, cur = [], []
+        for ch, r in buf + [(" ", None)]:
+            if ch.isspace():
+                if cur:
+                    rect = fitz.Rect(cur[0][1])
+                    for _, cr in cur[1:]:
+                        rect |= cr
+                    words.append(("".join(c for c, _ in cur), rect))
+                cur = []
+            else:
+                cur.append((ch, r))
+        if words:
+            rect = fitz.Rect(words[0][1])
+            for _, wr in words[1:]:
+                rect |= wr
+            segments.append(("text", " ".join(w for w, _ in words), rect, words))
+
+    text_buf, i = [], 0
+    while i < len(chars):
+        ch, r = chars[i]
+        if ch in CHECKBOX_CHARS:
+            flush_text(text_buf)
+            text_buf = []
+            segments.append(("box", ch, fitz.Rect(r), []))
+            i += 1
+            continue
+        if ch in DOT_CHARS:
+            j, dots, rect = i, 0, fitz.Rect(r)
+            while j < len(chars) and chars[j][0] in DOT_CHARS:
+                dots += 3 if chars[j][0] == "…" else 1
+                rect |= chars[j][1]
+                j += 1
+            if dots >= MIN_DOTS:
+                flush_text(text_buf)
+                text_buf = []
+                segments.append(("blank", "", rect, []))
+                i = j
+                continue
+        text_buf.append((ch, r))
+        i += 1
+    flush_text(text_buf)
+    return segments
+
+def _rect(r):
+    return [round(v, 2) for v in (r.x0, r.y0, r.x1, r.y1)]
+
+def _choices_in(words):
+    """หาตัวเลือกในวงเล็บ เช่น "( right / left )" คืนค่า list ของ (before_words, {option: Rect})"""
+    groups, i = [], 0
+    while i < len(words):
+        if words[i][0].startswith("("):
+            j = i
+            while j < len(words) and not words[j][0].endswith(")"):
+                j += 1
+            inner = words[i:j + 1]
+            options, cur = {}, []
+            for w, r in inner + [("/", None)]:
+                w = w.strip("()")
+                if w == "/":
+                    if cur:
+                        rect = fitz.Rect(cur[0][1])
+                        for _, cr in cur[1:]:
+                            rect |= cr
+                        options[" ".join(c for c, _ in cur)] = rect
+                    cur = []
+                elif w:
+                    cur.append((w, r))
+            if len(options) > 1:
+                groups.append((" ".join(w for w, _ in words[:i]), options))
+            i = j + 1
+        else:
+            i += 1
+    return groups
+
+# =========================================================
+# === 3. วิเคราะห์หน้า / template ===
+# =========================================================
+
+def analyze_page(page):
+    """
+    คืนค่า layout ของหน้า:
+      checkboxes: [{"label", "rect"}]
+      blanks:     [{"before", "after", "group", "index", "rect"}]  (ช่อง a x b x c อยู่ group เดียวกัน)
+      choices:    [{"before", "options": {option: rect}}]
+    """
+    layout = {"width": page.rect.width, "height": page.rect.height,
+              "checkboxes": [], "blanks": [], "choices": []}
+    group = -1
+
+    for chars in _visual_lines(_page_glyphs(page)):
+        segs = _segments(chars)
+        prev_kind = None
+        for k, (kind, text, rect, words) in enumerate(segs):
+            before = segs[k - 1][1] if k > 0 and segs[k - 1][0] == "text" else ""
+            after = segs[k + 1][1] if k + 1 < len(segs) and segs[k + 1][0] == "text" else ""
+            if kind == "box":
+                layout["checkboxes"].append({"label": after, "rect": _rect(rect)})
+            elif kind == "blank":
+                # ช่องที่คั่นด้วย "x" ถือเป็นชุดเดียวกัน (ขนาด a x b x c)
+                if not (prev_kind == "blank" and before.strip().lower() == "x"):
+                    group += 1
+                    index = 0
+                    group_before = before
+                else:
+                    index += 1
+                layout["blanks"].append({"before": group_before, "after": after, "group": group,
+                                         "index": index, "rect": _rect(rect)})
+            else:
+                for choice_before, options in _choices_in(words):
+                    layout["choices"].append({"before": choice_before,
+                                              "options": {o: _rect(r) for o, r in options.items()}})
+            if kind != "text" or text.strip().lower() != "x":
+                prev_kind = kind
+
+    # ข้อความหลังช่องสุดท้ายของแต่ละชุด ใช้เป็น "after" ของทั้งชุด (เช่น "cm. from deep margin")
+    last_after = {}
+    for b in layout["blanks"]:
+        last_after[b["group"]] = b["after"]
+    for b in layout["blanks"]:
+        b["after"] = last_after[b["group"]]
+    return layout
+
+class TemplateLayout:
+    """
+    layout ของ template ทั้งไฟล์ แต่วิเคราะห์ทีละหน้าเมื่อถูกเรียกใช้ครั้งแรก (lazy)
+    ผลของแต่ละหน้าถูก cache ไว้ใน layout_cache/<template hash>/page_<n>.json
+    """
+    def __init__(self, pdf_path):
+        self.pdf_path = pdf_path
+        self.template_hash = template_hash(pdf_path)
+        self.cache_dir = os.path.join(LAYOUT_CACHE_DIR, self.template_hash)
+        with fitz.open(pdf_path) as doc:
+            self.page_count = len(doc)
+        self._pages = {}
+        self._doc = None
+
+    def page(self, n):
+        if n in self._pages:
+            return self._pages[n]
+
+        cache_file = os.path.join(self.cache_dir, f"page_{n}.json")
+        layout = None
+        if os.path.exists(cache_file):
+            with open(cache_file, encoding="utf-8") as f:
+                layout = json.load(f)
+            if layout.get("version") != ANALYZER_VERSION:
+                layout = None
+        if layout is None:
+            print(f"Analyzing template layout: {self.pdf_path} (page {n + 1})")
+            if self._doc is None:
+                self._doc = fitz.open(self.pdf_path)
+            layout = analyze_page(self._doc[n])
+            layout["version"] = ANALYZER_VERSION
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(cache_file, "w", encoding="utf-8") as f:
+                json.dump(layout, f, ensure_ascii=False, indent=1)
+
+        self._pages[n] = layout
+        return layout
+
+    def pages(self):
+        """วนทีละหน้า (วิเคราะห์เฉพาะหน้าที่วนไปถึง)"""
+        for n in range(self.page_count):
+            yield n, self.page(n)
+
+def get_layout(pdf_path):
+    """
+    คืนค่า TemplateLayout ของ template (หนึ่งตัวต่อ hash ต่อ process)
+    """
+    key = template_hash(pdf_path)
+    if key not in _LAYOUTS:
+        _LAYOUTS[key] = TemplateLayout(pdf_path)
+    return _LAYOUTS[key]
+
+# =========================================================
+# === 4. ค้นหาพิกัดจาก layout (ไม่ค้นบน PDF) ===
+# =========================================================
+
+def _norm(text):
+    return re.sub(r"\s+", " ", text.lower()).strip(" ,.")
+
+def find_checkbox(page_layout, label):
+    """Rect ของ ☐ ที่ข้อความกำกับขึ้นต้นด้วย label (ไม่สนตัวพิมพ์)"""
+    label = _norm(label)
+    for box in page_layout["checkboxes"]:
+        if _norm(box["label"]).startswith(label):
+            return fitz.Rect(box["rect"])
+    return None
+
+def find_blanks(page_layout, label, where="before"):
+    """
+    list ของ Rect ของช่องจุดไข่ปลาทั้งชุด (เช่น a x b x c)
+    where="before": ข้อความก่อนชุดลงท้ายด้วย label (เช่น "Measuring")
+    where="after":  ข้อความหลังชุดขึ้นต้นด้วย label (เช่น "cm. from deep margin")
+    """
+    label = _norm(label)
+    for b in page_layout["blanks"]:
+        if b["index"] != 0:
+            continue
+        text = _norm(b[where])
+        if (where == "before" and text.endswith(label)) or (where == "after" and text.startswith(label)):
+            return [fitz.Rect(x["rect"]) for x in page_layout["blanks"] if x["group"] == b["group"]]
+    return []
+
+def find_choice(page_layout, option, before=None):
+    """Rect ของตัวเลือกในวงเล็บ (เช่น "right" ใน "( right / left )"), before = ข้อความหน้าวงเล็บ"""
+    option = _norm(option)
+    for group in page_layout["choices"]:
+        if before is not None and not _norm(group["before"]).endswith(_norm(before)):
+            continue
+        for opt, rect in group["options"].items():
+            if _norm(opt) == option:
+                return fitz.Rect(rect)
+    return None
+
+# =========================================================
+# === 5. วาดลงพิกัดที่คำนวณไว้ ===
+# =========================================================
+
+def tick_box(page, rect, size=12):
+    """ขีด "/" ลงในช่อง ☐"""
+    page.insert_text(fitz.Point(rect.x0 + 1, rect.y1 - 1.5), "/", fontsize=size, fontname="helv")
+
+def circle_rect(page, rect, pad=1.5):
+    """วงกลมรอบตัวเลือก (เช่น right / left)"""
+    shape = page.new_shape()
+    shape.draw_oval(fitz.Rect(rect.x0 - pad, rect.y0 - pad, rect.x1 + pad, rect.y1 + pad))
+    shape.finish(color=(1, 0, 0), width=1.5)
+    shape.commit()
+
+def fill_blanks(page, rects, values, fontsize=10):
+    """เขียนค่าลงกลางช่องจุดไข่ปลาทีละช่อง (values ที่เกินจำนวนช่องจะถูกข้าม)"""
+    for rect, value in zip(rects, values):
+        box = fitz.Rect(rect.x0, rect.y0 - 3, rect.x1, rect.y1 + 5)
+        page.insert_textbox(box, str(value), fontsize=fontsize, fontname="helv", align=1)
+
+# =========================================================
+# === 6. กรอกแบบฟอร์มหลายหน้า (แก้เฉพาะหน้าที่มีการวาด) ===
+# =========================================================
+
+class FormPages:
+    """
+    แบบฟอร์มที่เปิดไว้สำหรับกรอก ค้นหาเป้าหมายได้ทุกหน้า (เรียงจากหน้าแรก)
+    โดยวิเคราะห์/ค้นหาเฉพาะหน้าที่จำเป็น และจดไว้ว่าหน้าไหนถูกวาดลงไป (touched)
+    """
+    def __init__(self, doc, layout, output_pdf=None):
+        self.doc = doc
+        self.layout = layout
+        self.output_pdf = output_pdf
+        self.touched = set()
+        self._loaded = {}
+        self._text = {}
+
+    def page(self, n, touch=True):
+        if n not in self._loaded:
+            self._loaded[n] = self.doc[n]
+        if touch:
+            self.touched.add(n)
+        return self._loaded[n]
+
+    def _may_contain(self, n, text):
+        """คัดกรองหน้าด้วยข้อความของหน้า (ดึงครั้งเดียวต่อหน้า) ก่อนเรียก search_for"""
+        if n not in self._text:
+            self._text[n] = re.sub(r"\s+", " ", self.page(n, touch=False).get_text().lower())
+        return all(tok in self._text[n] for tok in re.findall(r"[a-z0-9]+", text.lower()))
+
+    def locate(self, text):
+        """(page, hits) ของหน้าแรกที่พบ text หรือ (None, [])"""
+        for n in range(len(self.doc)):
+            if not self._may_contain(n, text):
+                continue
+            hits = self.page(n, touch=False).search_for(text)
+            if hits:
+                self.touched.add(n)
+                return self._loaded[n], hits
+        return None, []
+
+    def find_checkbox(self, label):
+        for n, page_layout in self.layout.pages():
+            rect = find_checkbox(page_layout, label)
+            if rect:
+                return self.page(n), rect
+        return None, None
+
+    def find_blanks(self, label, where="before"):
+        for n, page_layout in self.layout.pages():
+            rects = find_blanks(page_layout, label, where)
+            if rects:
+                return self.page(n), rects
+        return None, []
+
+    def find_choice(self, option, before=None):
+        for n, page_layout in self.layout.pages():
+            rect = find_choice(page_layout, option, before)
+            if rect:
+                return self.page(n), rect
+        return None, None
+
+def open_form(input_pdf, output_pdf):
+    """
+    คัดลอก template ไปเป็นไฟล์ output แล้วเปิดเพื่อกรอก
+    (บันทึกด้วย save_form() แบบ incremental: เขียนเพิ่มเฉพาะ object ของหน้าที่ถูกแก้)
+    """
+    shutil.copyfile(input_pdf, output_pdf)
+    return FormPages(fitz.open(output_pdf), get_layout(input_pdf), output_pdf)
+
+def save_form(form):
+    """บันทึกแบบ incremental แล้วปิดไฟล์ คืนค่าหมายเลขหน้าที่ถูกแก้ (เริ่มที่ 1)"""
+    if form.touched:
+        form.doc.save(form.output_pdf, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+    form.doc.close()
+    return sorted(n + 1 for n in form.touched)
+
+
+if __name__ == "__main__":
+    # ใช้งาน: python template_layout.py [template.pdf]
+    from filler_breast import PDF_IN
+
+    pdf = sys.argv[1] if len(sys.argv) > 1 else PDF_IN
+    layout = get_layout(pdf)
+    for n, page in layout.pages():
+        print(f"\n--- Page {n + 1}: {len(page['checkboxes'])} checkbox(es), "
+              f"{len(page['blanks'])} blank(s), {len(page['choices'])} choice group(s) ---")
+        for box in page["checkboxes"]:
+            print(f"☐ {box['rect']}  {box['label']}")
+        for b in page["blanks"]:
+            print(f"… {b['rect']}  [{b['group']}.{b['index']}] {b['before']!r} / {b['after']!r}")
+        for c in page["choices"]:
+            print(f"( ) {c['before']!r}: {' / '.join(c['options'])}")
@@ -0,0 +1,181 @@
+import re
+import sys
+import time
+
+# =========================================================
+# === 1. การตั้งค่า - Fuzzy matcher สำหรับคำศัพท์ในแบบฟอร์ม ===
+# =========================================================
+
+MAX_EDIT_DISTANCE = 2      # ระยะแก้ไขสูงสุดที่ยอมรับ
+MIN_TOKEN_LENGTH = 4       # คำที่สั้นกว่านี้ไม่จับคู่แบบ fuzzy (กัน "ten" -> "tan")
+MIN_CONFIDENCE = 0.75      # ค่าความมั่นใจขั้นต่ำที่ match_text() จะคืนค่า
+CUE_WINDOW = 3             # match_text(near=...): จับคู่เฉพาะคำที่อยู่ห่างจากคำนำ (cue) ไม่เกินกี่คำ
+
+# คำภาษาอังกฤษทั่วไปที่ใกล้กับคำในแบบฟอร์ม ไม่ใช่คำที่ ASR ฟังผิด
+# ("while" -> white, "form" -> firm, "sort" -> soft, "light"/"tight" -> right)
+STOPWORDS = frozenset("""
+    a an and are as at be been but by for form from had has have in into is it its of on or
+    that the then there these this those to was were which while with without
+    about after again all also any around back before being below between both down during each
+    fresh fine high just left like light long more most much near next only other over part
+    same short side some sort such than their them they through tight under upon very well
+    what when where whole wide will
+""".split())
+
+NUMBER_WORDS = frozenset({
+    "zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten",
+    "eleven", "twelve", "thirteen", "fourteen", "fifteen", "sixteen", "seventeen", "eighteen",
+    "nineteen", "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety", "hundred",
+    "point",
+})
+
+# =========================================================
+# === 2. ฟังก์ชันพื้นฐาน: edit distance / phonetic key ===
+# =========================================================
+
+def edit_distance(a, b, max_distance=MAX_EDIT_DISTANCE):
+    """
+    Damerau-Levenshtein (optimal string alignment) แบบหยุดเร็ว
+    คืนค่า max_distance + 1 ถ้าเกินระยะที่กำหนด
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+            row_min = min(row_min, cur[j])
+        if row_min > max_distance:
+            return max_distance + 1
+        prev2, prev = prev, cur
+    return prev[-1] if prev[-1] <= max_distance else max_distance + 1
+
+_SOUNDEX_CODES = {c: str(d) for d, letters in enumerate(
+    ["aeiouyhw", "bfpv", "cgjkqsxz", "dt", "l", "mn", "r"]) for c in letters}
+
+def phonetic_key(text):
+    """Soundex อย่างง่าย (ต่อคำ) ใช้ตัดสินเมื่อระยะแก้ไขเท่ากัน"""
+    keys = []
+    for word in re.findall(r"[a-z]+", text.lower()):
+        code, last = word[0], _SOUNDEX_CODES.get(word[0], "")
+        for c in word[1:]:
+            d = _SOUNDEX_CODES.get(c, "")
+            if d != last and d != "0":
+                code += d
+            if c not in "hw":
+                last = d
+        keys.append((code + "000")[:4])
+    return " ".join(keys)
+
+def _deletes(word, max_distance):
+    """ชุดคำที่ได้จากการลบตัวอักษรออก 0..max_distance ตัว (SymSpell)"""
+    result = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        nxt = set()
+        for w in frontier:
+            for i in range(len(w)):
+                nxt.add(w[:i] + w[i + 1:])
+        result |= nxt
+        frontier = nxt
+    return result
+
+# =========================================================
+# === 3. ดัชนีคำศัพท์ (precomputed, SymSpell-style) ===
+# =========================================================
+
+class DomainLexicon:
+    """
+    ดัชนีคำศัพท์ของแบบฟอร์ม ใช้แมปคำที่ ASR ฟังผิดไปยังคำในแบบฟอร์มที่ใกล้ที่สุด
+    lookup() คืนค่า (term, confidence) หรือ None
+    """
+    def __init__(self, terms, max_distance=MAX_EDIT_DISTANCE):
+        self.max_distance = max_distance
+        self.terms = list(dict.fromkeys(self.canonical(t) for t in terms))
+        self.word_counts = sorted({len(t.split()) for t in self.terms})
+        self._rank = {t: i for i, t in enumerate(self.terms)}
+        self._index = {}
+        self._phonetic = {t: phonetic_key(t) for t in self.terms}
+        for term in self.terms:
+            for d in _deletes(term, max_distance):
+                self._index.setdefault(d, []).append(term)
+        self._cache = {}
+
+    @staticmethod
+    def canonical(text):
+        return re.sub(r"\s*-\s*", "-", text.lower().strip())
+
+    def lookup(self, token):
+        token = self.canonical(token)
+        if token in self._cache:
+            return self._cache[token]
+
+        best = None
+        candidates = set()
+        for d in _deletes(token, self.max_distance):
+            candidates.update(self._index.get(d, ()))
+        if candidates:
+            key = phonetic_key(token)
+            scored = []
+            for term in candidates:
+                dist = edit_distance(token, term, self.max_distance)
+                if dist <= self.max_distance:
+                    # ระยะน้อยกว่าดีกว่า, ถ้าเท่ากันให้คำที่ออกเสียงใกล้เคียงชนะ
+                    scored.append((dist, self._phonetic[term] != key, self._rank[term], term))
+            if scored:
+                dist, _, _, term = min(scored)
+                best = (term, 1.0 - dist / max(len(token), len(term)))
+
+        self._cache[token] = best
+        return best
+
+    def match_text(self, text, min_confidence=MIN_CONFIDENCE, min_length=MIN_TOKEN_LENGTH,
+                   near=None, window=CUE_WINDOW):
+        """
+        สแกนทุกคำ (และกลุ่มคำสำหรับ term หลายคำ) ใน text
+        ข้ามคำทั่วไป (STOPWORDS), ตัวเลข และคำที่เป็นคำนำ (cue) เอง
+        near: list ของคำนำ ถ้าระบุ จะจับคู่เฉพาะคำที่อยู่ห่างจากคำนำไม่เกิน window คำ
+        คืนค่า list ของ (term, confidence, token_index, original_text) เรียงตามตำแหน่ง
+        """
+        tokens = self.canonical(text).split()
+        cues = {self.canonical(c) for c in near or ()}
+        if near is not None:
+            anchors = [i for i, tok in enumerate(tokens) if tok in cues]
+            if not anchors:
+                return []
+        hits = []
+        for n in self.word_counts:
+            for i in range(len(tokens) - n + 1):
+                words = tokens[i:i + n]
+                chunk = " ".join(words)
+                if len(chunk) < min_length:
+                    continue
+                if any(w in STOPWORDS or w in NUMBER_WORDS or w in cues or w[0].isdigit() for w in words):
+                    continue
+                if near is not None and not any(i - window <= a < i + n + window for a in anchors):
+                    continue
+                match = self.lookup(chunk)
+                if match and match[1] >= min_confidence:
+                    hits.append((match[0], match[1], i, chunk))
+        hits.sort(key=lambda h: (h[2], -h[1]))
+        return hits
+
+
+if __name__ == "__main__":
+    # ใช้งาน: python term_matcher.py "the nipple is averted and well defined"
+    from field_specs import SPECS
+
+    lexicon = SPECS.current().lexicon
+    text = " ".join(sys.argv[1:]) or "the nipple is averted with focal necrossis"
+    t0 = time.perf_counter()
+    hits = lexicon.match_text(text)
+    elapsed = (time.perf_counter() - t0) * 1000
+    for term, conf, i, raw in hits:
+        print(f"[{i}] '{raw}' -> '{term}' (confidence {conf:.2f})")
+    print(f"\n{len(text.split())} token(s) in {elapsed:.3f} ms")
@@ -1,10 +1,13 @@
+import os
 import re
-import json
 import wave
 import fitz  # PyMuPDF
 import numpy as np
 import soundfile as sf
-from vosk import Model, KaldiRecognizer
+from asr_backends import load_backend
+from case_index import index_case
+from case_store import save_case
+from template_layout import open_form, save_form, fill_blanks
 
 # =========================
 # PATH CONFIG
@@ -28,20 +31,22 @@ def prepare_audio(inp, out="temp.wav"):
 # =========================
 # TRANSCRIBE (VOSK)
 # =========================
-def transcribe(audio):
+def transcribe(audio, results=None):
+    # results: ถ้าส่ง list เข้ามา จะได้ผลลัพธ์ดิบ (มีเวลารายคำ) ไว้ผูกฟิลด์กับช่วงเสียงใน case_index
     wf = wave.open(audio, "rb")
-    rec = KaldiRecognizer(Model(VOSK_MODEL), wf.getframerate())
-    rec.SetWords(True)
+    rec = load_backend(VOSK_MODEL).recognizer(wf.getframerate(), audio_id=audio)
 
     res = []
     while True:
         d = wf.readframes(4000)
         if len(d) == 0:
             break
-        if rec.AcceptWaveform(d):
-            res.append(json.loads(rec.Result()))
-    res.append(json.loads(rec.FinalResult()))
+        if rec.accept(d):
+            res.append(rec.result())
+    res.append(rec.final_result())
     wf.close()
+    if results is not None:
+        results.extend(res)
 
     return " ".join(r.get("text", "") for r in res).lower()
 
@@ -73,6 +78,7 @@ def normalize(t):
 # =========================
 def parse_breast(t):
     d = {
+        "surgical_number": None,
         "side": None,
         "procedure": None,
         "specimen": None,
@@ -109,13 +115,17 @@ def parse_breast(t):
         if c in t:
             d["mass_color"].append(c)
 
+    # หมายเลข surgical = case id ของดัชนี/ที่เก็บเคส (เหมือน filler_breast)
+    m = re.search(r"(?:surgical|specimen) (?:number|id) (?:is|number) ?(\d+)", t)
+    if m: d["surgical_number"] = m.group(1)
+
     return d
 
 # =========================
 # PDF HELPERS
 # =========================
-def circle_word(page, word):
-    hits = page.search_for(word)
+def circle_word(form, word):
+    page, hits = form.locate(word)
     if not hits:
         return False
     r = hits[0]
@@ -127,52 +137,52 @@ def circle_word(page, word):
     s.commit()
     return True
 
-def write_after(page, x, y, text):
-    rect = fitz.Rect(x, y, x + 200, y + 12)
-    page.insert_textbox(rect, text, fontsize=10, fontname="helv")
-
 # =========================
-# ⚠️ ABSOLUTE POSITIONS (ปรับครั้งเดียว ใช้ยาว)
+# ช่องจุดไข่ปลาจาก layout ของ template ทุกหน้า (ดู template_layout.py)
 # =========================
-POS = {
-    "mass_size": (280, 420),      # 👈 ปรับตำแหน่งนี้ครั้งเดียว
-    "specimen": (260, 190),
-    "skin": (260, 220),
+BLANK_LABEL = {
+    "mass_size": "infiltrative firm yellow white mass",
+    "specimen": "Measuring",
+    "skin": "The skin ellipse",
 }
 
+def write_dims(form, key, dims):
+    page, rects = form.find_blanks(BLANK_LABEL[key])
+    fill_blanks(page, rects, dims)
+
 # =========================
 # MAIN
 # =========================
 wav = prepare_audio(AUDIO)
-txt = normalize(transcribe(wav))
+results = []
+txt = normalize(transcribe(wav, results))
 
 print("Transcript:\n", txt, "\n")
 
 data = parse_breast(txt)
 print("Parsed:", data)
+# case id: หมายเลข surgical ถ้ามี ไม่เช่นนั้นใช้ชื่อไฟล์เสียง (เหมือน case_splitter.segment_case_id)
+case_id = data["surgical_number"] or os.path.splitext(os.path.basename(AUDIO))[0]
+save_case(case_id, data)
+index_case(case_id, txt, data, results, audio_file=AUDIO)
 
-doc = fitz.open(PDF_IN)
-page = doc[0]
+form = open_form(PDF_IN, PDF_OUT)
 
 # circle checkboxes (ถ้ามี text)
-circle_word(page, "Right")
-circle_word(page, "Modified radical mastectomy")
-circle_word(page, "Inverted nipple")
+circle_word(form, "Right")
+circle_word(form, "Modified radical mastectomy")
+circle_word(form, "Inverted nipple")
 
-# write numbers by position
+# write numbers into the template's dotted blanks
 if data["specimen"]:
-    write_after(page, *POS["specimen"],
-                " x ".join(data["specimen"]) + " cm")
+    write_dims(form, "specimen", data["specimen"])
 
 if data["skin"]:
-    write_after(page, *POS["skin"],
-                " x ".join(data["skin"]) + " cm")
+    write_dims(form, "skin", data["skin"])
 
 if data["mass_dim"]:
-    write_after(page, *POS["mass_size"],
-                " x ".join(data["mass_dim"]) + " cm")
+    write_dims(form, "mass_size", data["mass_dim"])
 
-doc.save(PDF_OUT)
-doc.close()
+save_form(form)
 
 print(f"✅ PDF Drawing Complete → {PDF_OUT}")
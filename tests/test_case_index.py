@@ -0,0 +1,16 @@
+from case_index import index_case, search
+from case_store import save_case, load_columns, mass_size_stats
+from filler_breast import parse_transcribed_text
+
+
+def test_mass_size_from_dictated_case(tmp_path):
+    parsed = parse_transcribed_text("surgical number is 77 left total mastectomy "
+                                    "specimen measuring 12 x 8 x 3 the mass measures 3.5 x 2 x 1 firm white mass")
+    db, store = str(tmp_path / "index.sqlite"), str(tmp_path / "cases.jsonl")
+    index_case("77", "transcript", parsed, db=db)
+    save_case("77", parsed, store=store)
+
+    assert [r["case_id"] for r in search(ranges={"mass_max": (3, None)}, db=db)] == ["77"]
+    assert search(ranges={"mass_max": (4, None)}, db=db) == []
+    stats = mass_size_stats(load_columns(store))
+    assert stats["with_mass"] == 1 and stats["median_cm"] == 3.5
@@ -0,0 +1,72 @@
+import json
+import wave
+
+import fitz
+import pytest
+
+import corrections
+import vosk_transcrib_breast
+from case_store import save_case, load_case
+from filler_breast import parse_transcribed_text
+
+DICTATION = ("surgical number is 123 received in formalin is a left total mastectomy "
+             "specimen measuring 12 x 8 x 3 the mass measures 3 x 2 x 1 firm white mass")
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # store / index / render store / checkpoint ใช้ path สัมพัทธ์ -> แยกไว้ใน tmp_path
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(vosk_transcrib_breast, "QUALITY_GATE", False)
+    return tmp_path
+
+
+def _clip(path, text, rate=16000, seconds=4.0):
+    """ไฟล์เสียงเงียบ + ผลถอดความที่บันทึกไว้ (.replay.json) สำหรับ backend "replay" """
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(b"\0\0" * int(rate * seconds))
+    words = text.split()
+    step = (seconds - 0.5) / len(words)
+    result = [{"word": word, "start": i * step, "end": (i + 0.8) * step, "conf": 1.0} for i, word in enumerate(words)]
+    with open(str(path).rsplit(".", 1)[0] + ".replay.json", "w", encoding="utf-8") as f:
+        json.dump([{"text": text, "result": result}], f)
+    return str(path)
+
+
+def _pdf_text(path):
+    with fitz.open(path) as doc:
+        return " ".join(page.get_text() for page in doc)
+
+
+def test_mass_dimension_correction(workdir):
+    save_case("123", parse_transcribed_text(DICTATION))
+    clip = _clip(workdir / "fix.wav", "correction mass measures two point one by one point eight by one point five")
+
+    merged = corrections.apply_correction("123", clip, str(workdir / "out.pdf"), model_path="replay:")
+
+    assert tuple(merged["mass_dims"]) == ("2.1", "1.8", "1.5")
+    assert "left" in merged["targets_to_circle"]
+    assert tuple(load_case("123")["parsed"]["mass_dims"]) == ("2.1", "1.8", "1.5")
+    assert "2.1 x 1.8 x 1.5 cm" in _pdf_text(workdir / "out.pdf")
+
+
+def test_correction_of_filled_script_case(workdir):
+    # รูปแบบของ parse_breast() ใน Filled1.py / Filled_2.py
+    save_case("456", {
+        "surgical_number": "456", "side": "left", "procedure": "simple", "specimen": ("12", "8", "3"),
+        "skin": ("10", "4"), "nipple": "normal", "mass_dim": ("3", "2", "1"), "quadrant_vert": "upper",
+        "quadrant_hori": "outer", "margins": {"deep": "1.5"}, "mass_color": ["white"],
+    })
+    clip = _clip(workdir / "fix456.wav", "correction mass measures two point one by one point eight by one point five")
+
+    merged = corrections.apply_correction("456", clip, str(workdir / "out456.pdf"), model_path="replay:")
+
+    assert tuple(merged["mass_dims"]) == ("2.1", "1.8", "1.5")
+    assert merged["targets_to_circle"] == ["left", "simple", "everted", "white"]
+    assert merged["margins"] == {"deep": "1.5"}
+    record = load_case("456")
+    assert record["side"] == "left" and record["nipple"] == "everted" and record["margin_deep"] == 1.5
+    assert "2.1 x 1.8 x 1.5 cm" in _pdf_text(workdir / "out456.pdf")
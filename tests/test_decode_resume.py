@@ -0,0 +1,107 @@
+import json
+import wave
+
+import numpy as np
+
+from asr_backends import Backend, Recognizer
+from vosk_transcrib_breast import decode_results, iter_decode, checkpoint_path
+
+RATE = 8000
+ENDPOINT = int(0.3 * RATE)      # เงียบเท่านี้หลังคำ = จบประโยค
+CHUNK = 1000
+
+
+class StatefulRecognizer(Recognizer):
+    """
+    recognizer ปลอมที่มีสถานะแบบ Vosk: คำ = ช่วงที่ sample ไม่เป็นศูนย์
+    ชื่อคำขึ้นกับปริมาณเสียงที่ recognizer ตัวนี้รับมาแล้ว (แทนสถานะ feature/i-vector)
+    และเสียงหลังจุดจบประโยคใน chunk เดียวกันค้างอยู่ใน recognizer ตัวเดิม
+    """
+    def __init__(self):
+        self.seen, self.silence, self.cur = 0, 0, None
+        self.words, self.ready = [], []
+
+    def accept(self, pcm_bytes):
+        for v in np.frombuffer(pcm_bytes, dtype=np.int16):
+            if v:
+                if self.cur is None:
+                    self.cur = self.seen
+                self.silence = 0
+            else:
+                if self.cur is not None:
+                    self.words.append((self.cur, self.seen))
+                    self.cur = None
+                self.silence += 1
+                if self.words and self.silence == ENDPOINT:
+                    self.ready.append(self._emit())
+            self.seen += 1
+        return bool(self.ready)
+
+    def _emit(self):
+        words = [{"word": f"w{a}", "start": a / RATE, "end": b / RATE, "conf": 1.0} for a, b in self.words]
+        self.words = []
+        return {"text": " ".join(w["word"] for w in words), "result": words}
+
+    def result(self):
+        return self.ready.pop(0) if self.ready else {"text": ""}
+
+    def final_result(self):
+        if self.cur is not None:
+            self.words.append((self.cur, self.seen))
+            self.cur = None
+        return self._emit() if self.words else {"text": "", "result": []}
+
+
+class StatefulBackend(Backend):
+    name = "stateful"
+
+    def recognizer(self, sample_rate, audio_id=None, offset_sec=0.0):
+        return StatefulRecognizer()
+
+
+def _write_wav(path):
+    # ประโยคละ 3 คำ (0.2 s, เว้น 0.1 s) ระหว่างประโยคเงียบ 0.35 s:
+    # คำแรกของประโยคถัดไปเริ่มใน chunk เดียวกับจุดจบประโยค
+    word, gap, pause = [np.full(int(s * RATE), v, dtype=np.int16) for s, v in ((0.2, 3000), (0.1, 0), (0.35, 0))]
+    parts = []
+    for _ in range(6):
+        parts += [word, gap, word, gap, word, pause]
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(RATE)
+        w.writeframes(np.concatenate(parts).tobytes())
+
+
+def _decode(path, checkpoint):
+    with wave.open(str(path), "rb") as wf:
+        return decode_results(StatefulBackend(), wf, chunk_frames=CHUNK, audio_id=str(path), checkpoint=checkpoint)
+
+
+def test_resume_matches_uninterrupted_run(tmp_path):
+    audio = tmp_path / "case.wav"
+    _write_wav(audio)
+    expected = _decode(audio, str(tmp_path / "straight.jsonl"))
+    words = [w for r in expected for w in r.get("result", [])]
+    assert len(words) == 18
+
+    # "ล่ม" หลังบันทึกไปแล้ว 2 ประโยค
+    ckpt = str(tmp_path / "crash.jsonl")
+    with wave.open(str(audio), "rb") as wf:
+        steps = iter_decode(StatefulBackend(), wf, chunk_frames=CHUNK, audio_id=str(audio), checkpoint=ckpt)
+        while True:
+            next(steps)
+            with open(ckpt, encoding="utf-8") as f:
+                if len(f.read().splitlines()) >= 3:
+                    break
+        steps.close()
+
+    with open(ckpt, encoding="utf-8") as f:
+        assert len([json.loads(line) for line in f.read().splitlines()[1:]]) == 2
+    assert _decode(audio, ckpt) == expected
+
+
+def test_checkpoint_keyed_by_full_path(tmp_path):
+    a = checkpoint_path(str(tmp_path / "a" / "case.wav"), str(tmp_path))
+    b = checkpoint_path(str(tmp_path / "b" / "case.wav"), str(tmp_path))
+    assert a != b
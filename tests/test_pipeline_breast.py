@@ -0,0 +1,39 @@
+import os
+
+import pytest
+
+pytest.importorskip("pydub")   # pipeline_breast -> tran.py
+
+import pipeline_breast
+
+
+def _words(text):
+    return [{"word": w, "start": i * 0.5, "end": i * 0.5 + 0.4, "conf": 1.0} for i, w in enumerate(text.split())]
+
+
+def _render(source, text):
+    case_id = pipeline_breast.audio_case_id(source)
+    wav_path = os.path.join(pipeline_breast.WORK_DIR, f"{case_id}.wav")
+    return pipeline_breast.render_step((case_id, text, _words(text), wav_path))
+
+
+def test_same_file_name_in_different_folders_does_not_collide(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(pipeline_breast.OUTPUT_DIR)
+    text = "right breast specimen measuring 12 x 8 x 3 cm"
+
+    _, first = _render(str(tmp_path / "monday" / "case1.mp3"), text)
+    _, second = _render(str(tmp_path / "tuesday" / "case1.mp3"), text)
+
+    assert first != second
+    assert all(os.path.basename(p).startswith("case1_") for p in first + second)
+    assert all(os.path.exists(p) for p in first + second)
+
+
+def test_surgical_number_names_the_case(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(pipeline_breast.OUTPUT_DIR)
+
+    _, outputs = _render(str(tmp_path / "case1.mp3"), "surgical number is 4521 specimen measuring 12 x 8 x 3 cm")
+
+    assert outputs == [os.path.join(pipeline_breast.OUTPUT_DIR, "4521.pdf")]
@@ -0,0 +1,42 @@
+import fitz
+import numpy as np
+import pytest
+
+import preview_breast
+from filler_breast import draw_data_on_pdf
+
+
+@pytest.fixture
+def two_page_template(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(preview_breast, "PREVIEW_CACHE_DIR", str(tmp_path / "preview_cache"))
+    path = str(tmp_path / "template.pdf")
+    doc = fitz.open()
+    doc.new_page(width=300, height=200).insert_text((20, 50), "Surgical number:", fontsize=10)
+    doc.new_page(width=300, height=200).insert_text((20, 50), "The mass measures", fontsize=10)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def _pages(pdf_path, dpi):
+    with fitz.open(pdf_path) as doc:
+        return [preview_breast._pixmap_to_array(p.get_pixmap(dpi=dpi, alpha=False)).copy() for p in doc]
+
+
+def test_preview_draws_on_every_page_the_form_touches(two_page_template, tmp_path):
+    parsed = {"targets_to_circle": [], "surgical_number": "4521", "specimen_dims": None,
+              "kidney_dims": None, "ureter_vals": None, "mass_dims": ("2.1", "1.8", "1.5")}
+
+    preview = preview_breast.render_preview(parsed, two_page_template, dpi=72)
+
+    blank = _pages(two_page_template, 72)
+    filled_pdf = str(tmp_path / "filled.pdf")
+    draw_data_on_pdf(two_page_template, filled_pdf, parsed)
+    filled = _pages(filled_pdf, 72)
+
+    assert preview.shape == (400, 300, 3)
+    for n in range(2):
+        page = preview[n * 200:(n + 1) * 200]
+        assert (page != blank[n]).any(), f"nothing drawn on page {n + 1}"
+        assert np.abs(page.astype(int) - filled[n]).mean() < 1.0
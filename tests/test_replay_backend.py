@@ -0,0 +1,142 @@
+import json
+import os
+import wave
+
+import pytest
+
+import tiered_transcribe as tiered
+import vosk_transcrib_breast
+from vosk_transcrib_breast import decode_results, load_model, transcribe_audio
+
+RATE = 16000
+
+SPEECH = [
+    [("surgical", 0.2, 0.5), ("number", 0.6, 0.9), ("is", 1.0, 1.2), ("4521", 1.3, 1.9)],
+    [("specimen", 2.2, 2.6), ("measuring", 2.7, 3.1), ("12", 3.2, 3.4), ("x", 3.5, 3.6),
+     ("8", 3.7, 3.8), ("x", 3.9, 4.0), ("3", 4.1, 4.3)],
+    [("cm", 4.7, 4.9)],
+]
+
+
+def _utt(words, conf=1.0):
+    result = [{"word": w, "start": s, "end": e, "conf": conf} for w, s, e in words]
+    return {"text": " ".join(w for w, _, _ in words), "result": result}
+
+
+def _audio(path, seconds=5):
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(RATE)
+        w.writeframes(b"\0\0" * RATE * seconds)
+    return path
+
+
+def _replay(audio, results, directory=None):
+    name = os.path.splitext(os.path.basename(audio))[0] + ".replay.json"
+    directory = directory or os.path.dirname(audio)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+        json.dump(results, f)
+
+
+def _timings(results):
+    return [(w["word"], w["start"], w["end"]) for r in results for w in r.get("result", [])]
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(vosk_transcrib_breast, "QUALITY_GATE", False)
+    return tmp_path
+
+
+def test_decode_results_replays_text_and_word_times(workdir):
+    audio = _audio(str(workdir / "case.wav"))
+    _replay(audio, [_utt(u) for u in SPEECH])
+
+    with wave.open(audio, "rb") as wf:
+        results = decode_results(load_model("replay:", 0), wf, audio_id=audio)
+
+    assert [r["text"] for r in results if r["text"]] == \
+        ["surgical number is 4521", "specimen measuring 12 x 8 x 3", "cm"]
+    assert _timings(results) == [w for u in SPEECH for w in u]
+
+
+def test_decode_results_range_reports_file_times(workdir):
+    audio = _audio(str(workdir / "case.wav"))
+    _replay(audio, [_utt(u) for u in SPEECH])
+
+    with wave.open(audio, "rb") as wf:
+        results = decode_results(load_model("replay:", 0), wf, 2 * RATE, int(4.4 * RATE), audio_id=audio)
+
+    assert " ".join(r["text"] for r in results if r["text"]) == "specimen measuring 12 x 8 x 3"
+    assert _timings(results) == [(w, pytest.approx(s), pytest.approx(e)) for w, s, e in SPEECH[1]]
+
+
+def test_transcribe_audio_with_words(workdir):
+    audio = _audio(str(workdir / "case.wav"))
+    _replay(audio, [_utt(u) for u in SPEECH])
+
+    text, words = transcribe_audio("replay:", audio, with_words=True)
+
+    assert text == "surgical number is 4521 specimen measuring 12 x 8 x 3 cm"
+    assert [(w["word"], w["start"], w["end"]) for w in words] == [w for u in SPEECH for w in u]
+
+
+def _tiered(monkeypatch, *args):
+    decoded = []
+
+    def recording(*a, **kw):
+        results = decode_results(*a, **kw)
+        decoded.append(results)
+        return results
+
+    monkeypatch.setattr(tiered, "decode_results", recording)
+    return tiered.tiered_transcribe(*args), decoded
+
+
+def test_tiered_confident_small_model(workdir, monkeypatch):
+    audio = _audio(str(workdir / "case.wav"))
+    _replay(audio, [_utt(u) for u in SPEECH], str(workdir / "small"))
+    _replay(audio, [], str(workdir / "large"))
+
+    (text, parsed, info), decoded = _tiered(monkeypatch, audio, f"replay:{workdir / 'small'}",
+                                            f"replay:{workdir / 'large'}")
+
+    assert info["tier"] == "small"
+    assert text == "surgical number is 4521 specimen measuring 12 x 8 x 3 cm"
+    assert parsed["surgical_number"] == "4521"
+    assert len(decoded) == 1 and _timings(decoded[0]) == [w for u in SPEECH for w in u]
+
+
+def test_tiered_missing_field_falls_back_to_large(workdir, monkeypatch):
+    audio = _audio(str(workdir / "case.wav"))
+    misheard = [("surgical", 0.2, 0.5), ("lumber", 0.6, 0.9), ("is", 1.0, 1.2), ("for", 1.3, 1.9)]
+    _replay(audio, [_utt(misheard)] + [_utt(u) for u in SPEECH[1:]], str(workdir / "small"))
+    _replay(audio, [_utt(u) for u in SPEECH], str(workdir / "large"))
+
+    (text, parsed, info), decoded = _tiered(monkeypatch, audio, f"replay:{workdir / 'small'}",
+                                            f"replay:{workdir / 'large'}")
+
+    assert info["tier"] == "large"
+    assert info["large_audio_sec"] == pytest.approx(5.0)
+    assert text == "surgical number is 4521 specimen measuring 12 x 8 x 3 cm"
+    assert parsed["surgical_number"] == "4521"
+    assert _timings(decoded[-1]) == [w for u in SPEECH for w in u]
+
+
+def test_tiered_low_confidence_range_uses_large_words(workdir, monkeypatch):
+    audio = _audio(str(workdir / "case.wav"))
+    unsure = _utt([("specimen", 2.2, 2.6), ("measuring", 2.7, 3.1), ("13", 3.2, 3.4), ("x", 3.5, 3.6),
+                   ("8", 3.7, 3.8), ("x", 3.9, 4.0), ("3", 4.1, 4.3)], conf=0.4)
+    _replay(audio, [_utt(SPEECH[0]), unsure, _utt(SPEECH[2])], str(workdir / "small"))
+    _replay(audio, [_utt(u) for u in SPEECH], str(workdir / "large"))
+
+    (text, parsed, info), decoded = _tiered(monkeypatch, audio, f"replay:{workdir / 'small'}",
+                                            f"replay:{workdir / 'large'}")
+
+    assert info["tier"] == "ranges"
+    assert info["large_audio_sec"] == pytest.approx(4.3 + tiered.PAD_SECONDS - (2.2 - tiered.PAD_SECONDS))
+    assert text == "surgical number is 4521 specimen measuring 12 x 8 x 3 cm"
+    assert _timings(decoded[-1]) == [(w, pytest.approx(s), pytest.approx(e)) for w, s, e in SPEECH[1]]
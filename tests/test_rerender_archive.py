@@ -0,0 +1,40 @@
+import json
+
+import fitz
+
+import rerender_archive
+from case_store import save_case, load_case, CASE_STORE
+from field_specs import SPECS
+
+# รูปแบบของ parse_breast() ใน Filled1.py / Filled_2.py
+FILLED = {
+    "surgical_number": "456", "side": "left", "procedure": "simple", "specimen": ("12", "8", "3"),
+    "skin": ("10", "4"), "nipple": "inverted", "mass_dim": ("3", "2", "1"), "quadrant_vert": "upper",
+    "quadrant_hori": "outer", "margins": {"deep": "1.5"}, "mass_color": ["white"],
+}
+
+
+def test_filled_record_is_normalized_on_save(tmp_path):
+    store = str(tmp_path / "cases.jsonl")
+    save_case("456", FILLED, store=store)
+    record = load_case("456", store=store)
+    assert record["kind"] == "parse_breast"
+    assert record["parsed"]["targets_to_circle"] == ["left", "simple", "inverted", "white"]
+    assert record["parsed"]["mass_dims"] == ["3", "2", "1"]
+    assert record["side"] == "left" and record["mass_3"] == 1.0 and record["margin_deep"] == 1.5
+
+
+def test_archive_rerenders_filled_records(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    save_case("456", FILLED)
+    # record ที่บันทึกก่อนมี normalize_parsed (parsed เป็นรูปแบบ parse_breast ตรงๆ)
+    with open(CASE_STORE, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"case_id": "457", "parsed": dict(FILLED, surgical_number="457")}) + "\n")
+
+    summary = rerender_archive.rerender_archive(SPECS.current().template, str(tmp_path / "out"), workers=1,
+                                                store=str(tmp_path / "render_store"))
+
+    assert summary["errors"] == 0 and summary["rendered"] == 2
+    for case_id in ("456", "457"):
+        with fitz.open(str(tmp_path / "out" / f"{case_id}.pdf")) as doc:
+            assert "3 x 2 x 1 cm" in " ".join(page.get_text() for page in doc)
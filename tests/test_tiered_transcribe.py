@@ -0,0 +1,50 @@
+import json
+import os
+import wave
+
+from tiered_transcribe import tiered_transcribe
+
+
+def _words(*items):
+    return [{"word": w, "start": s, "end": e, "conf": c} for w, s, e, c in items]
+
+
+def _utt(*items):
+    words = _words(*items)
+    return {"text": " ".join(w["word"] for w in words), "result": words}
+
+
+def _replay(directory, results):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "case.replay.json"), "w", encoding="utf-8") as f:
+        json.dump(results, f)
+    return f"replay:{directory}"
+
+
+def test_partly_overlapping_utterances_are_not_duplicated(tmp_path):
+    audio = str(tmp_path / "case.wav")
+    with wave.open(audio, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(16000)
+        w.writeframes(b"\0\0" * 16000 * 6)
+
+    # ประโยคกลางมีคำความมั่นใจต่ำ -> ช่วงที่ถอดความใหม่ (เผื่อ 0.3 s) = 1.7 - 4.1 s
+    # ซึ่งทับคำสุดท้ายของประโยคแรก ("123") และคำแรกของประโยคสุดท้าย ("firm")
+    small = _replay(str(tmp_path / "small"), [
+        _utt(("surgical", 0.2, 0.5, 1.0), ("number", 0.6, 0.9, 1.0), ("is", 1.0, 1.3, 1.0), ("123", 1.5, 1.8, 1.0)),
+        _utt(("specimen", 2.0, 2.4, 1.0), ("measuring", 2.5, 2.9, 1.0), ("12", 3.0, 3.1, 1.0), ("x", 3.15, 3.2, 0.3),
+             ("8", 3.25, 3.35, 1.0), ("x", 3.4, 3.45, 1.0), ("3", 3.5, 3.8, 1.0)),
+        _utt(("firm", 4.0, 4.4, 1.0), ("white", 4.5, 4.8, 1.0), ("mass", 4.9, 5.3, 1.0)),
+    ])
+    large = _replay(str(tmp_path / "large"), [
+        _utt(("123", 1.72, 1.8, 1.0), ("specimen", 2.0, 2.4, 1.0), ("measuring", 2.5, 2.9, 1.0), ("12", 3.0, 3.1, 1.0),
+             ("by", 3.15, 3.2, 1.0), ("8", 3.25, 3.35, 1.0), ("by", 3.4, 3.45, 1.0), ("3", 3.5, 3.8, 1.0),
+             ("firm", 4.0, 4.08, 1.0)),
+    ])
+
+    text, parsed, info = tiered_transcribe(audio, small, large)
+
+    assert info["tier"] == "ranges"
+    assert text == "surgical number is 123 specimen measuring 12 by 8 by 3 firm white mass"
+    assert parsed["specimen_dims"] == ("12", "8", "3")
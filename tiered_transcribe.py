@@ -0,0 +1,174 @@
+import os
+import sys
+import time
+import wave
+
+from vosk_transcrib_breast import load_model, decode_results, MODEL_PATH, AUDIO_FILE
+from filler_breast import parse_transcribed_text
+
+# =========================================================
+# === 1. การตั้งค่า - Two-tier decoding ===
+# =========================================================
+
+# โมเดลเล็ก (เร็ว) ใช้ถอดความรอบแรก / โมเดลใหญ่ใช้เฉพาะเมื่อจำเป็น
+SMALL_MODEL_PATH = "C:/Users/HP/Downloads/ProjectSound/vosk-model-small-en-us-0.15"
+LARGE_MODEL_PATH = MODEL_PATH
+
+# N-best ของโมเดลเล็ก (rescore ด้วยคำศัพท์ของแบบฟอร์ม) ช่วยลดการส่งต่อไปโมเดลใหญ่
+# คำที่ได้มี "agreement" = สัดส่วนของตัวเลือก N-best ที่เห็นตรงกัน (ดู nbest_rescorer.py)
+SMALL_MODEL_ALTERNATIVES = 5
+
+# ฟิลด์ที่ต้องมี ถ้าขาดจะถอดความใหม่ทั้งไฟล์ด้วยโมเดลใหญ่
+REQUIRED_FIELDS = ("surgical_number", "specimen_dims")
+
+CONF_THRESHOLD = 0.6   # คำที่ความมั่นใจ (conf ของ Vosk) ต่ำกว่านี้ -> ถอดความประโยคนั้นใหม่ด้วยโมเดลใหญ่
+# เกณฑ์แยกสำหรับ agreement ของ N-best: ตัวเลือก N-best มักต่างกันทีละคำ คำที่ 2-3 ใน 5 ตัวเลือกเห็นต่าง
+# จึงเป็นเรื่องปกติ ส่งต่อเฉพาะคำที่แทบไม่มีตัวเลือกอื่นเห็นด้วย (1 ใน 5 = ตัวที่เลือกเอง)
+AGREEMENT_THRESHOLD = 0.3
+PAD_SECONDS = 0.3      # เผื่อเวลาก่อน/หลังช่วงที่ถอดความใหม่
+
+# สถิติสะสมของทุกเคสใน process นี้
+STATS = {"cases": 0, "audio_sec": 0.0, "small_sec": 0.0, "large_sec": 0.0,
+         "escalated_full": 0, "escalated_ranges": 0, "large_audio_sec": 0.0}
+
+# =========================================================
+# === 2. Helpers ===
+# =========================================================
+
+def _join_text(results):
+    return " ".join(r.get("text", "") for r in results if r.get("text")).strip()
+
+def _low_confidence_utterances(results, threshold=CONF_THRESHOLD, agreement_threshold=AGREEMENT_THRESHOLD):
+    """คืนค่า index ของประโยค (final result) ที่มีคำความมั่นใจต่ำ หรือตัวเลือก N-best เห็นตรงกันน้อย"""
+    return [i for i, r in enumerate(results)
+            if any(w.get("conf", 1.0) < threshold or w.get("agreement", 1.0) < agreement_threshold
+                   for w in r.get("result", []))]
+
+def _utterance_span(result, pad=PAD_SECONDS):
+    words = result["result"]
+    return max(words[0]["start"] - pad, 0.0), words[-1]["end"] + pad
+
+def _outside(result, spans):
+    """
+    ประโยคที่เหลือเฉพาะคำที่ไม่ทับกับช่วงที่ถอดความใหม่ (None ถ้าไม่เหลือคำ)
+    คำที่ทับช่วงใดช่วงหนึ่งแม้เพียงบางส่วนจะอยู่ในผลของโมเดลใหญ่แล้ว
+    """
+    words = [w for w in result["result"] if not any(w["start"] < e and s < w["end"] for s, e in spans)]
+    if len(words) == len(result["result"]):
+        return result
+    if not words:
+        return None
+    return {"text": " ".join(w["word"] for w in words), "result": words}
+
+def _merge_spans(spans):
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+# =========================================================
+# === 3. ถอดความแบบสองชั้น ===
+# =========================================================
+
+def tiered_transcribe(audio_file, small_model_path=SMALL_MODEL_PATH, large_model_path=LARGE_MODEL_PATH,
+                      required_fields=REQUIRED_FIELDS, threshold=CONF_THRESHOLD):
+    """
+    1) ถอดความด้วยโมเดลเล็ก แล้ว parse
+    2) ถ้าฟิลด์ที่จำเป็นขาด -> ถอดความใหม่ทั้งไฟล์ด้วยโมเดลใหญ่
+    3) ถ้าไม่ขาดแต่มีประโยคที่ความมั่นใจต่ำ -> ถอดความใหม่เฉพาะช่วงเวลานั้นด้วยโมเดลใหญ่
+    คืนค่า (transcribed_text, parsed_data, info)
+    """
+    if not os.path.exists(audio_file):
+        return f"Error: Audio file not found at {audio_file}", None, {}
+
+    wf = wave.open(audio_file, "rb")
+    rate = wf.getframerate()
+    duration = wf.getnframes() / rate
+    info = {"tier": "small", "audio_sec": duration, "small_sec": 0.0, "large_sec": 0.0, "large_audio_sec": 0.0}
+
+    t0 = time.perf_counter()
+    results = decode_results(load_model(small_model_path, SMALL_MODEL_ALTERNATIVES), wf, audio_id=audio_file)
+    info["small_sec"] = time.perf_counter() - t0
+
+    text = _join_text(results)
+    parsed = parse_transcribed_text(text)
+    missing = [f for f in required_fields if not parsed.get(f)]
+
+    if missing:
+        print(f"[tier] missing {missing} -> full decode with large model")
+        t0 = time.perf_counter()
+        results = decode_results(load_model(large_model_path), wf, audio_id=audio_file)
+        info.update(tier="large", large_sec=time.perf_counter() - t0, large_audio_sec=duration)
+    else:
+        low = _low_confidence_utterances(results, threshold)
+        if low:
+            spans = _merge_spans(_utterance_span(results[i]) for i in low)
+            print(f"[tier] {len(low)} low-confidence utterance(s) -> re-decode {len(spans)} range(s)")
+            large = load_model(large_model_path)
+            t0 = time.perf_counter()
+            replacements = []
+            for start, end in spans:
+                replacements.append((start, end, decode_results(large, wf, int(start * rate), int(end * rate),
+                                                                audio_id=audio_file)))
+                info["large_audio_sec"] += end - start
+            info.update(tier="ranges", large_sec=time.perf_counter() - t0)
+
+            # แทนที่คำของโมเดลเล็กที่ทับกับช่วงที่ถอดความใหม่ (ประโยคที่คร่อมขอบช่วงถูกตัดเหลือส่วนนอกช่วง)
+            spans = [(s, e) for s, e, _ in replacements]
+            kept = [r for r in (r if not r.get("result") else _outside(r, spans) for r in results) if r]
+            for _, _, new in replacements:
+                kept.extend(r for r in new if r.get("result"))
+            results = sorted(kept, key=lambda r: r["result"][0]["start"] if r.get("result") else float("inf"))
+
+    wf.close()
+
+    if info["tier"] != "small":
+        text = _join_text(results)
+        parsed = parse_transcribed_text(text)
+
+    _record_stats(info)
+    return text, parsed, info
+
+def _record_stats(info):
+    STATS["cases"] += 1
+    STATS["audio_sec"] += info["audio_sec"]
+    STATS["small_sec"] += info["small_sec"]
+    STATS["large_sec"] += info["large_sec"]
+    STATS["large_audio_sec"] += info["large_audio_sec"]
+    if info["tier"] == "large":
+        STATS["escalated_full"] += 1
+    elif info["tier"] == "ranges":
+        STATS["escalated_ranges"] += 1
+
+def print_cost_report(stats=STATS):
+    """แสดงต้นทุนเฉลี่ยต่อเคส (วินาทีประมวลผล) และอัตราการส่งต่อไปโมเดลใหญ่"""
+    n = stats["cases"]
+    if n == 0:
+        print("No cases processed.")
+        return
+    total = stats["small_sec"] + stats["large_sec"]
+    print("\n====================================")
+    print("Tiered decoding cost report")
+    print("====================================")
+    print(f"Cases                 : {n}")
+    print(f"Avg compute / case    : {total / n:.2f} s (small {stats['small_sec'] / n:.2f} s, large {stats['large_sec'] / n:.2f} s)")
+    print(f"Real-time factor      : {total / max(stats['audio_sec'], 1e-9):.3f}")
+    print(f"Escalated (full)      : {stats['escalated_full']} ({100 * stats['escalated_full'] / n:.0f}%)")
+    print(f"Escalated (ranges)    : {stats['escalated_ranges']} ({100 * stats['escalated_ranges'] / n:.0f}%)")
+    print(f"Large-model audio     : {stats['large_audio_sec']:.1f} s of {stats['audio_sec']:.1f} s")
+
+
+if __name__ == "__main__":
+    # ใช้งาน: python tiered_transcribe.py [ไฟล์ WAV ...]
+    for audio in sys.argv[1:] or [AUDIO_FILE]:
+        text, parsed, info = tiered_transcribe(audio)
+        if text.startswith("Error:"):
+            print(text)
+            continue
+        print(f"\n[{audio}] tier={info['tier']}")
+        print("[Transcribed Text]:", text)
+        print("[PARSED DATA]:", parsed)
+    print_cost_report()
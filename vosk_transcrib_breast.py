@@ -1,13 +1,16 @@
 import wave
-import json
 import os
-from vosk import Model, KaldiRecognizer, SetLogLevel
+import json
+import hashlib
+from asr_backends import load_backend, parse_spec
+from audio_gate import check_audio
 
 # =========================================================
 # === 1. การตั้งค่า - กรุณาแก้ไขส่วนนี้ก่อนใช้งาน ===
 # =========================================================
 
 # 1.1 ตั้งค่าเส้นทางไปยังโฟลเดอร์โมเดล Vosk
+# (หรือระบุ backend อื่นในรูปแบบ "<backend>:<path>" เช่น "replay:recordings" ดู asr_backends.py)
 # ตัวอย่าง: "C:/Users/YourName/Desktop/vosk-model-en-us-0.42-gigaspeech"
 # หรือสำหรับ Linux/Mac: "vosk-model-en-us-0.42-gigaspeech"
 MODEL_PATH = "C:/Users/HP/Downloads/ProjectSound/vosk-model-en-us-0.22"
@@ -15,28 +18,212 @@ MODEL_PATH = "C:/Users/HP/Downloads/ProjectSound/vosk-model-en-us-0.22"
 # 1.2 ตั้งค่าชื่อไฟล์เสียงที่คุณต้องการแปลง (ต้องเป็น .wav และ 16kHz Mono)
 AUDIO_FILE = "input_Breast.wav"              
 
-# ปิดข้อความเตือนของ Vosk เพื่อให้ผลลัพธ์สะอาดตา
-SetLogLevel(0) 
+# 1.3 จำนวนตัวเลือก N-best ที่ขอจาก recognizer (0 = ใช้อันดับ 1 ตามเดิม)
+# ถ้า > 0 จะเลือกตัวเลือกใหม่ด้วยคำศัพท์ของแบบฟอร์ม (ดู nbest_rescorer.py)
+MAX_ALTERNATIVES = 0
+
+# 1.4 โฟลเดอร์ checkpoint ของการถอดความ (None = ปิด)
+# ผลลัพธ์แต่ละประโยคถูกบันทึกทันที ถ้าโปรแกรมล่ม การรันครั้งถัดไปจะถอดความต่อจากประโยคสุดท้าย
+# ผลที่ได้ตรงกับการรันรวดเดียว (ดู iter_decode: เริ่ม recognizer ใหม่ที่ขอบประโยคทั้งสองกรณี)
+CHECKPOINT_DIR = "decode_checkpoints"
+# จุดเริ่ม recognizer ใหม่ = เวลาจบของคำสุดท้ายของประโยค + ค่านี้ (วินาที)
+# ต้องสั้นกว่าความเงียบท้ายประโยคที่ endpoint ของ Vosk ต้องการ (>= 0.5 s) จึงไม่ตัดคำถัดไป
+RESTART_PAD_SEC = 0.1
+
+# 1.5 ตรวจคุณภาพไฟล์เสียงก่อนโหลดโมเดล (ดู audio_gate.py)
+# ไฟล์ที่เสีย/เงียบ/clip หนักจะถูกปฏิเสธทันที ไฟล์ที่มีปัญหาเล็กน้อยจะแสดงคำเตือนแล้วถอดความต่อ
+QUALITY_GATE = True
+
+# โมเดล/backend ที่โหลดแล้ว (โหลดครั้งเดียวต่อ process)
+_MODELS = {}
 
 # =========================================================
 # === 2. ฟังก์ชันหลักในการถอดความเสียง ===
 # =========================================================
 
-def transcribe_audio(model_path, audio_file):
+def load_model(model_path, max_alternatives=None):
+    """
+    โหลดโมเดล (ASR backend) ครั้งเดียวต่อ process แล้วใช้ซ้ำ
+    max_alternatives > 0: ขอ N-best แล้ว rescore ด้วย domain LM จาก field spec
+    """
+    n = MAX_ALTERNATIVES if max_alternatives is None else max_alternatives
+    key = (model_path, n)
+    if key not in _MODELS:
+        print(f"Loading ASR model from: {model_path}...")
+        if n:
+            from nbest_rescorer import RescoringBackend
+            _MODELS[key] = RescoringBackend(load_backend(model_path, max_alternatives=n), n)
+        else:
+            _MODELS[key] = load_backend(model_path)
+    return _MODELS[key]
+
+def checkpoint_path(audio_file, checkpoint_dir=CHECKPOINT_DIR):
+    """
+    ไฟล์ checkpoint ของไฟล์เสียงหนึ่งไฟล์ ตั้งชื่อด้วย hash ของ path เต็ม
+    (ไฟล์ชื่อเดียวกันในโฟลเดอร์ต่างกันจึงไม่ใช้ checkpoint ร่วมกัน)
+    """
+    key = hashlib.sha1(os.path.abspath(audio_file).encode("utf-8")).hexdigest()
+    return os.path.join(checkpoint_dir, f"{key}.jsonl")
+
+def _load_checkpoint(path, header):
+    """
+    คืนค่า (results, frame ที่ถอดความถึงแล้ว) จาก checkpoint ที่ตรงกับ header
+    หรือ ([], None) ถ้าไม่มี/ไม่ตรง (เช่น ไฟล์เสียงหรือโมเดลเปลี่ยน)
+    บรรทัดสุดท้ายที่เขียนไม่ครบ (ล่มระหว่างเขียน) จะถูกข้าม
+    """
+    if not os.path.exists(path):
+        return [], None
+    results, pos = [], None
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().split("\n")
+    try:
+        if json.loads(lines[0]) != header:
+            return [], None
+    except ValueError:
+        return [], None
+    for line in lines[1:]:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            break
+        results.append(entry["result"])
+        pos = entry["frame"]
+    return results, pos
+
+def _shift(result, offset):
+    for w in result.get("result", []):
+        w["start"] += offset
+        w["end"] += offset
+    return result
+
+def decode_results(model, wf, start_frame=0, end_frame=None, chunk_frames=4000, audio_id=None, checkpoint=None):
+    """
+    ถอดความเฉพาะช่วง [start_frame, end_frame) ของไฟล์ WAV ที่เปิดอยู่
+    คืนค่า list ของผลลัพธ์ Vosk (มี "text" และ "result" = เวลา/ความมั่นใจรายคำ)
+    เวลาของคำถูกเลื่อนให้เป็นเวลาจริงในไฟล์ (วินาที)
+    checkpoint: path ของไฟล์ checkpoint — บันทึกผลลัพธ์แต่ละประโยคพร้อมตำแหน่งในไฟล์เสียง
+    และถ้ามี checkpoint ค้างอยู่ จะถอดความต่อจากประโยคสุดท้ายแทนการเริ่มจาก frame แรก
+    """
+    steps = iter_decode(model, wf, start_frame, end_frame, chunk_frames, audio_id, checkpoint)
+    while True:
+        try:
+            next(steps)
+        except StopIteration as done:
+            return done.value
+
+def _restart_frame(result, rate, chunk_start, seg_start, pos):
+    """
+    frame ที่เริ่ม recognizer ใหม่หลังผลลัพธ์หนึ่งประโยค: เวลาจบของคำสุดท้าย + RESTART_PAD_SEC
+    (เสียงหลังจากนั้นใน chunk นี้ถูกป้อนให้ recognizer ตัวใหม่อีกครั้ง ไม่มีเสียงหาย)
+    ประโยคที่ไม่มีคำ: ต้น chunk ปัจจุบัน ต้องเลยจุดเริ่มของ recognizer ตัวเดิมเสมอ (กันวนซ้ำ)
+    """
+    words = result.get("result", [])
+    frame = int(round((words[-1]["end"] + RESTART_PAD_SEC) * rate)) if words else chunk_start
+    return min(max(frame, seg_start + 1), pos)
+
+def iter_decode(model, wf, start_frame=0, end_frame=None, chunk_frames=4000, audio_id=None, checkpoint=None):
+    """
+    แบบเดียวกับ decode_results แต่เป็น generator: yield ตำแหน่ง (frame) หลังถอดความแต่ละ chunk
+    ผู้เรียกหยุดพักระหว่าง chunk ได้ (เช่น ให้งานด่วนแทรก) แล้วเรียก next() ต่อภายหลัง
+    เมื่อจบจะคืนค่า list ของผลลัพธ์ผ่าน StopIteration.value
+    """
+    rate = wf.getframerate()
+    frame_bytes = wf.getsampwidth() * wf.getnchannels()
+    end_frame = wf.getnframes() if end_frame is None else min(end_frame, wf.getnframes())
+
+    results, pos, ckpt = [], start_frame, None
+    if checkpoint:
+        header = {
+            "audio": os.path.abspath(audio_id) if audio_id else None,
+            "mtime": os.path.getmtime(audio_id) if audio_id and os.path.exists(audio_id) else None,
+            "frames": wf.getnframes(), "rate": rate, "start": start_frame, "end": end_frame,
+            "chunk": chunk_frames, "model": getattr(model, "model_path", model.name),
+            "restart": "sentence",
+        }
+        results, resume_pos = _load_checkpoint(checkpoint, header)
+        if resume_pos is not None:
+            pos = resume_pos
+            print(f"Resuming from checkpoint at {pos / rate:.1f} s ({len(results)} result(s) restored)")
+        else:
+            os.makedirs(os.path.dirname(checkpoint) or ".", exist_ok=True)
+            with open(checkpoint, "w", encoding="utf-8") as f:
+                f.write(json.dumps(header) + "\n")
+        ckpt = open(checkpoint, "a", encoding="utf-8")
+
+    # Vosk/Kaldi เก็บสถานะข้ามประโยค (feature pipeline, i-vector ของผู้พูด, frame ที่ค้างใน buffer)
+    # ซึ่งบันทึกลง checkpoint ไม่ได้ เมื่อใช้ checkpoint จึงเริ่ม recognizer ใหม่หลังทุกประโยค
+    # ที่ frame ของ _restart_frame ทั้งในการรันรวดเดียวและการถอดความต่อ สถานะ ณ จุดนั้นจึงเหมือนกันเสมอ
+    # (ไม่ใช้ checkpoint = recognizer ตัวเดียวทั้งไฟล์ตามเดิม, การพักงานของ scheduler ใช้ generator เดิม)
+    seg_start = pos
+    offset = pos / rate
+    rec = model.recognizer(rate, audio_id=audio_id, offset_sec=offset)
+    wf.setpos(pos)
+
+    try:
+        while pos < end_frame:
+            data = wf.readframes(min(chunk_frames, end_frame - pos))
+            if len(data) == 0:
+                break
+            chunk_start = pos
+            pos += len(data) // frame_bytes
+            if rec.accept(data):
+                r = _shift(rec.result(), offset)
+                results.append(r)
+                if ckpt:
+                    pos = seg_start = _restart_frame(r, rate, chunk_start, seg_start, pos)
+                    ckpt.write(json.dumps({"frame": pos, "byte": pos * frame_bytes, "result": r},
+                                          ensure_ascii=False) + "\n")
+                    ckpt.flush()
+                    os.fsync(ckpt.fileno())
+                    offset = pos / rate
+                    rec = model.recognizer(rate, audio_id=audio_id, offset_sec=offset)
+                    wf.setpos(pos)
+            yield pos
+        results.append(_shift(rec.final_result(), offset))
+    finally:
+        if ckpt:
+            ckpt.close()
+
+    # ถอดความครบแล้ว ไม่ต้องเก็บ checkpoint
+    if checkpoint:
+        os.remove(checkpoint)
+    return results
+
+def transcribe_audio(model_path, audio_file, with_words=False):
     """
     ทำการแปลงไฟล์เสียง WAV ให้เป็นข้อความโดยใช้ Vosk
+    with_words=True: คืนค่า (ข้อความ, list ของคำพร้อมเวลา/ความมั่นใจ) แทนข้อความอย่างเดียว
     """
+    if with_words:
+        results = []
+        text = _transcribe(model_path, audio_file, results)
+        return text, [w for r in results for w in r.get("result", [])]
+    return _transcribe(model_path, audio_file)
+
+def _transcribe(model_path, audio_file, results_out=None):
     
     # ตรวจสอบว่าไฟล์โมเดลและไฟล์เสียงมีอยู่จริง
-    if not os.path.exists(model_path):
+    _, path = parse_spec(model_path)
+    if path and not os.path.exists(path):
         return f"Error: Model path not found at {model_path}"
     if not os.path.exists(audio_file):
         return f"Error: Audio file not found at {audio_file}"
 
+    # 2.0 ตรวจรูปแบบ/คุณภาพเสียง (ไม่กี่มิลลิวินาที ก่อนโหลดโมเดลที่ใช้เวลานาน)
+    if QUALITY_GATE:
+        report = check_audio(audio_file)
+        if report["status"] == "reject":
+            return f"Error: Audio rejected by quality check: {'; '.join(report['problems'])}"
+        if report["status"] == "flag":
+            print("--- ⚠️ คำเตือน ---")
+            for problem in report["problems"]:
+                print(problem)
+            print("อาจมีผลต่อความแม่นยำ (ถอดความต่อ)")
+            print("------------------")
+
     # 2.1 โหลดโมเดล Vosk
     try:
-        print(f"Loading Vosk model from: {model_path}...")
-        model = Model(model_path)
+        model = load_model(model_path)
     except Exception as e:
         return f"Error loading model: {e}"
 
@@ -46,8 +233,8 @@ def transcribe_audio(model_path, audio_file):
     except Exception as e:
         return f"Error opening audio file: {e}"
 
-    # ตรวจสอบคุณสมบัติไฟล์ WAV ที่เหมาะสม
-    if wf.getnchannels() != 1 or wf.getframerate() != 16000:
+    # ตรวจสอบคุณสมบัติไฟล์ WAV ที่เหมาะสม (ถ้าปิด QUALITY_GATE)
+    if not QUALITY_GATE and (wf.getnchannels() != 1 or wf.getframerate() != 16000):
         print("--- ⚠️ คำเตือน ---")
         print("Vosk ทำงานได้ดีที่สุดกับไฟล์เสียงแบบ Mono (1 Channel) และ Sample Rate 16000 Hz.")
         print(f"ไฟล์ปัจจุบัน: Channels={wf.getnchannels()}, Rate={wf.getframerate()} Hz")
@@ -55,29 +242,13 @@ def transcribe_audio(model_path, audio_file):
         print("------------------")
         # โค้ดจะยังคงทำงานต่อ แต่ผลลัพธ์อาจไม่ดีที่สุด
 
-    # 2.3 สร้าง Recognizer
-    # โค้ดนี้จะใช้ Sample Rate ของไฟล์ WAV
-    rec = KaldiRecognizer(model, wf.getframerate())
-
-    # 2.4 ประมวลผลและถอดความเสียง
-    full_text = []
+    # 2.3 ประมวลผลและถอดความเสียง (อ่านทีละ 4000 frames ผ่าน ASR backend)
     print("Starting transcription...")
-    
-    while True:
-        # อ่านไฟล์เสียงเป็นส่วนๆ (Chunk size: 4000 frames)
-        data = wf.readframes(4000) 
-        if len(data) == 0:
-            break
-        
-        # ส่งข้อมูลเสียงไปยัง Vosk
-        if rec.AcceptWaveform(data):
-            # ดึงผลลัพธ์แบบเต็มประโยคออกมา (ถ้ามี)
-            result = json.loads(rec.Result())
-            full_text.append(result.get("text", ""))
-
-    # 2.5 รับผลลัพธ์สุดท้าย (สำหรับข้อมูลที่ค้างอยู่ใน Buffer)
-    final_result = json.loads(rec.FinalResult())
-    full_text.append(final_result.get("text", ""))
+    checkpoint = checkpoint_path(audio_file) if CHECKPOINT_DIR else None
+    results = decode_results(model, wf, audio_id=audio_file, checkpoint=checkpoint)
+    if results_out is not None:
+        results_out.extend(results)
+    full_text = [r.get("text", "") for r in results]
 
     # ปิดไฟล์
     wf.close()